@@ -0,0 +1,38 @@
+# Runs the common block-taking iteration methods over an Array, whose
+# versions are native, and over an Enumerable whose each is written in Ruby,
+# e.g. with:
+#
+#   bin/topaz bench/bench_enumerable.rb 100000
+
+class RubyList
+  include Enumerable
+
+  def initialize(items)
+    @items = items
+  end
+
+  def each
+    i = 0
+    while i < @items.size
+      yield @items[i]
+      i += 1
+    end
+    self
+  end
+end
+
+size = (ARGV[0] || 100_000).to_i
+array = (0...size).to_a
+list = RubyList.new(array)
+
+[["Array", array], ["Enumerable", list]].each do |name, items|
+  t = Time.now
+  10.times do
+    items.each { |x| x }
+    items.map { |x| x + 1 }
+    items.select(&:even?)
+    items.inject(0) { |sum, x| sum + x }
+    items.include?(-1)
+  end
+  puts "#{name.ljust(11)} #{Time.now - t}"
+end
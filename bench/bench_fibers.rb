@@ -0,0 +1,23 @@
+# Switches back and forth between two fibers, then creates many short-lived
+# fibers, printing how many stacks were created and reused, e.g. with:
+#
+#   bin/topaz bench/bench_fibers.rb 100000
+
+n = (ARGV[0] || 100_000).to_i
+
+ping = Fiber.new do |x|
+  loop { x = Fiber.yield(x + 1) }
+end
+t = Time.now
+x = 0
+n.times { x = ping.resume(x) }
+puts "ping-pong: #{Time.now - t}"
+
+t = Time.now
+n.times do |i|
+  f = Fiber.new { |v| Fiber.yield(v); v }
+  f.resume(i)
+  f.resume
+end
+puts "churn:     #{Time.now - t}"
+p Topaz.fiber_stats
@@ -0,0 +1,45 @@
+# Small writes and reads, to compare the number of syscalls made by the IO
+# buffers, e.g. with:
+#
+#   strace -c -e trace=read,write bin/topaz bench/bench_io.rb
+#   ltrace -S -c bin/topaz bench/bench_io.rb
+
+path = File.join(ENV["TMPDIR"] || "/tmp", "topaz_bench_io.txt")
+lines = (ARGV[0] || 100_000).to_i
+
+t = Time.now
+File.open(path, "w") do |f|
+  lines.times do |i|
+    f.puts "line #{i}"
+  end
+end
+puts "puts:  #{Time.now - t}"
+
+t = Time.now
+File.open(path, "w") do |f|
+  lines.times do |i|
+    f.write "x"
+  end
+end
+puts "write: #{Time.now - t}"
+
+t = Time.now
+count = 0
+File.open(path) do |f|
+  while f.getc
+    count += 1
+  end
+end
+puts "getc:  #{Time.now - t}"
+
+t = Time.now
+count = 0
+File.open(path, "w") { |f| lines.times { |i| f.puts "line #{i}" } }
+File.open(path) do |f|
+  while f.gets
+    count += 1
+  end
+end
+puts "gets:  #{Time.now - t}"
+
+File.delete(path)
@@ -0,0 +1,39 @@
+# Dumps and loads a nested graph of plain objects, Structs and containers,
+# e.g. with:
+#
+#   bin/topaz bench/bench_marshal.rb 2000
+
+class Customer
+  def initialize(id, name, tags)
+    @id = id
+    @name = name
+    @tags = tags
+  end
+end
+
+LineItem = Struct.new(:sku, :quantity, :price)
+
+class Order
+  def initialize(id, customer, items)
+    @id = id
+    @customer = customer
+    @items = items
+    @total = items.inject(0.0) { |sum, item| sum + item.quantity * item.price }
+  end
+end
+
+count = (ARGV[0] || 1_000).to_i
+customers = (0...100).map { |i| Customer.new(i, "customer #{i}", [:new, :vip, :eu][0, i % 4]) }
+orders = (0...count).map do |i|
+  items = (0...5).map { |j| LineItem.new("sku-#{j}", j + 1, 9.99 * j) }
+  Order.new(i + 2 ** 40, customers[i % customers.size], items)
+end
+
+data = nil
+t = Time.now
+10.times { data = Marshal.dump(orders) }
+puts "dump: #{Time.now - t} (#{data.size} bytes)"
+
+t = Time.now
+10.times { Marshal.load(data) }
+puts "load: #{Time.now - t}"
@@ -0,0 +1,23 @@
+# Constructs objects whose initialize sets a fixed set of instance variables,
+# mixing boxed and unboxed values, e.g. with:
+#
+#   bin/topaz bench/bench_object_new.rb 1000000
+
+class Record
+  def initialize(id, name)
+    @id = id
+    @name = name
+    @score = 1.5
+    @tags = nil
+    @created = id
+    @updated = id
+    @owner = name
+    @flags = 0
+  end
+end
+
+n = (ARGV[0] || 1_000_000).to_i
+
+t = Time.now
+n.times { |i| Record.new(i, "r") }
+puts "Record.new: #{Time.now - t}"
@@ -0,0 +1,21 @@
+#!/bin/sh
+# Measures process startup, i.e. `topaz -e 1`. Compare a binary translated
+# normally against one translated with the kernel snapshot:
+#
+#   rpython -Ojit targettopaz.py                      # bin/topaz
+#   rpython -Ojit targettopaz.py --snapshot-kernel    # bin/topaz, snapshotted
+#
+#   bench/bench_startup.sh path/to/topaz-plain path/to/topaz-snapshot
+
+RUNS=${RUNS:-50}
+
+for topaz in "$@"; do
+    start=$(date +%s.%N)
+    i=0
+    while [ $i -lt $RUNS ]; do
+        "$topaz" -e 1
+        i=$((i + 1))
+    done
+    end=$(date +%s.%N)
+    echo "$topaz: $(echo "($end - $start) / $RUNS" | bc -l | cut -c1-6)s per run"
+done
@@ -0,0 +1,35 @@
+# Builds pages through + and string interpolation, the way simple templating
+# code does, to compare deferred concatenation against copying, e.g. with:
+#
+#   bin/topaz bench/bench_templates.rb 2000
+
+rows = (ARGV[0] || 1_000).to_i
+items = (0...rows).map { |i| ["item #{i}", i * 3, "note " * (i % 5)] }
+
+def render_row(name, price, note)
+  "<tr><td>#{name}</td><td>#{price}</td><td>#{note}</td></tr>\n"
+end
+
+t = Time.now
+10.times do
+  page = "<table>\n"
+  items.each { |name, price, note| page = page + render_row(name, price, note) }
+  page = page + "</table>\n"
+end
+puts "plus:          #{Time.now - t}"
+
+t = Time.now
+10.times do
+  body = ""
+  items.each { |name, price, note| body = "#{body}#{render_row(name, price, note)}" }
+  page = "<html><body><table>\n#{body}</table></body></html>\n"
+end
+puts "interpolation: #{Time.now - t}"
+
+t = Time.now
+10.times do
+  page = "<table>\n"
+  items.each { |name, price, note| page << render_row(name, price, note) }
+  page << "</table>\n"
+end
+puts "append:        #{Time.now - t}"
@@ -1,18 +1,4 @@
 class Hash
-  def each(&block)
-    return self.enum_for(:each) if !block
-    iter = Topaz::HashIterator.new(self)
-    while true
-      begin
-        key, value = iter.next()
-      rescue StopIteration
-        return self
-      end
-      yield [key, value]
-    end
-  end
-  alias each_pair each
-
   def self.[](*args)
     if args.size == 1
       arg = args[0]
@@ -41,24 +27,6 @@ class Hash
     h
   end
 
-  def each_key(&block)
-    return self.enum_for(:each_key) if !block
-    each { |k, v| yield k }
-  end
-
-  def each_value(&block)
-    return self.enum_for(:each_value) if !block
-    each { |k, v| yield v }
-  end
-
-  def to_a
-    res = []
-    each do |k, v|
-      res << [k, v]
-    end
-    res
-  end
-
   def ==(other)
     return true if self.equal?(other)
     return false unless other.kind_of?(Hash)
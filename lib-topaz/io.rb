@@ -16,8 +16,8 @@ class IO
 
     args.flatten.each do |string|
       string = string.to_s unless string.is_a?(String)
+      string += "\n" unless string[-1] == "\n"
       write(string)
-      write("\n") unless string[-1] == "\n"
     end
     nil
   end
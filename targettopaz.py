@@ -6,7 +6,10 @@ from topaz.main import create_entry_point, get_topaz_config_options
 def target(driver, args):
     driver.exe_name = "bin/topaz"
     driver.config.set(**get_topaz_config_options())
-    return create_entry_point(driver.config), None
+    # Pass --snapshot-kernel after the target to run lib-topaz at translation
+    # time and bake the resulting classes and methods into the binary.
+    snapshot_kernel = "--snapshot-kernel" in args
+    return create_entry_point(driver.config, snapshot_kernel), None
 
 
 def jitpolicy(driver):
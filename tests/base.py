@@ -3,6 +3,7 @@ from contextlib import contextmanager
 import pytest
 
 from topaz.error import RubyError
+from topaz.objects.ioobject import PendingWrites
 from topaz.objects.arrayobject import W_ArrayObject
 from topaz.objects.bignumobject import W_BignumObject
 from topaz.objects.boolobject import W_TrueObject, W_FalseObject
@@ -23,6 +24,11 @@ class BaseTopazTest(object):
         if msg is not None:
             assert exc.value.w_value.msg == msg
 
+    def readouterr(self, space, capfd):
+        # STDOUT is buffered, flush it like the interpreter does at exit.
+        space.fromcache(PendingWrites).flush_all(space)
+        return capfd.readouterr()
+
     def find_const(self, space, name):
         return space.find_const(space.w_object, name)
 
@@ -45,10 +51,10 @@ class BaseTopazTest(object):
             return [self.unwrap(space, w_x) for w_x in space.listview(w_obj)]
         elif isinstance(w_obj, W_HashObject):
             h = {}
-            contents = w_obj.strategy.unerase(w_obj.dict_storage)
-            w_hash = contents
-            for w_key in w_hash.keys():
-                h[self.unwrap(space, w_key)] = self.unwrap(space, w_hash[w_key])
+            strategy = w_obj.strategy
+            for w_key in strategy.keys(w_obj.dict_storage):
+                w_value = strategy.getitem(w_obj.dict_storage, w_key)
+                h[self.unwrap(space, w_key)] = self.unwrap(space, w_value)
             return h
         elif isinstance(w_obj, W_ModuleObject):
             return w_obj
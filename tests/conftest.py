@@ -1,8 +1,14 @@
 import copy
+import os
 
 from rpython.config.translationoption import get_combined_translation_config
 
 
+# Keep test runs from filling the user's compiled code cache, tests that
+# exercise it point it at a temporary directory.
+os.environ["TOPAZ_NO_CODE_CACHE"] = "1"
+
+
 def pytest_funcarg__space(request):
     # Inside the function so various initialization stuff isn't seen until
     # coverage is setup.
@@ -9,17 +9,17 @@ from ..base import BaseTopazTest
 class TestKernel(BaseTopazTest):
     def test_puts_nil(self, space, capfd):
         space.execute("puts nil")
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "\n"
 
     def test_print(self, space, capfd):
         space.execute("print 1, 3")
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "13"
 
     def test_p(self, space, capfd):
         space.execute("p 1,2,3")
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "1\n2\n3\n"
 
     def test_lambda(self, space):
@@ -351,6 +351,110 @@ class TestRequire(BaseTopazTest):
         """ % (f, f, f))
         assert space.int_w(w_res) == 1
 
+    def test_loaded_features_mutation(self, space, tmpdir):
+        f = tmpdir.join("f.rb")
+        f.write("""
+        @a += 1
+        """)
+        g = tmpdir.join("g.rb")
+        g.write("""
+        @b = true
+        """)
+
+        w_res = space.execute("""
+        @a = 0
+        require '%s'
+        $LOADED_FEATURES.delete('%s')
+        require '%s'
+        $" << '%s'
+        return @a, require('%s'), @b, $LOADED_FEATURES.include?('%s')
+        """ % (f, f, f, g, g, f))
+        assert self.unwrap(space, w_res) == [2, False, None, True]
+
+    def test_loaded_features_non_string(self, space, tmpdir):
+        f = tmpdir.join("f.rb")
+        f.write("""
+        @a += 1
+        """)
+
+        w_res = space.execute("""
+        class Path
+          def ==(other)
+            other == '%s'
+          end
+        end
+        @a = 0
+        $LOADED_FEATURES << Path.new
+        require '%s'
+        return @a
+        """ % (f, f))
+        assert space.int_w(w_res) == 0
+
+    def test_load_path_changes(self, space, tmpdir):
+        a = tmpdir.mkdir("a")
+        b = tmpdir.mkdir("b")
+        b.join("t.rb").write("""
+        @a = :b
+        """)
+
+        w_res = space.execute("""
+        $LOAD_PATH.unshift '%s'
+        begin
+          require 't'
+        rescue LoadError
+          @a = :none
+        end
+        $LOAD_PATH.unshift '%s'
+        require 't'
+        return @a
+        """ % (a, b))
+        assert space.symbol_w(w_res) == "b"
+
+        a.join("u.rb").write("""
+        @a = :u
+        """)
+        w_res = space.execute("""
+        require 'u'
+        return @a
+        """)
+        assert space.symbol_w(w_res) == "u"
+
+    def test_load_path_new_file_in_earlier_entry(self, space, tmpdir):
+        a = tmpdir.mkdir("a")
+        b = tmpdir.mkdir("b")
+        b.join("v.rb").write("$res << :b")
+        b.join("w.rb").write("$res << :b")
+        space.execute("""
+        $res = []
+        $LOAD_PATH.unshift '%s'
+        $LOAD_PATH.unshift '%s'
+        require 'v'
+        """ % (b, a))
+        a.join("w.rb").write("$res << :a")
+        w_res = space.execute("""
+        require 'w'
+        return $res
+        """)
+        assert self.unwrap(space, w_res) == ["b", "a"]
+
+    def test_load_path_relative_entry(self, space, tmpdir, monkeypatch):
+        for name in ["c", "d"]:
+            tmpdir.mkdir(name).join("%s.rb" % name).write("$res << :%s" % name)
+        tmpdir.mkdir("e").join("d.rb").write("$res << :e")
+        monkeypatch.chdir(tmpdir.join("c"))
+        space.execute("""
+        $res = []
+        $LOAD_PATH.unshift '%s'
+        $LOAD_PATH.unshift '.'
+        require 'c'
+        """ % tmpdir.join("e"))
+        monkeypatch.chdir(tmpdir.join("d"))
+        w_res = space.execute("""
+        require 'd'
+        return $res
+        """)
+        assert self.unwrap(space, w_res) == ["c", "d"]
+
     def test_load(self, space, tmpdir):
         f = tmpdir.join("f.rb")
         f.write("""
@@ -367,6 +471,67 @@ class TestRequire(BaseTopazTest):
         """ % (f, f, f))
         assert space.int_w(w_res) == 3
 
+    def test_load_code_cache(self, space, tmpdir):
+        from topaz.codecache import CodeCache
+
+        cache = space.fromcache(CodeCache)
+        cache.cache_dir = str(tmpdir.mkdir("cache"))
+        cache.initialized = True
+        f = tmpdir.join("f.rb")
+        f.write("""
+        def f(a, b, c: 2.5, &d)
+          [a, [b], c, :sym, 10 ** 30, /x/i, [1].map { |x| x + a }]
+        end
+        @a += 1
+        """)
+        misses = cache.misses
+        w_res = space.execute("""
+        @a = 0
+        load '%s'
+        load '%s'
+        return @a, f(1, 2)
+        """ % (f, f))
+        assert space.int_w(space.listview(w_res)[0]) == 2
+        assert cache.misses == misses + 1
+        assert cache.hits >= 1
+        res = space.listview(space.listview(w_res)[1])
+        assert self.unwrap(space, space.newarray(res[:4])) == [1, [2], 2.5, "sym"]
+        assert space.bigint_w(res[4]).str() == str(10 ** 30)
+        assert space.str_w(space.send(res[5], "source")) == "x"
+        assert self.unwrap(space, res[6]) == [2]
+
+        f.write("@a += 10")
+        w_res = space.execute("""
+        load '%s'
+        return @a
+        """ % f)
+        assert space.int_w(w_res) == 12
+        assert cache.misses == misses + 2
+
+    def test_load_code_cache_relative(self, space, tmpdir, monkeypatch):
+        from topaz.codecache import CodeCache
+
+        cache = space.fromcache(CodeCache)
+        cache.cache_dir = str(tmpdir.mkdir("cache"))
+        cache.initialized = True
+        for name in ["a", "b"]:
+            tmpdir.mkdir(name).join("main.rb").write("$res << [%r, __FILE__]" % name)
+        misses = cache.misses
+        space.execute("$res = []")
+        for name in ["a", "b", "a", "b"]:
+            monkeypatch.chdir(tmpdir.join(name))
+            space.execute("load 'main.rb'")
+        monkeypatch.chdir(tmpdir)
+        space.execute("load './a/main.rb'")
+        w_res = space.execute("return $res")
+        assert self.unwrap(space, w_res) == [
+            ["a", "main.rb"], ["b", "main.rb"], ["a", "main.rb"],
+            ["b", "main.rb"], ["a", "./a/main.rb"],
+        ]
+        # One entry per file, whichever relative path it was loaded by.
+        assert cache.misses == misses + 2
+        assert len(tmpdir.join("cache").listdir()) == 2
+
     def test_no_ext_on_path(self, space, tmpdir):
         f = tmpdir.join("t.txt")
         f.write("""
@@ -429,7 +594,7 @@ class TestExec(BaseTopazTest):
                 os._exit(0)
         else:
             os.waitpid(cpid, 0)
-            out, err = capfd.readouterr()
+            out, err = self.readouterr(space, capfd)
             return out
 
     def test_exec_with_sh(self, space, capfd):
@@ -483,3 +648,13 @@ class TestSetTraceFunc(BaseTopazTest):
             ["line", "-e", 10, None, None],
             ["c-call", "-e", 10, "set_trace_func", "Kernel"]
         ]
+
+    def test_tracing_flag(self, space):
+        from topaz.interpreter import TraceState
+
+        state = space.fromcache(TraceState)
+        assert not state.enabled
+        space.execute("set_trace_func proc { }")
+        assert state.enabled
+        space.execute("set_trace_func nil")
+        assert not state.enabled
@@ -399,3 +399,126 @@ class TestMarshal(BaseTopazTest):
         return Marshal.load(file)
         """ % (f, f))
         assert space.str_w(w_res) == "hallo"
+
+    def test_symlink(self, space):
+        w_res = space.execute("return Marshal.dump([:foo, :foo, 'a', 'b'])")
+        assert space.str_w(w_res) == "\x04\b[\t:\bfoo;\x00I\"\x06a\x06:\x06ETI\"\x06b\x06;\x06T"
+        w_res = space.execute("return Marshal.load(Marshal.dump([:foo, :foo, 'a', 'b']))")
+        assert self.unwrap(space, w_res) == ["foo", "foo", "a", "b"]
+
+    def test_object_link(self, space):
+        w_res = space.execute("""
+        s = 'shared'
+        a = [s, s]
+        return Marshal.dump(a), Marshal.load(Marshal.dump(a))
+        """)
+        w_dump, w_loaded = space.listview(w_res)
+        assert space.str_w(w_dump) == "\x04\b[\aI\"\vshared\x06:\x06ET@\x06"
+        w_first, w_second = space.listview(w_loaded)
+        assert w_first is w_second
+        w_res = space.execute("""
+        a = [1]
+        a << a
+        b = Marshal.load(Marshal.dump(a))
+        return b[1].equal?(b)
+        """)
+        assert w_res is space.w_true
+
+    def test_io_stream(self, space, tmpdir):
+        f = tmpdir.join("testfile")
+        w_res = space.execute("""
+        File.open('%s', 'wb') do |f|
+          Marshal.dump((1..20000).map { |i| "item #{i}" }, f)
+          Marshal.dump({:a => 1.5}, f)
+        end
+        res = File.open('%s', 'rb') do |f|
+          [Marshal.load(f).size, Marshal.load(f), f.read]
+        end
+        return res
+        """ % (f, f))
+        assert self.unwrap(space, w_res) == [20000, {"a": 1.5}, None]
+
+    def test_bignum(self, space):
+        w_res = space.execute("return Marshal.dump(2 ** 30)")
+        assert space.str_w(w_res) == "\x04\bl+\a\x00\x00\x00@"
+        w_res = space.execute("return Marshal.dump(-(2 ** 64))")
+        assert space.str_w(w_res) == "\x04\bl-\n" + "\x00" * 8 + "\x01\x00"
+        w_res = space.execute("""
+        return Marshal.load(Marshal.dump([2 ** 30, -(2 ** 64), 2 ** 100]))
+        """)
+        assert [
+            space.bigint_w(w_x).tolong() for w_x in space.listview(w_res)
+        ] == [2 ** 30, -(2 ** 64), 2 ** 100]
+
+    def test_object(self, space):
+        w_res = space.execute("""
+        class Point
+          attr_reader :x, :y
+          def initialize(x, y)
+            @x = x
+            @y = y
+          end
+        end
+        return Marshal.dump(Point.new(1, 2))
+        """)
+        assert space.str_w(w_res) == "\x04\bo:\nPoint\a:\a@xi\x06:\a@yi\a"
+        w_res = space.execute("""
+        p = Point.new(1, 'a')
+        q = Marshal.load(Marshal.dump([p, p]))
+        return q[0].x, q[0].y, q[0].class.name, q[0].equal?(q[1])
+        """)
+        assert self.unwrap(space, w_res) == [1, "a", "Point", True]
+        with self.raises(space, "ArgumentError", "undefined class/module Missing"):
+            space.execute("Marshal.load(\"\\x04\\bo:\\fMissing\\x00\")")
+        with self.raises(space, "TypeError"):
+            space.execute("Marshal.dump(Class.new.new)")
+
+    def test_struct(self, space):
+        w_res = space.execute("""
+        Pair = Struct.new(:left, :right)
+        return Marshal.dump(Pair.new(1, nil))
+        """)
+        assert space.str_w(w_res) == "\x04\bS:\tPair\a:\tlefti\x06:\nright0"
+        w_res = space.execute("""
+        pair = Marshal.load(Marshal.dump(Pair.new(:a, [1])))
+        return pair.class.name, pair.left, pair.right
+        """)
+        assert self.unwrap(space, w_res) == ["Pair", "a", [1]]
+
+    def test_user_dump(self, space):
+        w_res = space.execute("""
+        class Celsius
+          attr_reader :degrees
+          def initialize(degrees)
+            @degrees = degrees
+          end
+          def _dump(level)
+            @degrees.to_s
+          end
+          def self._load(data)
+            new(data.to_i)
+          end
+        end
+        return Marshal.dump(Celsius.new(21)), Marshal.load(Marshal.dump(Celsius.new(21))).degrees
+        """)
+        assert self.unwrap(space, w_res) == ["\x04\bu:\fCelsius\a21", 21]
+
+    def test_user_marshal(self, space):
+        w_res = space.execute("""
+        class Money
+          attr_reader :cents, :currency
+          def initialize(cents, currency)
+            @cents = cents
+            @currency = currency
+          end
+          def marshal_dump
+            [@cents, @currency]
+          end
+          def marshal_load(data)
+            @cents, @currency = data
+          end
+        end
+        m = Marshal.load(Marshal.dump(Money.new(150, :eur)))
+        return Marshal.dump(Money.new(1, :eur)), m.cents, m.currency
+        """)
+        assert self.unwrap(space, w_res) == ["\x04\bU:\nMoney[\ai\x06:\beur", 150, "eur"]
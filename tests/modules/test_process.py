@@ -46,7 +46,7 @@ class TestProcess(BaseTopazTest):
               puts "child"
             end
             """)
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert err == ""
         assert out == "child\n"
         monkeypatch.setattr(process, "fork", lambda: 200)
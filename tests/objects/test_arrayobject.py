@@ -101,6 +101,48 @@ class TestArrayObject(BaseTopazTest):
     def test_minus(self, space):
         w_res = space.execute("return [1, 1, 2, '3'] - [1, '3']")
         assert self.unwrap(space, w_res) == [2]
+        w_res = space.execute("return [1, 1.0, :a, 'b', [2]] - [1.0, [2], 'b']")
+        assert self.unwrap(space, w_res) == [1, "a"]
+
+    def test_and_or(self, space):
+        w_res = space.execute("return [1, 2, 2, 'a', :b] & [2, 'a', :b, 3]")
+        assert self.unwrap(space, w_res) == [2, "a", "b"]
+        w_res = space.execute("return [1, 1, 'a'] | ['a', 2.5, 1, 2.5]")
+        assert self.unwrap(space, w_res) == [1, "a", 2.5]
+
+    def test_uniq(self, space):
+        w_res = space.execute("return [1, 2, 1, 'a', 'a', :b, :b, 1.5, 1.5].uniq")
+        assert self.unwrap(space, w_res) == [1, 2, "a", "b", 1.5]
+        w_res = space.execute("return [1, 2].uniq!")
+        assert w_res is space.w_nil
+        w_res = space.execute("return [1, 2, 3, 4].uniq! { |x| x % 2 }")
+        assert self.unwrap(space, w_res) == [1, 2]
+        with self.raises(space, "RuntimeError"):
+            space.execute("[1, 1].freeze.uniq!")
+
+    def test_set_operations_mixed_types(self, space, monkeypatch):
+        calls = []
+        hash_w = space.hash_w
+
+        def counting_hash_w(w_obj):
+            calls.append(w_obj)
+            return hash_w(w_obj)
+        monkeypatch.setattr(space, "hash_w", counting_hash_w)
+        w_res = space.execute("""
+        Pair = Struct.new(:a)
+        ints = (0...200).to_a
+        others = (0...200).map { |i| i.even? ? Pair.new(i) : 2 ** 70 + i }
+        return [
+          (others - ints).size,
+          (others & ints).size,
+          (ints | others).size,
+          (ints + others + others).uniq.size,
+        ]
+        """)
+        assert self.unwrap(space, w_res) == [200, 0, 400, 400]
+        # Each element is hashed a bounded number of times, instead of once
+        # for every element of the other array.
+        assert len(calls) < 20 * 200
 
     def test_lshift(self, space):
         w_res = space.execute("return [] << 1")
@@ -558,3 +600,87 @@ class TestArrayPack(BaseTopazTest):
     def test_each(self, space):
         w_res = space.execute("return [1, 2].each { }")
         assert self.unwrap(space, w_res) == [1, 2]
+
+    def test_each_mutation(self, space):
+        w_res = space.execute("""
+        a = [1, 2]
+        res = []
+        a.each { |x| res << x; a << x + 2 if x < 4 }
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [1, 2, 3, 4, 5]
+
+    def test_selectbang(self, space):
+        w_res = space.execute("return [1, 2, 3].select! { true }")
+        assert w_res == space.w_nil
+        w_res = space.execute("return [1, 2, 3].select!(&:odd?)")
+        assert self.unwrap(space, w_res) == [1, 3]
+        w_res = space.execute("return [1, 2, 3].keep_if { false }")
+        assert self.unwrap(space, w_res) == []
+
+    def test_inject(self, space):
+        w_res = space.execute("return [1, 2, 3].inject(:+)")
+        assert space.int_w(w_res) == 6
+        w_res = space.execute("return [1, 2, 3].inject(10) { |a, b| a - b }")
+        assert space.int_w(w_res) == 4
+        w_res = space.execute("return [1, 2, 3].reduce(2, :*)")
+        assert space.int_w(w_res) == 12
+        assert space.execute("return [].inject(:+)") is space.w_nil
+
+    def test_index_count(self, space):
+        w_res = space.execute("return [1, nil, 2, nil].index(nil)")
+        assert space.int_w(w_res) == 1
+        w_res = space.execute("return [1, nil, 2, nil].rindex(nil)")
+        assert space.int_w(w_res) == 3
+        w_res = space.execute("return [1, nil, 2, nil].count(nil)")
+        assert space.int_w(w_res) == 2
+        w_res = space.execute("return [1, 2, 3].count(&:odd?)")
+        assert space.int_w(w_res) == 2
+
+    def test_recursive_equals_hash(self, space):
+        w_res = space.execute("""
+        a = [1]
+        a << a
+        b = [1]
+        b << b
+        return [a == a, a.eql?(a), a.hash == a.hash]
+        """)
+        assert self.unwrap(space, w_res) == [True, True, True]
+
+    def test_strategies(self, space):
+        from topaz.objects.arrayobject import (EmptyArrayStrategy,
+            IntArrayStrategy, FloatArrayStrategy, ObjectArrayStrategy)
+
+        w_res = space.execute("return []")
+        assert isinstance(w_res.strategy, EmptyArrayStrategy)
+        w_res = space.execute("return [1, 2]")
+        assert isinstance(w_res.strategy, IntArrayStrategy)
+        w_res = space.execute("return [1.5, 2.5]")
+        assert isinstance(w_res.strategy, FloatArrayStrategy)
+        w_res = space.execute("return [1, 2.5]")
+        assert isinstance(w_res.strategy, ObjectArrayStrategy)
+        w_res = space.execute("a = []; a << 3; return a")
+        assert isinstance(w_res.strategy, IntArrayStrategy)
+        w_res = space.execute("a = [1, 2]; a << 'x'; return a")
+        assert isinstance(w_res.strategy, ObjectArrayStrategy)
+        assert self.unwrap(space, w_res) == [1, 2, "x"]
+
+    def test_strategy_generalization(self, space):
+        w_res = space.execute("a = [1, 2, 3]; a[1] = :x; return a")
+        assert self.unwrap(space, w_res) == [1, "x", 3]
+        w_res = space.execute("a = [1.0, 2.0]; a[4] = 3.0; return a")
+        assert self.unwrap(space, w_res) == [1.0, 2.0, None, None, 3.0]
+        w_res = space.execute("a = [1, 2]; a.insert(1, nil); return a")
+        assert self.unwrap(space, w_res) == [1, None, 2]
+        w_res = space.execute("a = [1, 2]; return a + [2.5], a")
+        assert self.unwrap(space, w_res) == [[1, 2, 2.5], [1, 2]]
+        w_res = space.execute("a = [1, 2]; a.concat(a); return a")
+        assert self.unwrap(space, w_res) == [1, 2, 1, 2]
+        w_res = space.execute("a = [1, 2]; a.replace(a); return a")
+        assert self.unwrap(space, w_res) == [1, 2]
+        w_res = space.execute("a = [1, 2, 3]; b = a[1..2]; b << 'x'; return a, b")
+        assert self.unwrap(space, w_res) == [[1, 2, 3], [2, 3, "x"]]
+
+    def test_block_args_do_not_mutate_array(self, space):
+        w_res = space.execute("a = [[1]]; a.each { |x, y| }; return a")
+        assert self.unwrap(space, w_res) == [[1]]
@@ -72,6 +72,47 @@ class TestExceptionObject(BaseTopazTest):
         """)
         assert space.str_w(w_res) == "hi, a message!"
 
+    def test_internal_error_custom_initialize(self, space):
+        w_res = space.execute("""
+        class ZeroDivisionError
+          def initialize(msg)
+            super("custom: #{msg}")
+          end
+        end
+        begin
+          1 / 0
+        rescue ZeroDivisionError => e
+          return e.message
+        end
+        """)
+        assert space.str_w(w_res) == "custom: divided by 0"
+
+    def test_key_error_message(self, space):
+        w_res = space.execute("""
+        begin
+          {}.fetch(:a)
+        rescue KeyError => e
+          return [e.message, e.dup.message, e.message]
+        end
+        """)
+        assert self.unwrap(space, w_res) == ["key not found: :a"] * 3
+
+    def test_backtrace_after_return(self, space):
+        w_res = space.execute("""
+        def f
+          begin
+            1 / 0
+          rescue => e
+            e
+          end
+        end
+        e = f
+        return e.backtrace
+        """)
+        assert self.unwrap(space, w_res) == [
+            "-e:4:in `/'", "-e:4:in `f'", "-e:9:in `<main>'"
+        ]
+
     def test_backtrace(self, space):
         w_res = space.execute("""
         def f
@@ -90,6 +131,30 @@ class TestExceptionObject(BaseTopazTest):
             "-e:6:in `<main>'"
         ]
 
+    def test_backtrace_recorded_lazily(self, space):
+        w_res = space.execute("""
+        def f(n)
+          if n == 0
+            begin
+              1 / 0
+            rescue => e
+              e
+            end
+          else
+            f(n - 1)
+          end
+        end
+        return f(50)
+        """)
+        # Only the builtin and the rescuing frame are recorded up front, the
+        # callers are walked when the backtrace is asked for.
+        assert len(w_res.backtrace_entries) == 2
+        w_bt = space.send(w_res, "backtrace")
+        lines = self.unwrap(space, w_bt)
+        assert lines[:3] == ["-e:5:in `/'", "-e:5:in `f'", "-e:10:in `f'"]
+        assert len(lines) == 53
+        assert lines[-1] == "-e:13:in `<main>'"
+
     def test_backtrace_complex(self, space):
         w_res = space.execute("""
         def f
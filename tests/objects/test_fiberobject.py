@@ -137,3 +137,49 @@ class TestFiberObject(BaseTopazTest):
         """)
         with self.raises(space, "RuntimeError", "error"):
             space.execute("$f.resume")
+
+    def test_reused_stacks(self, space):
+        w_res = space.execute("""
+        before = Topaz.fiber_stats
+        res = []
+        10.times do |i|
+          f = Fiber.new { |x| Fiber.yield(x * 2); x * 3 }
+          res << f.resume(i) << f.resume
+        end
+        $f = Fiber.new { raise "error" }
+        begin
+          $f.resume
+        rescue RuntimeError
+        end
+        res << Fiber.new { :last }.resume
+        after = Topaz.fiber_stats
+        return res, after[:created] - before[:created], after[:reused] - before[:reused]
+        """)
+        res, created, reused = self.unwrap(space, w_res)
+        assert res == [x for i in range(10) for x in [i * 2, i * 3]] + ["last"]
+        assert created + reused == 12
+        assert reused >= 10
+        with self.raises(space, "FiberError", "dead fiber called"):
+            space.execute("$f.resume")
+
+    def test_parked_fiber_is_released(self, space):
+        w_fiber = space.execute("""
+        f = Fiber.new { :done }
+        f.resume
+        return f
+        """)
+        # The stack is parked for reuse, but doesn't keep the block and its
+        # frame alive.
+        assert w_fiber.dead
+        assert w_fiber.bottomframe is None
+        assert w_fiber.w_block is None
+
+    def test_pool_limit(self, space):
+        w_res = space.execute("""
+        Topaz.fiber_pool_limit = 0
+        before = Topaz.fiber_stats
+        3.times { Fiber.new { }.resume }
+        after = Topaz.fiber_stats
+        return after[:pooled], after[:reused] - before[:reused]
+        """)
+        assert self.unwrap(space, w_res) == [0, 0]
@@ -78,8 +78,10 @@ class TestFile(BaseTopazTest):
         path = '%s%snonexist2'
         f = File.new(path, 'w')
         f.puts "first"
+        f.close
         f = File.new(path, 'a')
         f.puts "second"
+        f.close
         f = File.new(path, 'r')
         return f.read
         """ % (tmpdir.dirname, os.sep))
@@ -158,6 +158,40 @@ class TestHashObject(BaseTopazTest):
         """)
         assert self.unwrap(space, w_res) == [[2, 3]]
 
+    def test_each_delete(self, space):
+        w_res = space.execute("""
+        x = {1 => 2, 3 => 4, 5 => 6}
+        x.each { |k, v| x.delete(k) if k > 1 }
+        return x.to_a
+        """)
+        assert self.unwrap(space, w_res) == [[1, 2]]
+
+    def test_each_skips_deleted(self, space):
+        w_res = space.execute("""
+        x = {1 => 2, 3 => 4, 5 => 6}
+        res = []
+        x.each { |k, v| x.delete(5); x[3] = 7; res << [k, v] }
+        y = {1 => 2, 3 => 4}
+        y.each_key { |k| y.delete(3); res << k }
+        z = {1 => 2, 3 => 4}
+        z.each_value { |v| z.delete(3); res << v }
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [[1, 2], [3, 7], 1, 2]
+
+    def test_each_mutated_key(self, space):
+        w_res = space.execute("""
+        a = [1]
+        h = {a => :x, [2] => :y}
+        a << 5
+        res = []
+        h.each { |k, v| res << v }
+        h.each_key { |k| res << k }
+        h.each_value { |v| res << v }
+        return res
+        """)
+        assert self.unwrap(space, w_res) == ["x", "y", [1, 5], [2], "x", "y"]
+
     def test_includep(self, space):
         w_res = space.execute("""
         h = { "a" => 100, "b" => 200 }
@@ -201,3 +235,94 @@ class TestHashObject(BaseTopazTest):
     def test_dup(self, space):
         w_res = space.execute("return {2 => 4}.dup.length")
         assert space.int_w(w_res) == 1
+
+    def test_strategies(self, space):
+        from topaz.objects.hashobject import (EmptyDictStrategy,
+            SymbolDictStrategy, FixnumDictStrategy, StringDictStrategy,
+            ObjectDictStrategy)
+
+        w_res = space.execute("return {}")
+        assert isinstance(w_res.strategy, EmptyDictStrategy)
+        w_res = space.execute("return {:a => 1, :b => 2}")
+        assert isinstance(w_res.strategy, SymbolDictStrategy)
+        w_res = space.execute("return {1 => :a, 2 => :b}")
+        assert isinstance(w_res.strategy, FixnumDictStrategy)
+        w_res = space.execute("return {'a' => 1, 'b' => 2}")
+        assert isinstance(w_res.strategy, StringDictStrategy)
+        w_res = space.execute("return {:a => 1, 'b' => 2}")
+        assert isinstance(w_res.strategy, ObjectDictStrategy)
+        assert self.unwrap(space, space.send(w_res, "keys")) == ["a", "b"]
+
+    def test_typed_strategy_lookup(self, space):
+        w_res = space.execute("""
+        h = {"a" => 1, "b" => 2}
+        return h["a"], h["c"], h[:a], h.key?("b"), h.delete("a"), h.keys
+        """)
+        assert self.unwrap(space, w_res) == [1, None, None, True, 1, ["b"]]
+        w_res = space.execute("""
+        class Key
+          def hash; 1.hash; end
+          def eql?(other); other == 1; end
+        end
+        h = {1 => :one, 2 => :two}
+        return h[Key.new], h[2]
+        """)
+        assert self.unwrap(space, w_res) == ["one", "two"]
+
+    def test_lookup_keeps_strategy(self, space):
+        from topaz.objects.hashobject import StringDictStrategy, ObjectDictStrategy
+
+        w_res = space.execute("""
+        $h = {"a" => 1, "b" => 2}
+        return [$h[nil], $h.key?(1.5), $h.delete(true), $h[:a], $h[2 ** 70]]
+        """)
+        assert self.unwrap(space, w_res) == [None, False, None, None, None]
+        w_h = space.globals.get(space, "$h")
+        assert isinstance(w_h.strategy, StringDictStrategy)
+        w_res = space.execute("""
+        class Key
+          def hash; "a".hash; end
+          def eql?(other); other == "a"; end
+        end
+        return [$h[Key.new], $h.key?(Key.new), $h["b"]]
+        """)
+        assert self.unwrap(space, w_res) == [1, True, 2]
+        assert isinstance(w_h.strategy, ObjectDictStrategy)
+
+    def test_foreign_key_lookups_are_hashed(self, space, monkeypatch):
+        calls = []
+        hash_w = space.hash_w
+
+        def counting_hash_w(w_obj):
+            calls.append(w_obj)
+            return hash_w(w_obj)
+        monkeypatch.setattr(space, "hash_w", counting_hash_w)
+        w_res = space.execute("""
+        Key = Struct.new(:i)
+        h = {}
+        200.times { |i| h[i] = i }
+        return (0...200).count { |i| h.key?(Key.new(i)) }
+        """)
+        assert space.int_w(w_res) == 0
+        # One hash per stored key when switching strategies, and one per
+        # probe after that, not one per stored key for every probe.
+        assert len(calls) < 4 * 200
+
+    def test_user_defined_hash_despecializes(self, space):
+        from topaz.objects.hashobject import ObjectDictStrategy
+
+        w_res = space.execute("""
+        class MyString < String
+          def hash; 0; end
+        end
+        h = {"a" => 1}
+        h[MyString.new("b")] = 2
+        return h
+        """)
+        assert isinstance(w_res.strategy, ObjectDictStrategy)
+        w_res = space.execute("""
+        h = {"a" => 1}
+        h[MyString.new("b")] = 2
+        return h["a"], h[MyString.new("b")], h.size
+        """)
+        assert self.unwrap(space, w_res) == [1, 2, 2]
@@ -173,6 +173,34 @@ class TestFixnumObject(BaseTopazTest):
         """)
         assert self.unwrap(space, w_res) == [3, 4, 5, 6]
 
+    def test_downto(self, space):
+        w_res = space.execute("""
+        res = []
+        r = 3.downto(1) { |x| res << x }
+        return [res, r]
+        """)
+        assert self.unwrap(space, w_res) == [[3, 2, 1], 3]
+
+    def test_upto_downto_float_limit(self, space):
+        w_res = space.execute("""
+        up = []
+        1.upto(2.5) { |x| up << x }
+        down = []
+        3.downto(1.5) { |x| down << x }
+        return [up, down, (up + down).all? { |x| x.is_a?(Fixnum) }]
+        """)
+        assert self.unwrap(space, w_res) == [[1, 2], [3, 2], True]
+
+    def test_loop_bounds(self, space):
+        w_res = space.execute("""
+        res = []
+        (Topaz::FIXNUM_MAX - 1).upto(Topaz::FIXNUM_MAX) { |x| res << x }
+        (-Topaz::FIXNUM_MAX - 1).downto(-Topaz::FIXNUM_MAX - 1) { |x| res << x }
+        (-3).times { |x| res << x }
+        return res.size
+        """)
+        assert space.int_w(w_res) == 3
+
     def test_comparator_lt(self, space):
         w_res = space.execute("return 1 <=> 2")
         assert space.int_w(w_res) == -1
@@ -316,3 +344,11 @@ class TestFixnumObject(BaseTopazTest):
         return res
         """)
         assert self.unwrap(space, w_res) == [1.0, 1.6]
+        w_res = space.execute("""
+        res = []
+        5.step(1, -2) { |i| res << i }
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [5, 3, 1]
+        with self.raises(space, "ArgumentError", "step can't be 0"):
+            space.execute("1.step(2, 0) { }")
@@ -32,7 +32,7 @@ class TestIO(BaseTopazTest):
     def test_write(self, space, capfd, tmpdir):
         content = "foo\n"
         space.execute('return IO.new(1, "w").write("%s")' % content)
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == content
         content = "foo\n"
 
@@ -46,7 +46,7 @@ class TestIO(BaseTopazTest):
 
     def test_push(self, space, capfd, tmpdir):
         space.execute('return IO.new(1, "w") << "hello" << "world"')
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "helloworld"
 
         f = tmpdir.join("file.txt")
@@ -87,7 +87,7 @@ class TestIO(BaseTopazTest):
 
     def test_simple_print(self, space, capfd, tmpdir):
         space.execute('IO.new(1, "w").print("foo")')
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "foo"
 
         f = tmpdir.join("file.txt")
@@ -100,7 +100,7 @@ class TestIO(BaseTopazTest):
 
     def test_multi_print(self, space, capfd):
         space.execute('IO.new(1, "w").print("This", "is", 100, "percent")')
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "Thisis100percent"
 
     def test_print_globals(self, space, capfd):
@@ -109,7 +109,7 @@ class TestIO(BaseTopazTest):
         space.execute('IO.new(1, "w").print("foo", "bar", "baz")')
         space.globals.set(space, "$_", space.newstr_fromstr('lastprint'))
         space.execute('IO.new(1, "w").print')
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "foo:bar:baz\nlastprint\n"
 
     def test_non_string_print_globals(self, space, capfd):
@@ -118,12 +118,19 @@ class TestIO(BaseTopazTest):
         space.execute('IO.new(1, "w").print("foo", "bar", "baz")')
         space.globals.set(space, "$_", space.w_nil)
         space.execute('IO.new(1, "w").print')
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "foobarbaz"
 
+    def test_pending_writes_keep_order(self, space, capfd):
+        space.execute("""
+        20.times { |i| IO.new(1, "w").print(i, " ") }
+        """)
+        out, err = self.readouterr(space, capfd)
+        assert out == " ".join([str(i) for i in range(20)]) + " "
+
     def test_puts(self, space, capfd, tmpdir):
         space.execute("IO.new(1, 'w').puts('This', 'is\n', 100, 'percent')")
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "This\nis\n100\npercent\n"
 
         f = tmpdir.join("file.txt")
@@ -136,7 +143,7 @@ class TestIO(BaseTopazTest):
 
     def test_flush(self, space, capfd, tmpdir):
         space.execute("IO.new(1, 'w').flush.puts('String')")
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "String\n"
 
         f = tmpdir.join("file.txt")
@@ -147,6 +154,77 @@ class TestIO(BaseTopazTest):
             io.flush
             """ % f)
 
+    def test_buffered_write(self, space, tmpdir):
+        f = tmpdir.join("file.txt")
+        w_res = space.execute("""
+        res = []
+        io = File.new('%s', "w")
+        io.write("foo")
+        res << File.read('%s')
+        io.flush
+        res << File.read('%s')
+        io.puts "bar"
+        io.close
+        res << File.read('%s')
+        return res
+        """ % (f, f, f, f))
+        assert self.unwrap(space, w_res) == [None, "foo", "foobar\n"]
+
+    def test_sync(self, space, tmpdir):
+        f = tmpdir.join("file.txt")
+        w_res = space.execute("""
+        io = File.new('%s', "w")
+        res = [io.sync]
+        io.write("foo")
+        io.sync = true
+        res << File.read('%s')
+        io.write("bar")
+        res << File.read('%s')
+        return res, STDOUT.sync, STDERR.sync
+        """ % (f, f, f))
+        assert self.unwrap(space, w_res) == [[False, "foo", "foobar"], False, True]
+
+    def test_buffer_size(self, space, tmpdir):
+        f = tmpdir.join("file.txt")
+        w_res = space.execute("""
+        io = File.new('%s', "w")
+        io.buffer_size = 4
+        io.write("ab")
+        res = [File.read('%s')]
+        io.write("cde")
+        res << File.read('%s')
+        return io.buffer_size, res
+        """ % (f, f, f))
+        assert self.unwrap(space, w_res) == [4, [None, "ab"]]
+        with self.raises(space, "ArgumentError"):
+            space.execute("STDOUT.buffer_size = 0")
+
+    def test_buffered_read(self, space, tmpdir):
+        f = tmpdir.join("file.txt")
+        f.write("abcdef")
+        w_res = space.execute("""
+        io = File.new('%s', "r+")
+        res = [io.getc, io.read(2), io.pos]
+        io.write("X")
+        io.rewind
+        res << io.read
+        return res
+        """ % f)
+        assert self.unwrap(space, w_res) == ["a", "bc", 3, "abcXef"]
+
+    def test_ungetc(self, space, tmpdir):
+        f = tmpdir.join("file.txt")
+        f.write("bc")
+        w_res = space.execute("""
+        io = File.new('%s')
+        io.ungetc("a")
+        res = [io.getc]
+        io.ungetc(120)
+        res << io.read
+        return res
+        """ % f)
+        assert self.unwrap(space, w_res) == ["a", "xbc"]
+
     def test_globals(self, space, capfd):
         w_res = space.execute("""
         STDOUT.puts("STDOUT")
@@ -156,7 +234,7 @@ class TestIO(BaseTopazTest):
         $stderr.puts("$stderr")
         return STDIN.read, $stdin.read
         """)
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "STDOUT\n$stdout\n$>\n"
         assert err == "STDERR\n$stderr\n"
         assert self.unwrap(space, w_res) == [None, None]
@@ -203,6 +281,12 @@ class TestIO(BaseTopazTest):
             io.close
             io.seek 2
             """ % f)
+        with self.raises(space, "SystemCallError"):
+            space.execute("""
+            r, w = IO.pipe
+            w.write "buffered"
+            w.seek 2
+            """)
 
     def test_pos(self, space, tmpdir):
         f = tmpdir.join("file.txt")
@@ -341,5 +425,5 @@ class TestIO(BaseTopazTest):
           io.write 'foo\n'
         end
         """)
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "foo\n"
@@ -396,6 +396,40 @@ class TestModuleObject(BaseTopazTest):
         """)
         assert self.unwrap(space, w_res) == ['ZzŻżŹź', 'utf_8_is_legal']
 
+    def test_const_set_keeps_method_version(self, space):
+        w_mod = space.execute("""
+        module M
+          def f; end
+        end
+        return M
+        """)
+        version = w_mod.version
+        const_version = w_mod.const_version
+        space.execute("""
+        module M
+          X = 1
+          class Inner; end
+        end
+        """)
+        assert w_mod.version is version
+        assert w_mod.const_version is not const_version
+
+    def test_version_stats(self, space):
+        w_res = space.execute("""
+        before = Topaz.version_stats
+        module M
+          X = 1
+          def f; end
+          @@y = 2
+        end
+        after = Topaz.version_stats
+        return [:methods, :constants, :class_variables].map { |k| after[k] - before[k] }
+        """)
+        [methods, constants, class_variables] = self.unwrap(space, w_res)
+        assert methods >= 1
+        assert constants >= 1
+        assert class_variables == 1
+
     def test_to_s(self, space):
         w_res = space.execute("return Kernel.class.to_s")
         assert space.str_w(w_res) == "Module"
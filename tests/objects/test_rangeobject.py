@@ -84,3 +84,37 @@ class TestRangeObject(BaseTopazTest):
         return r.each {}.equal?(r)
         """)
         assert w_res is space.w_true
+
+    def test_each_fixnum(self, space):
+        w_res = space.execute("""
+        res = []
+        (1...4).each { |x| res << x }
+        (3...3).each { |x| res << x }
+        (5..4).each { |x| res << x }
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [1, 2, 3]
+
+    def test_step_fixnum(self, space):
+        w_res = space.execute("""
+        res = []
+        (1...7).step(3) { |x| res << x }
+        (1..7).step(3) { |x| res << x }
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [1, 4, 1, 4, 7]
+
+    def test_to_a(self, space):
+        w_res = space.execute("return (1..4).to_a")
+        assert self.unwrap(space, w_res) == [1, 2, 3, 4]
+        w_res = space.execute("return (4...1).to_a")
+        assert self.unwrap(space, w_res) == []
+        w_res = space.execute("return ('a'..'c').to_a")
+        assert self.unwrap(space, w_res) == ["a", "b", "c"]
+
+    def test_size(self, space):
+        w_res = space.execute("return [(1..4).size, (1...4).size, (4..1).size]")
+        assert self.unwrap(space, w_res) == [4, 3, 0]
+        w_res = space.execute("return [(1..4.5).size, (1...4.0).size]")
+        assert self.unwrap(space, w_res) == [4, 3]
+        assert space.execute("return ('a'..'c').size") is space.w_nil
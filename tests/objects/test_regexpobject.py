@@ -140,6 +140,67 @@ class TestRegexpObject(BaseTopazTest):
         w_res = space.execute("return Regexp.new(/abc/).source")
         assert space.str_w(w_res) == "abc"
 
+    def test_literal_prefix(self, space):
+        w_res = space.execute("""
+        return [
+          /abab/ =~ "xxabacabab",
+          /abcabd/ =~ "abcabcabd",
+          /ab(cd)e/.match("abcdabcde")[1],
+          /(abc)d/ =~ "zabcabcd",
+          /GET \/(\w+)/.match("POST /a\nGET /index")[1],
+          /abc/ =~ "ab",
+          "xabyabz".scan(/ab./),
+          /abc/.match("abc abc", 1).begin(0),
+        ]
+        """)
+        assert self.unwrap(space, w_res) == [6, 3, "cd", 4, "index", None, ["aby", "abz"], 4]
+
+    def test_required_literal(self, space):
+        w_res = space.execute("""
+        return [
+          /^\d+ ERROR (\w+)/ =~ "12 INFO a\n34 ERROR b",
+          /\d+ ERROR/ =~ "12 INFO",
+          /x+yz/.match("xyzxxyz", 1).begin(0),
+          /x+yz/.match("xyzxxy", 1),
+          "a-b-c".split(/-b/),
+          "a1b2c3".gsub(/\db/, "_"),
+        ]
+        """)
+        assert self.unwrap(space, w_res) == [10, None, 3, None, ["a", "-c"], "a_2c3"]
+
+    def test_regexp_cache(self, space):
+        from topaz.objects.regexpobject import RegexpCache
+
+        cache = space.fromcache(RegexpCache)
+        cache.SIZE = 2
+        cache._contents.clear()
+        w_res = space.execute("""
+        before = Topaz.regexp_cache_stats
+        res = []
+        3.times do |i|
+          res << (Regexp.new("a#{i}") =~ "xa#{i}")
+          res << (Regexp.new("a#{i}") =~ "xa#{i}")
+        end
+        res << (Regexp.new("a0") =~ "a0")
+        after = Topaz.regexp_cache_stats
+        return res, [:hits, :misses, :evictions].map { |k| after[k] - before[k] }, after[:size]
+        """)
+        assert self.unwrap(space, w_res) == [[1, 1, 1, 1, 1, 1, 0], [3, 4, 2], 2]
+
+    def test_regexp_cache_lookup_is_pure(self, space):
+        from topaz.objects.regexpobject import RegexpCache
+
+        cache = space.fromcache(RegexpCache)
+        cache._contents.clear()
+        cache.compile("a", 0)
+        cache.compile("b", 0)
+        stats = [cache.hits, cache.misses, cache.evictions]
+        # The elidable part never touches the stats or the LRU order.
+        assert cache._lookup("a", 0) is cache._contents[("a", 0)]
+        assert cache._lookup("c", 0) is not None
+        assert [cache.hits, cache.misses, cache.evictions] == stats
+        assert cache._contents.keys() == [("a", 0), ("b", 0)]
+
     def test_allocate(self, space):
         with self.raises(space, "TypeError", "uninitialized Regexp"):
             space.execute("Regexp.allocate.source")
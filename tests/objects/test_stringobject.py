@@ -17,10 +17,55 @@ class TestStringObject(BaseTopazTest):
         w_res = space.execute('return "abc".concat("def").concat("ghi")')
         assert space.str_w(w_res) == "abcdefghi"
 
+    def test_mutation_after_read(self, space):
+        w_res = space.execute("""
+        s = "ab"
+        s << "cd"
+        res = []
+        res << s.include?("cd")
+        s << "ef"
+        res << s.index("ef")
+        s.upcase!
+        res << s.include?("CD")
+        s.chop!
+        res << s.dup
+        s[0] = "x"
+        res << s.include?("x")
+        s.replace("q")
+        res << (s =~ /q/)
+        s.clear
+        res << s.include?("q")
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [True, 4, True, "ABCDE", True, 0, False]
+
+    def test_frozen_strings_dont_presize(self, space):
+        w_res = space.execute("""
+        100.times { "x".dup.freeze }
+        return "x".dup
+        """)
+        assert w_res.object_storage is None
+
     def test_plus(self, space):
         w_res = space.execute('return "abc" + "def" + "ghi"')
         assert space.str_w(w_res) == "abcdefghi"
 
+    def test_plus_long(self, space):
+        w_res = space.execute("""
+        a = "a" * 300
+        s = ""
+        100.times { |i| s = s + "<#{i}>" + a }
+        t = "#{s}|#{a}|#{s}"
+        res = [s.length, s[0, 4], s[-3, 3], t.length, t.index("|"), {s => 1}[s.dup]]
+        u = t + "x"
+        u << "y"
+        res << u[-2, 2]
+        res << t.end_with?("a")
+        return res
+        """)
+        l = sum(len("<%d>" % i) + 300 for i in xrange(100))
+        assert self.unwrap(space, w_res) == [l, "<0>a", "aaa", 2 * l + 302, l, 1, "xy", True]
+
     def test_mul(self, space):
         w_res = space.execute("return 'abc' * 2")
         assert space.str_w(w_res) == "abcabc"
@@ -130,6 +175,21 @@ class TestStringObject(BaseTopazTest):
         h1, h2 = self.unwrap(space, w_res)
         assert h1 == h2
 
+    def test_hash_after_mutation(self, space):
+        w_res = space.execute("""
+        s = 'a' << 'b'
+        before = s.hash
+        s << 'c'
+        h = {'abc' => 1, 'abcd' => 2}
+        res = [s.hash == before, s.hash == 'abc'.hash, h[s]]
+        s[3, 0] = 'd'
+        res << (s.hash == 'abcd'.hash) << h[s]
+        s.clear
+        res << h[s]
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [False, True, 1, True, 2, None]
+
     def test_to_sym(self, space):
         w_res = space.execute("return 'abc'.to_sym")
         assert space.symbol_w(w_res) == "abc"
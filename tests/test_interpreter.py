@@ -11,7 +11,7 @@ class TestInterpreter(BaseTopazTest):
 
     def test_global_send(self, space, capfd):
         space.execute("puts 1")
-        out, err = capfd.readouterr()
+        out, err = self.readouterr(space, capfd)
         assert out == "1\n"
         assert not err
 
@@ -695,6 +695,238 @@ class TestInterpreter(BaseTopazTest):
         """)
         assert w_res is space.w_nil
 
+    def test_send_cache_invalidation(self, space):
+        w_res = space.execute("""
+        class A
+          def f; 1; end
+        end
+        class B < A
+        end
+        res = []
+        b = B.new
+        3.times do |i|
+          res << b.f
+          if i == 0
+            class A
+              def f; 2; end
+            end
+          elsif i == 1
+            module M
+              def f; 3; end
+            end
+            class B
+              include M
+            end
+          end
+        end
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [1, 2, 3]
+
+    def test_send_cache_ancestor_invalidation(self, space):
+        w_res = space.execute("""
+        class A; end
+        class B < A; end
+        module M
+          def f; 1; end
+        end
+        res = []
+        3.times do |i|
+          res << (B.respond_to?(:f) ? B.f : nil)
+          if i == 0
+            A.extend M
+          elsif i == 1
+            module M
+              def f; 2; end
+            end
+          end
+        end
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [None, 1, 2]
+
+    def test_define_method_keeps_other_versions(self, space):
+        w_string = space.w_string
+        w_singleton = space.getsingletonclass(w_string)
+        version = w_string.version
+        singleton_version = w_singleton.version
+        object_version = space.w_object.version
+        space.execute("""
+        def f; end
+        module Kernel
+          def g; end
+        end
+        """)
+        assert w_string.version is version
+        assert w_singleton.version is singleton_version
+        assert space.w_object.version is not object_version
+
+    def test_send_cache_polymorphic(self, space):
+        w_res = space.execute("""
+        classes = (1..6).map { |i| Class.new { define_method(:f) { i } } }
+        res = []
+        2.times do
+          classes.each { |c| res << c.new.f }
+        end
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [1, 2, 3, 4, 5, 6] * 2
+
+    def test_send_cache_stats(self, space):
+        w_res = space.execute("""
+        before = Topaz.inline_cache_stats
+        10.times { 1.to_s }
+        after = Topaz.inline_cache_stats
+        return [after[:hits] - before[:hits], after[:misses] - before[:misses]]
+        """)
+        [hits, misses] = self.unwrap(space, w_res)
+        assert hits >= 9
+        assert misses >= 1
+
+    def test_instance_var_cache(self, space):
+        w_res = space.execute("""
+        class A
+          def initialize(first)
+            @a = 1 if first
+            @b = 2
+          end
+          def get; [@a, @b]; end
+          def set(v); @b = v; end
+        end
+        class B
+          def get; [@a, @b]; end
+        end
+        objs = [A.new(true), A.new(false), A.new(true)]
+        objs[2].set(1.5)
+        objs[2].set("x")
+        res = objs.map { |o| o.get }
+        res << B.new.get
+        res << A.instance_exec { @c = 3; [@a, @c] }
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [
+            [1, 2], [None, 2], [1, "x"], [None, None], [None, 3]
+        ]
+
+    def test_instance_var_cache_stats(self, space):
+        w_res = space.execute("""
+        class A
+          def initialize; @a = 1; end
+          def get; @a; end
+        end
+        a = A.new
+        before = Topaz.instance_var_cache_stats
+        i = 0
+        while i < 10
+          a.get
+          i += 1
+        end
+        after = Topaz.instance_var_cache_stats
+        return [after[:hits] - before[:hits], after[:misses] - before[:misses]]
+        """)
+        assert self.unwrap(space, w_res) == [9, 1]
+
+    def test_constant_cache_invalidation(self, space):
+        w_res = space.execute("""
+        module M
+          X = 3
+        end
+        class A
+          def f; X; end
+        end
+        X = 1
+        res = []
+        a = A.new
+        4.times do |i|
+          res << a.f
+          if i == 0
+            Object.send(:remove_const, :X)
+            X = 2
+          elsif i == 1
+            class A
+              include M
+            end
+          elsif i == 2
+            A.const_set(:X, 4)
+          end
+        end
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [1, 2, 3, 4]
+
+    def test_constant_cache_const_missing(self, space):
+        w_res = space.execute("""
+        class A
+          def self.const_missing(name); :missing; end
+          def self.f; Y; end
+        end
+        res = [A.f]
+        A.const_set(:Y, 1)
+        res << A.f
+        return res
+        """)
+        assert self.unwrap(space, w_res) == ["missing", 1]
+
+    def test_constant_cache_stats(self, space):
+        w_res = space.execute("""
+        X = 1
+        sends = Topaz.inline_cache_stats
+        before = Topaz.constant_cache_stats
+        10.times { X }
+        after = Topaz.constant_cache_stats
+        return [
+          after[:hits] - before[:hits], after[:misses] - before[:misses],
+          Topaz.inline_cache_stats[:hits] - sends[:hits]
+        ]
+        """)
+        [hits, misses, send_hits] = self.unwrap(space, w_res)
+        # The second Topaz lookup misses too.
+        assert [hits, misses] == [9, 2]
+        assert send_hits < 5
+
+    def test_method_cache_respond_to_invalidation(self, space):
+        w_res = space.execute("""
+        class A; end
+        class B < A; end
+        module M
+        end
+        res = [B.new.respond_to?(:f)]
+        module M
+          def f; end
+        end
+        class A
+          include M
+        end
+        res << B.new.respond_to?(:f)
+        module M
+          remove_method :f
+        end
+        res << B.new.respond_to?(:f)
+        return res
+        """)
+        assert self.unwrap(space, w_res) == [False, True, False]
+
+    def test_method_cache_method_missing_invalidation(self, space):
+        w_res = space.execute("""
+        class A
+          def method_missing(name, *args)
+            name
+          end
+        end
+        a = A.new
+        res = [a.foo]
+        class A
+          def foo; 1; end
+        end
+        res << a.foo
+        class A
+          remove_method :foo
+        end
+        res << a.foo
+        return res
+        """)
+        assert self.unwrap(space, w_res) == ["foo", 1, "foo"]
+
     def test_global_variables(self, space):
         w_res = space.execute("return $abc")
         assert w_res is space.w_nil
@@ -318,3 +318,48 @@ class TestMain(object):
         self.run(space, tmpdir, None, ruby_args=[str(tmpdir.join("t.rb"))], status=1)
         out, err = capfd.readouterr()
         assert err == "No such file or directory -- %s (LoadError)\n" % tmpdir.join("t.rb")
+
+    def test_setup_keeps_loaded_kernel(self, space):
+        import topaz
+
+        space.execute("""
+        class Array
+          def first
+            :patched
+          end
+        end
+        """)
+        space.setup(topaz.__file__)
+        assert space.symbol_w(space.execute("return [1].first")) == "patched"
+
+    def test_kernel_snapshot(self, tmpdir, capfd, monkeypatch):
+        import copy
+
+        import topaz
+
+        from rpython.config.translationoption import get_combined_translation_config
+
+        from topaz.main import get_topaz_config_options
+        from topaz.objspace import ObjectSpace
+
+        space = ObjectSpace(get_combined_translation_config(
+            overrides=get_topaz_config_options(),
+        ))
+        space.load_kernel_snapshot()
+        assert space.kernel_loaded
+        # The translated binary starts from a frozen copy of the space.
+        space = copy.deepcopy(space)
+
+        def load_kernel(kernel_path):
+            raise AssertionError("kernel loaded twice")
+        monkeypatch.setattr(space, "load_kernel", load_kernel)
+        space.setup(topaz.__file__)
+        self.run(space, tmpdir, """
+        S = Struct.new(:a, :b)
+        puts S.new(1, 2).to_a.inspect
+        puts [3, 1, 2].sort_by { |x| -x }.inspect
+        puts RUBY_ENGINE
+        """)
+        out, err = capfd.readouterr()
+        assert out == "[1, 2]\n[3, 2, 1]\ntopaz\n"
+        assert not err
@@ -39,3 +39,52 @@ class TestMapDict(object):
 
         assert class_node.size_estimate.object_size_estimate() in [(i + 10) // 2, (i + 11) // 2]
         assert class_node.size_estimate.unboxed_size_estimate() == 0
+
+    def test_find(self, space):
+        class_node = mapdict.ClassNode(None)
+        w_obj = FakeObject(class_node)
+        for a in ["@a", "@b", "frozen?"]:
+            w_obj.map = w_obj.map.add(space, mapdict.ObjectAttributeNode, a, w_obj)
+        w_obj.map = w_obj.map.add(space, mapdict.FlagNode, "frozen?", w_obj)
+
+        assert w_obj.map.find(mapdict.ClassNode) is class_node
+        assert w_obj.map.find(mapdict.AttributeNode, "@b").pos == 1
+        assert w_obj.map.find(mapdict.AttributeNode, "frozen?").pos == 2
+        assert w_obj.map.find(mapdict.FlagNode, "frozen?").pos == 3
+        assert w_obj.map.find(mapdict.AttributeNode, "@c") is None
+        assert w_obj.map.find(mapdict.FlagNode, "@a") is None
+        # Earlier maps only know about their own attributes.
+        assert w_obj.map.prev.prev.find(mapdict.AttributeNode, "frozen?") is None
+
+    def test_allocate_storage(self, space):
+        class_node = mapdict.ClassNode(None)
+        for j in range(1000):
+            w_obj = FakeObject(class_node)
+            class_node.allocate_storage(w_obj)
+            for a in "abc":
+                w_obj.map = w_obj.map.add(space, mapdict.ObjectAttributeNode, a, w_obj)
+            w_obj.map = w_obj.map.add(space, mapdict.IntAttributeNode, "d", w_obj)
+
+        w_obj = FakeObject(class_node)
+        class_node.allocate_storage(w_obj)
+        object_storage = w_obj.object_storage
+        unboxed_storage = w_obj.unboxed_storage
+        assert len(object_storage) == 3
+        assert len(unboxed_storage) == 1
+        for a in "abc":
+            w_obj.map = w_obj.map.add(space, mapdict.ObjectAttributeNode, a, w_obj)
+        w_obj.map = w_obj.map.add(space, mapdict.IntAttributeNode, "d", w_obj)
+        assert w_obj.object_storage is object_storage
+        assert w_obj.unboxed_storage is unboxed_storage
+
+    def test_flags_dont_presize(self, space):
+        class_node = mapdict.ClassNode(None)
+        for j in range(1000):
+            w_obj = FakeObject(class_node)
+            class_node.allocate_storage(w_obj)
+            w_obj.map = w_obj.map.add(space, mapdict.FlagNode, "frozen?", w_obj)
+
+        w_obj = FakeObject(class_node)
+        class_node.allocate_storage(w_obj)
+        assert w_obj.object_storage is None
+        assert w_obj.unboxed_storage is None
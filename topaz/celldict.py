@@ -11,6 +11,18 @@ class VersionTag(object):
         return result
 
 
+class VersionStats(object):
+    """
+    Counts how often module method, constant and class variable versions
+    are replaced, each one being a potential JIT trace or cache invalidation.
+    """
+
+    def __init__(self, space):
+        self.methods = 0
+        self.constants = 0
+        self.class_variables = 0
+
+
 class BaseCell(W_Root):
     pass
 
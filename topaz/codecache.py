@@ -0,0 +1,406 @@
+import os
+
+from rpython.rlib import rmd5, rpath
+from rpython.rlib.rarithmetic import intmask, r_ulonglong
+from rpython.rlib.rbigint import rbigint
+from rpython.rlib.rstruct.ieee import float_pack, float_unpack
+from rpython.rlib.streamio import open_file_as_stream
+
+from topaz.objects.bignumobject import W_BignumObject
+from topaz.objects.codeobject import W_CodeObject
+from topaz.objects.floatobject import W_FloatObject
+from topaz.objects.intobject import W_FixnumObject
+from topaz.objects.regexpobject import W_RegexpObject
+from topaz.objects.symbolobject import W_SymbolObject
+from topaz.system import RUBY_DESCRIPTION
+
+
+MAGIC = "TPZC"
+# Bump this whenever the layout below or the bytecode changes.
+FORMAT_VERSION = 1
+
+CONST_NIL = "n"
+CONST_TRUE = "t"
+CONST_FALSE = "f"
+CONST_OBJECT = "O"
+CONST_FIXNUM = "i"
+CONST_BIGNUM = "l"
+CONST_FLOAT = "d"
+CONST_SYMBOL = ":"
+CONST_REGEXP = "/"
+CONST_CODE = "c"
+
+
+class UnsupportedConstError(Exception):
+    pass
+
+
+class CorruptCacheError(Exception):
+    pass
+
+
+class CodeWriter(object):
+    def __init__(self, space):
+        self.space = space
+        self.chunks = []
+
+    def getvalue(self):
+        return "".join(self.chunks)
+
+    def write_byte(self, c):
+        self.chunks.append(c)
+
+    def write_raw(self, data):
+        self.chunks.append(data)
+
+    def write_int(self, value):
+        value = r_ulonglong(value)
+        for i in xrange(8):
+            self.chunks.append(chr(intmask((value >> (i * 8)) & 0xff)))
+
+    def write_float(self, value):
+        packed = float_pack(value, 8)
+        for i in xrange(8):
+            self.chunks.append(chr(intmask((packed >> (i * 8)) & 0xff)))
+
+    def write_str(self, value):
+        self.write_int(len(value))
+        self.chunks.append(value)
+
+    def write_optional_str(self, value):
+        if value is None:
+            self.write_int(-1)
+        else:
+            self.write_str(value)
+
+    def write_str_list(self, values):
+        self.write_int(len(values))
+        for value in values:
+            self.write_str(value)
+
+    def write_int_list(self, values):
+        self.write_int(len(values))
+        for value in values:
+            self.write_int(value)
+
+    def write_code_list(self, codes):
+        self.write_int(len(codes))
+        for bc in codes:
+            self.write_code(bc)
+
+    def write_code(self, bc):
+        # The filepath isn't stored, it's the path the file is loaded by.
+        self.write_str(bc.name)
+        self.write_int(bc.lineno)
+        self.write_str(bc.code)
+        self.write_int(bc.max_stackdepth)
+        self.write_int(len(bc.consts_w))
+        for w_const in bc.consts_w:
+            self.write_const(w_const)
+        self.write_str_list([bc.cellvars[pos] for pos in bc.arg_pos])
+        self.write_optional_str(self._cellvar(bc, bc.splat_arg_pos))
+        self.write_str_list(bc.kwarg_names)
+        self.write_optional_str(self._cellvar(bc, bc.kwrest_pos))
+        self.write_optional_str(self._cellvar(bc, bc.block_arg_pos))
+        self.write_code_list(bc.defaults)
+        self.write_optional_str(self._cellvar(bc, bc.default_arg_begin))
+        self.write_code_list(bc.kw_defaults)
+        self.write_str_list(bc.cellvars)
+        self.write_str_list(bc.freevars)
+        self.write_int_list(bc.lineno_table)
+
+    def _cellvar(self, bc, pos):
+        if pos == -1:
+            return None
+        return bc.cellvars[pos]
+
+    def write_const(self, w_const):
+        space = self.space
+        if w_const is space.w_nil:
+            self.write_byte(CONST_NIL)
+        elif w_const is space.w_true:
+            self.write_byte(CONST_TRUE)
+        elif w_const is space.w_false:
+            self.write_byte(CONST_FALSE)
+        elif w_const is space.w_object:
+            self.write_byte(CONST_OBJECT)
+        elif isinstance(w_const, W_FixnumObject):
+            self.write_byte(CONST_FIXNUM)
+            self.write_int(w_const.intvalue)
+        elif isinstance(w_const, W_BignumObject):
+            self.write_byte(CONST_BIGNUM)
+            self.write_str(w_const.bigint.str())
+        elif isinstance(w_const, W_FloatObject):
+            self.write_byte(CONST_FLOAT)
+            self.write_float(w_const.floatvalue)
+        elif isinstance(w_const, W_SymbolObject):
+            self.write_byte(CONST_SYMBOL)
+            self.write_str(w_const.symbol)
+        elif isinstance(w_const, W_RegexpObject):
+            self.write_byte(CONST_REGEXP)
+            self.write_str(w_const.source)
+            self.write_int(w_const.flags)
+        elif isinstance(w_const, W_CodeObject):
+            self.write_byte(CONST_CODE)
+            self.write_code(w_const)
+        else:
+            raise UnsupportedConstError
+
+
+class CodeReader(object):
+    def __init__(self, space, data, filepath):
+        self.space = space
+        self.data = data
+        self.filepath = filepath
+        self.pos = 0
+
+    def read_bytes(self, n):
+        start = self.pos
+        end = start + n
+        if n < 0 or end > len(self.data):
+            raise CorruptCacheError
+        assert start >= 0
+        self.pos = end
+        return self.data[start:end]
+
+    def read_byte(self):
+        return self.read_bytes(1)[0]
+
+    def read_uint(self):
+        s = self.read_bytes(8)
+        value = r_ulonglong(0)
+        for i in xrange(8):
+            value |= r_ulonglong(ord(s[i])) << (i * 8)
+        return value
+
+    def read_int(self):
+        return intmask(self.read_uint())
+
+    def read_float(self):
+        return float_unpack(self.read_uint(), 8)
+
+    def read_str(self):
+        return self.read_bytes(self.read_int())
+
+    def read_optional_str(self):
+        length = self.read_int()
+        if length == -1:
+            return None
+        return self.read_bytes(length)
+
+    def read_str_list(self):
+        return [self.read_str() for _ in xrange(self.read_int())]
+
+    def read_int_list(self):
+        return [self.read_int() for _ in xrange(self.read_int())]
+
+    def read_code_list(self):
+        return [self.read_code() for _ in xrange(self.read_int())]
+
+    def read_code(self):
+        name = self.read_str()
+        filepath = self.filepath
+        lineno = self.read_int()
+        code = self.read_str()
+        max_stackdepth = self.read_int()
+        consts_w = [self.read_const() for _ in xrange(self.read_int())]
+        args = self.read_str_list()
+        splat_arg = self.read_optional_str()
+        kwargs = self.read_str_list()
+        kwrest_arg = self.read_optional_str()
+        block_arg = self.read_optional_str()
+        defaults = self.read_code_list()
+        first_default_arg = self.read_optional_str()
+        kw_defaults = self.read_code_list()
+        cellvars = self.read_str_list()
+        freevars = self.read_str_list()
+        lineno_table = self.read_int_list()
+        for var in args + kwargs:
+            if var not in cellvars:
+                raise CorruptCacheError
+        for var in [splat_arg, kwrest_arg, block_arg, first_default_arg]:
+            if var is not None and var not in cellvars:
+                raise CorruptCacheError
+        return W_CodeObject(
+            name, filepath, lineno, code, max_stackdepth, consts_w, args,
+            splat_arg, kwargs, kwrest_arg, block_arg, defaults,
+            first_default_arg, kw_defaults, cellvars, freevars, lineno_table,
+        )
+
+    def read_const(self):
+        space = self.space
+        tag = self.read_byte()
+        if tag == CONST_NIL:
+            return space.w_nil
+        elif tag == CONST_TRUE:
+            return space.w_true
+        elif tag == CONST_FALSE:
+            return space.w_false
+        elif tag == CONST_OBJECT:
+            return space.w_object
+        elif tag == CONST_FIXNUM:
+            return space.newint(self.read_int())
+        elif tag == CONST_BIGNUM:
+            return space.newbigint_fromrbigint(rbigint.fromdecimalstr(self.read_str()))
+        elif tag == CONST_FLOAT:
+            return space.newfloat(self.read_float())
+        elif tag == CONST_SYMBOL:
+            return space.newsymbol(self.read_str())
+        elif tag == CONST_REGEXP:
+            source = self.read_str()
+            return space.newregexp(source, self.read_int())
+        elif tag == CONST_CODE:
+            return self.read_code()
+        else:
+            raise CorruptCacheError
+
+
+def read_file(path):
+    f = open_file_as_stream(path, buffering=0)
+    try:
+        return f.readall()
+    finally:
+        f.close()
+
+
+def write_file(path, data):
+    # Write to a temporary file first, so that concurrent processes never
+    # see a partially written cache entry.
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0644)
+    try:
+        while data:
+            written = os.write(fd, data)
+            data = data[written:]
+    finally:
+        os.close(fd)
+    os.rename(tmp_path, path)
+
+
+class CodeCache(object):
+    """
+    An on-disk cache of compiled files. Entries are keyed on the file's path,
+    mtime and size, and on the topaz build, so a stale or foreign entry is
+    simply recompiled. The cache lives in $TOPAZ_CACHE_DIR (by default
+    ~/.cache/topaz) and is disabled by setting $TOPAZ_NO_CODE_CACHE.
+    """
+
+    def __init__(self, space):
+        self.hits = 0
+        self.misses = 0
+        # The environment is only read at runtime, not at translation time.
+        self.cache_dir = None
+        self.initialized = False
+
+    def disable(self):
+        self.cache_dir = None
+        self.initialized = True
+
+    def reset(self):
+        self.cache_dir = None
+        self.initialized = False
+
+    def get_cache_dir(self):
+        if not self.initialized:
+            self.initialized = True
+            if not os.environ.get("TOPAZ_NO_CODE_CACHE"):
+                self.cache_dir = self._find_cache_dir()
+        return self.cache_dir
+
+    def _find_cache_dir(self):
+        cache_dir = os.environ.get("TOPAZ_CACHE_DIR")
+        if not cache_dir:
+            base = os.environ.get("XDG_CACHE_HOME")
+            if not base:
+                home = os.environ.get("HOME")
+                if not home:
+                    return None
+                base = os.path.join(home, ".cache")
+            cache_dir = os.path.join(base, "topaz")
+        try:
+            self._makedirs(cache_dir)
+        except OSError:
+            return None
+        return cache_dir
+
+    def _makedirs(self, path):
+        if os.path.isdir(path):
+            return
+        parent = os.path.dirname(path)
+        if parent and parent != path:
+            self._makedirs(parent)
+        try:
+            os.mkdir(path, 0755)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+
+    def entry_path(self, cache_dir, path):
+        return os.path.join(cache_dir, rmd5.RMD5(path).hexdigest() + ".tpzc")
+
+    def write_header(self, writer, path, st):
+        writer.write_str(MAGIC)
+        writer.write_int(FORMAT_VERSION)
+        writer.write_str(RUBY_DESCRIPTION)
+        writer.write_str(path)
+        writer.write_float(st.st_mtime)
+        writer.write_int(intmask(st.st_size))
+
+    def compile_file(self, space, path, source=None):
+        """
+        Returns the bytecode for the file at path, from the cache if
+        possible. OSErrors from reading the file are left to the caller.
+        """
+        st = os.stat(path)
+        cache_dir = self.get_cache_dir()
+        entry_path = None
+        header = None
+        if cache_dir is not None:
+            # Relative paths like "main.rb" name different files depending on
+            # the working directory, so entries are keyed on absolute ones.
+            abspath = rpath.rabspath(path)
+            entry_path = self.entry_path(cache_dir, abspath)
+            writer = CodeWriter(space)
+            self.write_header(writer, abspath, st)
+            header = writer.getvalue()
+            bc = self.load(space, entry_path, header, path)
+            if bc is not None:
+                self.hits += 1
+                return bc
+        self.misses += 1
+        if source is None:
+            source = read_file(path)
+        bc = space.compile(source, path)
+        if entry_path is not None:
+            assert header is not None
+            self.store(space, entry_path, header, bc)
+        return bc
+
+    def load(self, space, entry_path, header, path):
+        try:
+            data = read_file(entry_path)
+        except OSError:
+            return None
+        if not data.startswith(header):
+            return None
+        reader = CodeReader(space, data, path)
+        reader.pos = len(header)
+        try:
+            bc = reader.read_code()
+        except CorruptCacheError:
+            return None
+        if reader.pos != len(data):
+            return None
+        return bc
+
+    def store(self, space, entry_path, header, bc):
+        writer = CodeWriter(space)
+        writer.write_raw(header)
+        try:
+            writer.write_code(bc)
+        except UnsupportedConstError:
+            return
+        try:
+            write_file(entry_path, writer.getvalue())
+        except OSError:
+            pass
@@ -15,12 +15,13 @@ def format_traceback(space, exc, top_filepath):
     bt_w = space.listview(w_bt)
     if bt_w:
         yield "%s: %s (%s)\n" % (
-            space.str_w(bt_w[0]), exc.msg, space.getclass(exc).name)
+            space.str_w(bt_w[0]), exc.get_message(space),
+            space.getclass(exc).name)
         for w_line in bt_w[1:]:
             yield "\tfrom %s\n" % space.str_w(w_line)
     else:
         yield "%s: %s (%s)\n" % (
-            top_filepath, exc.msg, space.getclass(exc).name)
+            top_filepath, exc.get_message(space), space.getclass(exc).name)
 
 
 def print_traceback(space, w_exc, top_filepath=None):
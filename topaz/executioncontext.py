@@ -2,6 +2,7 @@ from rpython.rlib import jit
 
 from topaz.error import RubyError
 from topaz.frame import Frame
+from topaz.interpreter import TraceState
 from topaz.objects.fiberobject import W_FiberObject
 
 
@@ -39,8 +40,9 @@ class ExecutionContext(object):
             self.w_main_fiber = W_FiberObject.build_main_fiber(space, self)
         return self.w_main_fiber
 
-    def settraceproc(self, w_proc):
+    def settraceproc(self, space, w_proc):
         self.w_trace_proc = w_proc
+        space.fromcache(TraceState).enabled = w_proc is not None
 
     def gettraceproc(self):
         return self.w_trace_proc
@@ -49,7 +51,7 @@ class ExecutionContext(object):
         return self.w_trace_proc is not None and not self.in_trace_proc
 
     def invoke_trace_proc(self, space, event, scope_id, classname, frame=None):
-        if self.hastraceproc():
+        if space.fromcache(TraceState).enabled and self.hastraceproc():
             self.in_trace_proc = True
             try:
                 if frame is None:
@@ -74,10 +76,12 @@ class ExecutionContext(object):
             frame.back_last_instr = self.last_instr
         self.topframeref = jit.virtual_ref(frame)
 
-    def leave(self, frame, got_exception):
+    def leave(self, frame):
         frame_vref = self.topframeref
         self.topframeref = frame.backref
-        if frame.escaped or got_exception:
+        # Exceptions only keep the frame that rescued them, which marks itself
+        # as escaped, so unwinding doesn't need to force anything.
+        if frame.escaped:
             back = frame.backref()
             if back is not None:
                 back.escaped = True
@@ -121,13 +125,10 @@ class _VisitFrameContextManager(object):
         self.ec.enter(self.frame)
 
     def __exit__(self, exc_type, exc_value, tb):
-        ruby_exception = False
         if exc_value is not None and isinstance(exc_value, RubyError):
-            ruby_exception = True
-            if exc_value.w_value.frame is None:
-                exc_value.w_value.frame = self.frame
+            exc_value.w_value.record_unwind(self.frame)
 
-        self.ec.leave(self.frame, ruby_exception)
+        self.ec.leave(self.frame)
 
 
 class _RecursionGuardContextManager(object):
@@ -0,0 +1,135 @@
+import os
+
+from rpython.rlib import rpath
+
+from topaz.coerce import Coerce
+from topaz.objects.arrayobject import W_ArrayObject, WatchedArrayStrategy
+from topaz.objects.stringobject import W_StringObject
+
+
+class ArrayWatcher(object):
+    """
+    Keeps track of whether an array changed since the last call to
+    changed(), by installing a WatchedArrayStrategy on it.
+    """
+
+    def __init__(self, space):
+        self.strategy = WatchedArrayStrategy(space)
+        self.version = -1
+
+    def changed(self, space, w_array):
+        assert isinstance(w_array, W_ArrayObject)
+        if w_array.strategy is self.strategy and self.strategy.version == self.version:
+            return False
+        w_array.watch(space, self.strategy)
+        self.version = self.strategy.version
+        return True
+
+    def acknowledge(self):
+        """Marks the array's current contents as seen."""
+        self.version = self.strategy.version
+
+
+class LoadedFeatures(object):
+    """
+    A hash index of $LOADED_FEATURES, rebuilt whenever the array is mutated
+    by anything other than require itself.
+    """
+
+    def __init__(self, space):
+        self.watcher = ArrayWatcher(space)
+        self.index = {}
+        # False if $LOADED_FEATURES holds anything but Strings, in which case
+        # a miss in the index has to be confirmed by Array#include?.
+        self.exact = True
+
+    def sync(self, space):
+        w_features = space.w_loaded_features
+        if not self.watcher.changed(space, w_features):
+            return
+        self.index.clear()
+        self.exact = True
+        for w_feature in space.listview(w_features):
+            if isinstance(w_feature, W_StringObject):
+                self.index[space.str_w(w_feature)] = None
+            else:
+                self.exact = False
+
+    def contains(self, space, path):
+        self.sync(space)
+        if path in self.index:
+            return True
+        if self.exact:
+            return False
+        return space.is_true(space.send(
+            space.w_loaded_features, "include?", [space.newstr_fromstr(path)]
+        ))
+
+    def add(self, space, path):
+        self.sync(space)
+        space.w_loaded_features.append(space, space.newstr_fromstr(path))
+        self.index[path] = None
+        self.watcher.acknowledge()
+
+
+class LoadPathCache(object):
+    """
+    Caches the directory listing of each $LOAD_PATH entry, so that looking
+    a feature up only stats the files that actually exist. The listings
+    are dropped whenever $LOAD_PATH changes, or when a lookup misses (the
+    file may have been created since the directory was listed). A hit from
+    a later entry still stats the earlier ones that were skipped, for the
+    same reason.
+    """
+
+    def __init__(self, space):
+        self.watcher = ArrayWatcher(space)
+        # {absolute directory: {name: None}}, a directory that can't be
+        # listed maps to None. Relative entries like "." are resolved first,
+        # so that Dir.chdir doesn't leave stale listings behind.
+        self.listings = {}
+
+    def get_listing(self, base):
+        base = rpath.rabspath(base)
+        try:
+            return self.listings[base]
+        except KeyError:
+            pass
+        try:
+            listing = {}
+            for name in os.listdir(base):
+                listing[name] = None
+        except OSError:
+            listing = None
+        self.listings[base] = listing
+        return listing
+
+    def find(self, space, path):
+        """
+        Returns the full path of the first $LOAD_PATH entry containing path,
+        or None.
+        """
+        if self.watcher.changed(space, space.w_load_path):
+            self.listings.clear()
+        first = path.split(os.sep)[0]
+        skipped = []
+        for w_base in space.listview(space.w_load_path):
+            base = Coerce.path(space, w_base)
+            listing = self.get_listing(base)
+            if listing is not None and first not in listing:
+                skipped.append(base)
+                continue
+            full = os.path.join(base, path)
+            if os.path.isfile(full):
+                for earlier in skipped:
+                    earlier_full = os.path.join(earlier, path)
+                    if os.path.isfile(earlier_full):
+                        self.listings.clear()
+                        return earlier_full
+                return full
+        self.listings.clear()
+        for w_base in space.listview(space.w_load_path):
+            full = os.path.join(Coerce.path(space, w_base), path)
+            if os.path.isfile(full):
+                return full
+        return None
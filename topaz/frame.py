@@ -11,6 +11,7 @@ class BaseFrame(object):
     def __init__(self):
         self.backref = jit.vref_None
         self.escaped = False
+        self.back_last_instr = -1
 
 
 class Frame(BaseFrame):
@@ -57,7 +58,7 @@ class Frame(BaseFrame):
                                            raise_error=True,
                                            reraise_error=True)
             if space.is_kind_of(w_arg, space.w_array):
-                args_w = space.listview(w_arg)
+                args_w = space.listview(w_arg)[:]
         minargc = len(bytecode.arg_pos) - len(bytecode.defaults)
         if len(args_w) < minargc:
             args_w.extend([space.w_nil] * (minargc - len(args_w)))
@@ -154,8 +155,8 @@ class Frame(BaseFrame):
             w_value = None
             if keywords_hash is not None:
                 try:
-                    w_value = keywords_hash.getitem(w_key)
-                    keywords_hash.delete(w_key)
+                    w_value = keywords_hash.getitem(space, w_key)
+                    keywords_hash.delete(space, w_key)
                 except KeyError:
                     pass
             # kword arguments with defaults come first, so if we get an
@@ -252,6 +253,15 @@ class Frame(BaseFrame):
         except IndexError:
             return self.last_instr
 
+    def get_unwind_code(self):
+        return self.bytecode
+
+    def get_unwind_instr(self, callee_back_instr):
+        if callee_back_instr == -1:
+            return self.last_instr
+        else:
+            return callee_back_instr - 1
+
     def get_code_name(self):
         return self.bytecode.name
 
@@ -270,5 +280,12 @@ class BuiltinFrame(BaseFrame):
     def get_lineno(self, prev_frame):
         return self.backref().get_lineno(self)
 
+    def get_unwind_code(self):
+        # Filled in from the caller, without forcing it.
+        return None
+
+    def get_unwind_instr(self, callee_back_instr):
+        return self.back_last_instr - 1
+
     def get_code_name(self):
         return self.name
@@ -0,0 +1,267 @@
+from rpython.rlib.objectmodel import compute_hash, compute_identity_hash
+
+from topaz import mapdict
+from topaz.celldict import VersionTag
+from topaz.objects.objectobject import W_Object
+
+
+class InlineCacheStats(object):
+    def __init__(self, space):
+        self.hits = 0
+        self.misses = 0
+        self.megamorphic = 0
+
+
+class ConstantCacheStats(object):
+    def __init__(self, space):
+        self.hits = 0
+        self.misses = 0
+
+
+class InstanceVarCacheStats(object):
+    def __init__(self, space):
+        self.hits = 0
+        self.misses = 0
+
+
+class MethodSerial(object):
+    """
+    A version for every method with a given name. Defining or removing a
+    method anywhere, or including a module which has one, bumps it, so a
+    cached lookup doesn't need every descendant's class version replaced.
+    """
+
+    _immutable_fields_ = ["version?"]
+
+    def __init__(self):
+        self.version = VersionTag()
+
+    def bump(self):
+        self.version = VersionTag()
+
+
+class MethodSerials(object):
+    def __init__(self, space):
+        self.serials = {}
+
+    def get(self, name):
+        serial = self.serials.get(name, None)
+        if serial is None:
+            serial = self.serials[name] = MethodSerial()
+        return serial
+
+    def bump(self, name):
+        # Nothing can have cached a name which was never looked up.
+        serial = self.serials.get(name, None)
+        if serial is not None:
+            serial.bump()
+
+
+class InlineCacheEntry(object):
+    _immutable_fields_ = ["w_cls", "version", "serial_version", "w_method"]
+
+    def __init__(self, w_cls, version, serial_version, w_method):
+        self.w_cls = w_cls
+        self.version = version
+        self.serial_version = serial_version
+        self.w_method = w_method
+
+
+class MethodCache(object):
+    """
+    A space-wide cache of fully resolved method lookups, keyed on
+    (class, class version, name). Misses (None) are cached as well, so
+    repeated respond_to and method_missing checks are cheap. Each entry also
+    remembers the name's MethodSerial version, so a stale entry never
+    survives a change anywhere in the ancestor chain.
+    """
+
+    SIZE = 2048
+
+    def __init__(self, space):
+        self.entries = [None] * self.SIZE
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, space, w_cls, name):
+        version = w_cls.version
+        idx = (compute_identity_hash(w_cls) ^ compute_hash(name)) & (self.SIZE - 1)
+        entry = self.entries[idx]
+        if (entry is not None and entry.w_cls is w_cls and
+                entry.version is version and entry.name == name and
+                entry.serial.version is entry.serial_version):
+            self.hits += 1
+            return entry.w_method
+        self.misses += 1
+        serial = space.fromcache(MethodSerials).get(name)
+        serial_version = serial.version
+        w_method = w_cls.find_method(space, name)
+        self.entries[idx] = MethodCacheEntry(w_cls, version, serial, serial_version, name, w_method)
+        return w_method
+
+
+class MethodCacheEntry(InlineCacheEntry):
+    _immutable_fields_ = ["serial", "name"]
+
+    def __init__(self, w_cls, version, serial, serial_version, name, w_method):
+        InlineCacheEntry.__init__(self, w_cls, version, serial_version, w_method)
+        self.serial = serial
+        self.name = name
+
+
+class SendCache(object):
+    """
+    A per-call-site method cache. It holds up to MAX_ENTRIES (class, version)
+    pairs, after which the call site is considered megamorphic and every
+    lookup goes through the space-wide MethodCache. All entries share the
+    call site's MethodSerial, which catches changes to the ancestors.
+    """
+
+    MAX_ENTRIES = 4
+
+    def __init__(self):
+        self.entries = []
+        self.megamorphic = False
+        self.serial = None
+
+    def lookup(self, space, w_cls, name):
+        stats = space.fromcache(InlineCacheStats)
+        if self.megamorphic:
+            stats.megamorphic += 1
+            return space.lookup_method(w_cls, name)
+
+        if self.serial is None:
+            self.serial = space.fromcache(MethodSerials).get(name)
+        version = w_cls.version
+        serial_version = self.serial.version
+        for i in xrange(len(self.entries)):
+            entry = self.entries[i]
+            if entry.w_cls is w_cls:
+                if entry.version is version and entry.serial_version is serial_version:
+                    stats.hits += 1
+                    return entry.w_method
+                # The class or an ancestor was mutated, refresh its entry in
+                # place.
+                stats.misses += 1
+                w_method = space.lookup_method(w_cls, name)
+                self.entries[i] = InlineCacheEntry(w_cls, version, serial_version, w_method)
+                return w_method
+
+        stats.misses += 1
+        w_method = space.lookup_method(w_cls, name)
+        if len(self.entries) >= self.MAX_ENTRIES:
+            self.megamorphic = True
+            self.entries = []
+        else:
+            self.entries.append(InlineCacheEntry(w_cls, version, serial_version, w_method))
+        return w_method
+
+    def state(self):
+        if self.megamorphic:
+            return "megamorphic"
+        elif len(self.entries) > 1:
+            return "polymorphic"
+        elif len(self.entries) == 1:
+            return "monomorphic"
+        else:
+            return "uninitialized"
+
+
+class ConstantSerial(object):
+    """
+    A global version for constant lookups. Anything that can change the
+    result of a lexical constant lookup (defining or removing a constant,
+    including a module, resolving an autoload) bumps it, which invalidates
+    every ConstantCache at once.
+    """
+
+    _immutable_fields_ = ["version?"]
+
+    def __init__(self, space):
+        self.version = VersionTag()
+
+    def bump(self):
+        self.version = VersionTag()
+
+
+class ConstantCacheEntry(object):
+    _immutable_fields_ = ["lexical_scope", "version", "w_value"]
+
+    def __init__(self, lexical_scope, version, w_value):
+        self.lexical_scope = lexical_scope
+        self.version = version
+        self.w_value = w_value
+
+
+class ConstantCache(object):
+    """
+    A per-site cache for LOAD_LOCAL_CONSTANT. It remembers the last resolved
+    value together with the lexical scope it was found from and the
+    ConstantSerial version at the time, so a hit is two pointer compares.
+    Misses that end in const_missing are never cached.
+    """
+
+    def __init__(self):
+        self.entry = None
+
+    def lookup(self, space, lexical_scope, name):
+        stats = space.fromcache(ConstantCacheStats)
+        version = space.fromcache(ConstantSerial).version
+        entry = self.entry
+        if (entry is not None and entry.lexical_scope is lexical_scope and
+                entry.version is version):
+            stats.hits += 1
+            return entry.w_value
+        stats.misses += 1
+        w_res = space._find_lexical_const(lexical_scope, name)
+        if w_res is None:
+            return space.lexical_const_missing(lexical_scope, name)
+        # Resolving an autoload bumps the serial, so read it again.
+        version = space.fromcache(ConstantSerial).version
+        self.entry = ConstantCacheEntry(lexical_scope, version, w_res)
+        return w_res
+
+
+class InstanceVarCache(object):
+    """
+    A per-site cache for LOAD_INSTANCE_VAR and STORE_INSTANCE_VAR, keyed on
+    the identity of the receiver's map. Maps are shared between objects
+    which had the same instance variables set in the same order, so a hit
+    skips the attribute search entirely. Receivers which don't use maps go
+    through the regular lookup.
+    """
+
+    def __init__(self):
+        self.map = None
+        self.node = None
+
+    def find(self, space, map, name):
+        stats = space.fromcache(InstanceVarCacheStats)
+        if self.map is map:
+            stats.hits += 1
+            return self.node
+        stats.misses += 1
+        node = map.find(mapdict.AttributeNode, name)
+        self.map = map
+        self.node = node
+        return node
+
+    def read(self, space, w_obj, name):
+        if not isinstance(w_obj, W_Object):
+            return space.find_instance_var(w_obj, name)
+        node = self.find(space, w_obj.map, name)
+        if node is None:
+            return space.w_nil
+        return node.read(space, w_obj)
+
+    def write(self, space, w_obj, name, w_value):
+        if not isinstance(w_obj, W_Object):
+            space.set_instance_var(w_obj, name, w_value)
+            return
+        node = self.find(space, w_obj.map, name)
+        if node is None:
+            # Adding an attribute picks the node type from the value, leave
+            # that to the object; the next write will hit the new map.
+            w_obj.set_instance_var(space, name, w_value)
+        else:
+            node.write(space, w_obj, w_value)
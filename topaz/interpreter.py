@@ -15,7 +15,7 @@ from topaz.scope import StaticScope
 from topaz.utils.regexp import RegexpError
 
 
-def get_printable_location(pc, bytecode, block_bytecode, w_trace_proc):
+def get_printable_location(pc, bytecode, block_bytecode):
     try:
         pcline = bytecode.lineno_table[pc]
     except IndexError:
@@ -29,9 +29,21 @@ def get_printable_location(pc, bytecode, block_bytecode, w_trace_proc):
     )
 
 
+class TraceState(object):
+    """
+    Whether a trace proc is set. The JIT treats enabled as a constant, so
+    untraced code does no work for tracing, and set_trace_func invalidates
+    the machine code that assumed it was off.
+    """
+    _immutable_fields_ = ["enabled?"]
+
+    def __init__(self, space):
+        self.enabled = False
+
+
 class Interpreter(object):
     jitdriver = jit.JitDriver(
-        greens=["pc", "bytecode", "block_bytecode", "w_trace_proc"],
+        greens=["pc", "bytecode", "block_bytecode"],
         reds=["self", "frame"],
         virtualizables=["frame"],
         get_printable_location=get_printable_location,
@@ -52,7 +64,6 @@ class Interpreter(object):
                 self.jitdriver.jit_merge_point(
                     self=self, bytecode=bytecode, frame=frame, pc=pc,
                     block_bytecode=self.get_block_bytecode(frame.block),
-                    w_trace_proc=space.getexecutioncontext().gettraceproc(),
                 )
                 pc = self._interpret(space, pc, frame, bytecode)
         except RaiseReturn as e:
@@ -67,7 +78,7 @@ class Interpreter(object):
     def _interpret(self, space, pc, frame, bytecode):
         prev_pc = frame.last_instr
         frame.last_instr = pc
-        if (space.getexecutioncontext().hastraceproc() and
+        if (space.fromcache(TraceState).enabled and
                 bytecode.lineno_table[pc] != bytecode.lineno_table[prev_pc]):
             space.getexecutioncontext().invoke_trace_proc(
                 space, "line", None, None, frame=frame)
@@ -169,7 +180,6 @@ class Interpreter(object):
             self.jitdriver.can_enter_jit(
                 self=self, bytecode=bytecode, frame=frame, pc=target_pc,
                 block_bytecode=self.get_block_bytecode(frame.block),
-                w_trace_proc=space.getexecutioncontext().gettraceproc()
             )
         return target_pc
 
@@ -233,8 +243,15 @@ class Interpreter(object):
         frame.pop()
         w_name = bytecode.consts_w[idx]
         name = space.symbol_w(w_name)
-        frame.push(space.find_lexical_const(
-            jit.promote(frame.lexical_scope), name))
+        lexical_scope = jit.promote(frame.lexical_scope)
+        # Inside a trace the scope is promoted and the lookups are elidable,
+        # so the per-site cache only helps the interpreter.
+        if jit.we_are_jitted():
+            w_res = space.find_lexical_const(lexical_scope, name)
+        else:
+            w_res = bytecode.get_const_cache(pc).lookup(
+                space, lexical_scope, name)
+        frame.push(w_res)
 
     @jit.unroll_safe
     def DEFINED_LOCAL_CONSTANT(self, space, bytecode, frame, pc, idx):
@@ -252,15 +269,24 @@ class Interpreter(object):
     def LOAD_INSTANCE_VAR(self, space, bytecode, frame, pc, idx):
         w_name = bytecode.consts_w[idx]
         w_obj = frame.pop()
-        w_res = (space.find_instance_var(w_obj, space.symbol_w(w_name)) or
-                 space.w_nil)
-        frame.push(w_res)
+        name = space.symbol_w(w_name)
+        # Inside a trace the map is promoted and the lookup is elidable, so
+        # the per-site cache only helps the interpreter.
+        if jit.we_are_jitted():
+            w_res = space.find_instance_var(w_obj, name)
+        else:
+            w_res = bytecode.get_ivar_cache(pc).read(space, w_obj, name)
+        frame.push(w_res or space.w_nil)
 
     def STORE_INSTANCE_VAR(self, space, bytecode, frame, pc, idx):
         w_name = bytecode.consts_w[idx]
         w_value = frame.pop()
         w_obj = frame.pop()
-        space.set_instance_var(w_obj, space.symbol_w(w_name), w_value)
+        name = space.symbol_w(w_name)
+        if jit.we_are_jitted():
+            space.set_instance_var(w_obj, name, w_value)
+        else:
+            bytecode.get_ivar_cache(pc).write(space, w_obj, name, w_value)
         frame.push(w_value)
 
     def DEFINED_INSTANCE_VAR(self, space, bytecode, frame, pc, idx):
@@ -554,12 +580,24 @@ class Interpreter(object):
             raise space.error(space.w_TypeError, "can't define singleton")
         frame.push(space.getsingletonclass(w_obj))
 
+    def send(self, space, bytecode, pc, w_receiver, name, args_w,
+             block=None):
+        # Inside a trace the class is promoted and the method lookup is
+        # elidable, so the per-call-site cache only helps the interpreter.
+        if jit.we_are_jitted():
+            return space.send(w_receiver, name, args_w, block)
+        w_cls = space.getclass(w_receiver)
+        raw_method = bytecode.get_send_cache(pc).lookup(space, w_cls, name)
+        return space._send_raw(
+            name, raw_method, w_receiver, w_cls, args_w, block)
+
     def SEND(self, space, bytecode, frame, pc, meth_idx, num_args):
         space.getexecutioncontext().last_instr = pc
         args_w = frame.popitemsreverse(num_args)
         w_receiver = frame.pop()
-        w_res = space.send(
-            w_receiver, space.symbol_w(bytecode.consts_w[meth_idx]), args_w)
+        w_res = self.send(
+            space, bytecode, pc, w_receiver,
+            space.symbol_w(bytecode.consts_w[meth_idx]), args_w)
         frame.push(w_res)
 
     def SEND_BLOCK(self, space, bytecode, frame, pc, meth_idx, num_args):
@@ -571,8 +609,9 @@ class Interpreter(object):
             w_block = None
         else:
             assert isinstance(w_block, W_ProcObject)
-        w_res = space.send(
-            w_receiver, space.symbol_w(bytecode.consts_w[meth_idx]), args_w,
+        w_res = self.send(
+            space, bytecode, pc, w_receiver,
+            space.symbol_w(bytecode.consts_w[meth_idx]), args_w,
             block=w_block)
         frame.push(w_res)
 
@@ -590,8 +629,9 @@ class Interpreter(object):
             args_w[pos:pos + len(array_w)] = array_w
             pos += len(array_w)
         w_receiver = frame.pop()
-        w_res = space.send(
-            w_receiver, space.symbol_w(bytecode.consts_w[meth_idx]), args_w)
+        w_res = self.send(
+            space, bytecode, pc, w_receiver,
+            space.symbol_w(bytecode.consts_w[meth_idx]), args_w)
         frame.push(w_res)
 
     @jit.unroll_safe
@@ -607,8 +647,9 @@ class Interpreter(object):
             w_block = None
         else:
             assert isinstance(w_block, W_ProcObject)
-        w_res = space.send(
-            w_receiver, space.symbol_w(bytecode.consts_w[meth_idx]), args_w,
+        w_res = self.send(
+            space, bytecode, pc, w_receiver,
+            space.symbol_w(bytecode.consts_w[meth_idx]), args_w,
             block=w_block)
         frame.push(w_res)
 
@@ -940,6 +981,7 @@ class ExceptBlock(FrameBlock):
     def handle(self, space, frame, unroller):
         self.cleanupstack(frame)
         e = unroller.e
+        e.w_value.record_rescue(frame)
         frame.push(unroller)
         frame.push(e.w_value)
         return self.target_pc
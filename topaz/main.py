@@ -3,11 +3,11 @@ from __future__ import absolute_import
 import os
 
 from rpython.rlib import jit
-from rpython.rlib.objectmodel import specialize
 from rpython.rlib.streamio import open_file_as_stream, fdopen_as_stream
 
 from topaz.error import RubyError, print_traceback
 from topaz.objects.exceptionobject import W_SystemExit
+from topaz.objects.ioobject import PendingWrites
 from topaz.objspace import ObjectSpace
 from topaz.system import IS_WINDOWS, RUBY_DESCRIPTION
 
@@ -57,11 +57,6 @@ if IS_WINDOWS:
         return ''.join(result)
 
 
-@specialize.memo()
-def getspace(config):
-    return ObjectSpace(config)
-
-
 def get_topaz_config_options():
     return {
         "translation.continuation": True,
@@ -69,9 +64,12 @@ def get_topaz_config_options():
     }
 
 
-def create_entry_point(config):
+def create_entry_point(config, snapshot_kernel=False):
+    space = ObjectSpace(config)
+    if snapshot_kernel:
+        space.load_kernel_snapshot()
+
     def entry_point(argv):
-        space = getspace(config)
         space.setup(argv[0])
         return _entry_point(space, argv)
     return entry_point
@@ -324,8 +322,14 @@ def _entry_point(space, argv):
                         space.send(space.w_kernel, "print", [w_res])
         elif syntax_check:
             space.compile(source, path)
-        else:
+        elif path == "-e" or path == "-":
             space.execute(source, filepath=path)
+        else:
+            try:
+                bc = space.compile_file(path, source)
+            except OSError:
+                bc = space.compile(source, path)
+            space.execute_bytecode(bc)
     except RubyError as e:
         explicit_status = True
         w_exc = e.w_value
@@ -337,6 +341,7 @@ def _entry_point(space, argv):
     exit_handler_status = space.run_exit_handlers()
     if not explicit_status and exit_handler_status != -1:
         status = exit_handler_status
+    space.fromcache(PendingWrites).flush_all(space)
     if w_exit_error is not None:
         print_traceback(space, w_exit_error, path)
 
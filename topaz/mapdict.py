@@ -27,19 +27,41 @@ class MapTransitionCache(object):
 
 
 class BaseNode(object):
-    _attrs_ = ["size_estimate"]
-    _immutable_fields_ = ["size_estimate"]
+    _attrs_ = ["size_estimate", "class_node", "attr_index", "flag_index"]
+    _immutable_fields_ = ["size_estimate", "class_node"]
 
     @jit.elidable
     def find(self, node_cls, name=None):
+        if node_cls is ClassNode:
+            return self.class_node
+        if self.attr_index is None:
+            self._build_index()
+        if node_cls is FlagNode:
+            return self.flag_index.get(name, None)
+        node = self.attr_index.get(name, None)
+        if node is not None and isinstance(node, node_cls):
+            return node
+        return None
+
+    def _build_index(self):
+        # Built the first time a map is searched, so the intermediate maps an
+        # object passes through while it's being initialized stay cheap.
+        # Attributes and flags get separate indexes since their names are not
+        # guaranteed to be distinct.
+        attr_index = {}
+        flag_index = {}
         node = self
         while node is not None:
-            if node.matches(node_cls, name):
-                return node
+            if isinstance(node, AttributeNode):
+                attr_index[node.name] = node
+            elif isinstance(node, FlagNode):
+                flag_index[node.name] = node
             node = node.getprev()
+        self.attr_index = attr_index
+        self.flag_index = flag_index
 
-    def matches(self, node_cls, name):
-        return isinstance(self, node_cls)
+    def getclass(self):
+        return self.class_node.w_cls
 
     def add(self, space, node_cls, name, w_obj):
         new_node = space.fromcache(MapTransitionCache).get_transition(
@@ -47,6 +69,17 @@ class BaseNode(object):
         new_node.update_storage_size(w_obj, self)
         return new_node
 
+    def attribute_names(self):
+        """The names of the instance variables, in the order they were set."""
+        names = []
+        node = self
+        while node is not None:
+            if isinstance(node, AttributeNode):
+                names.append(node.name)
+            node = node.getprev()
+        names.reverse()
+        return names
+
 
 class ClassNode(BaseNode):
     _immutable_fields_ = ["w_cls"]
@@ -55,14 +88,24 @@ class ClassNode(BaseNode):
 
     def __init__(self, w_cls):
         self.w_cls = w_cls
+        self.class_node = self
+        self.attr_index = self.flag_index = None
         self.size_estimate = SizeEstimate(0, 0)
 
-    def getclass(self):
-        return self.w_cls
-
     def change_class(self, space, new_cls):
         return space.fromcache(MapTransitionCache).get_class_node(new_cls)
 
+    def allocate_storage(self, w_obj):
+        # The estimate tracks the sizes objects of this class end up with, so
+        # for classes whose instances all set the same attributes in
+        # initialize the storage is allocated once, at its final size.
+        object_size = self.size_estimate.object_size_estimate()
+        if object_size > 0:
+            w_obj.object_storage = [None] * object_size
+        unboxed_size = self.size_estimate.unboxed_size_estimate()
+        if unboxed_size > 0:
+            w_obj.unboxed_storage = [0.0] * unboxed_size
+
     def copy_attrs(self, space, w_obj, w_target):
         pass
 
@@ -76,6 +119,8 @@ class StorageNode(BaseNode):
     def __init__(self, prev, name):
         self.prev = prev
         self.name = name
+        self.class_node = prev.class_node
+        self.attr_index = self.flag_index = None
         self.pos = self.compute_position()
 
     def length(self):
@@ -89,9 +134,6 @@ class StorageNode(BaseNode):
         return space.fromcache(MapTransitionCache).get_transition(
             new_prev, self.__class__, self.name)
 
-    def matches(self, node_cls, name):
-        return BaseNode.matches(self, node_cls, name) and name == self.name
-
     def update_storage_size(self, w_obj, prev_node):
         if not jit.we_are_jitted():
             prev_node.size_estimate.update_from(self.size_estimate)
@@ -219,7 +261,11 @@ class FlagNode(StorageNode):
         return compute_position(self, "uses_object_storage")
 
     def update_storage_size(self, w_obj, prev_node):
-        StorageNode.update_storage_size(self, w_obj, prev_node)
+        # Flags are mostly set on builtin objects that never get attributes,
+        # like frozen Strings. Don't let those teach the class to allocate
+        # storage for every new instance.
+        if not isinstance(prev_node, ClassNode):
+            StorageNode.update_storage_size(self, w_obj, prev_node)
         update_storage(self, w_obj, "object", None)
 
     def copy_attrs(self, space, w_obj, w_target):
@@ -243,9 +289,9 @@ ATTRIBUTE_CLASSES = unrolling_iterable([
 @jit.unroll_safe
 def update_storage(node, w_obj, storage_name, empty_value):
     storage = getattr(w_obj, storage_name + "_storage")
-    if storage is None or node.length() >= len(storage):
-        new_storage = [empty_value] * getattr(
-            node.size_estimate, storage_name + "_size_estimate")()
+    if storage is None or node.length() > len(storage):
+        size = getattr(node.size_estimate, storage_name + "_size_estimate")()
+        new_storage = [empty_value] * max(size, node.length())
         if storage is not None:
             for i, value in enumerate(storage):
                 new_storage[i] = value
@@ -1,5 +1,7 @@
 import functools
 
+from rpython.rlib import jit
+
 from topaz.gateway import WrapperGenerator
 from topaz.utils.cache import Cache
 
@@ -121,6 +123,19 @@ def check_frozen(param="self"):
     return inner
 
 
+def make_block_driver(name):
+    """
+    A JitDriver for a builtin method's loop that calls a block, so that
+    each block gets a loop of its own.
+    """
+    return jit.JitDriver(
+        name=name,
+        greens=["bytecode"],
+        reds="auto",
+        get_printable_location=lambda bytecode: "%s: %s" % (name, bytecode.name),
+    )
+
+
 class ClassCache(Cache):
     def _build(self, classdef):
         from topaz.objects.classobject import W_ClassObject
@@ -6,15 +6,16 @@ import time
 
 from rpython.rlib.objectmodel import compute_identity_hash
 from rpython.rlib.rfloat import round_double
-from rpython.rlib.streamio import open_file_as_stream
 
 from topaz.coerce import Coerce
 from topaz.error import RubyError, error_for_oserror, error_for_errno
+from topaz.featurecache import LoadedFeatures, LoadPathCache
 from topaz.module import ModuleDef, check_frozen
 from topaz.modules.process import Process
 from topaz.objects.bindingobject import W_BindingObject
 from topaz.objects.exceptionobject import W_ExceptionObject
 from topaz.objects.functionobject import W_FunctionObject
+from topaz.objects.ioobject import PendingWrites
 from topaz.objects.moduleobject import W_ModuleObject
 from topaz.objects.procobject import W_ProcObject
 from topaz.objects.randomobject import W_RandomObject
@@ -104,13 +105,9 @@ class Kernel(object):
             path += ".rb"
 
         if not (path.startswith("/") or path.startswith("./") or path.startswith("../")):
-            w_load_path = space.globals.get(space, "$LOAD_PATH")
-            for w_base in space.listview(w_load_path):
-                base = Coerce.path(space, w_base)
-                full = os.path.join(base, path)
-                if os.path.isfile(full):
-                    path = os.path.join(base, path)
-                    break
+            full = space.fromcache(LoadPathCache).find(space, path)
+            if full is not None:
+                path = full
         return path
 
     @staticmethod
@@ -119,11 +116,7 @@ class Kernel(object):
             raise space.error(space.w_LoadError, orig_path)
 
         try:
-            f = open_file_as_stream(path, buffering=0)
-            try:
-                contents = f.readall()
-            finally:
-                f.close()
+            bc = space.compile_file(path)
         except OSError as e:
             raise error_for_oserror(space, e)
 
@@ -131,7 +124,7 @@ class Kernel(object):
             lexical_scope = StaticScope(space.newmodule("Anonymous"), None)
         else:
             lexical_scope = None
-        space.execute(contents, filepath=path, lexical_scope=lexical_scope)
+        space.execute_bytecode(bc, lexical_scope=lexical_scope)
 
     @moduledef.function("require", path="path")
     def function_require(self, space, path):
@@ -139,15 +132,12 @@ class Kernel(object):
         orig_path = path
         path = Kernel.find_feature(space, path)
 
-        w_loaded_features = space.globals.get(space, '$"')
-        w_already_loaded = space.send(
-            w_loaded_features, "include?", [space.newstr_fromstr(path)]
-        )
-        if space.is_true(w_already_loaded):
+        loaded_features = space.fromcache(LoadedFeatures)
+        if loaded_features.contains(space, path):
             return space.w_false
 
         Kernel.load_feature(space, path, orig_path)
-        w_loaded_features.method_lshift(space, space.newstr_fromstr(path))
+        loaded_features.add(space, path)
         return space.w_true
 
     @moduledef.function("load", path="path", wrap="bool")
@@ -253,6 +243,7 @@ class Kernel(object):
             cmd = space.str0_w(w_cmd)
             argv0 = None
 
+        space.fromcache(PendingWrites).flush_all(space)
         if len(args_w) > 1 or argv0 is not None:
             if argv0 is None:
                 sepidx = cmd.rfind(os.sep) + 1
@@ -421,7 +412,7 @@ class Kernel(object):
             w_proc = None
         else:
             assert isinstance(w_proc, W_ProcObject)
-        space.getexecutioncontext().settraceproc(w_proc)
+        space.getexecutioncontext().settraceproc(space, w_proc)
 
     def new_flag(moduledef, setter, getter, remover):
         @moduledef.method(setter)
@@ -1,291 +1,532 @@
 from __future__ import absolute_import
+
+import math
+
+from rpython.rlib.rbigint import rbigint
+from rpython.rlib.rfloat import INFINITY, NAN, isinf, isnan
+from rpython.rlib.rstring import StringBuilder
+
+from topaz.error import error_for_oserror
 from topaz.module import ModuleDef
 from topaz.objects.arrayobject import W_ArrayObject
+from topaz.objects.bignumobject import W_BignumObject
 from topaz.objects.boolobject import W_TrueObject, W_FalseObject
+from topaz.objects.classobject import W_ClassObject
 from topaz.objects.intobject import W_FixnumObject
 from topaz.objects.hashobject import W_HashObject
+from topaz.objects.moduleobject import W_ModuleObject
 from topaz.objects.nilobject import W_NilObject
+from topaz.objects.objectobject import W_Object
 from topaz.objects.stringobject import W_StringObject
 from topaz.objects.symbolobject import W_SymbolObject
 from topaz.objects.ioobject import W_IOObject
 from topaz.objects.floatobject import W_FloatObject
 
-import os
-import math
 
+class MarshalWriter(object):
+    """
+    Writes the Marshal format for an object graph, either into a String or
+    through an IO in chunks of BUFFER_SIZE bytes. Symbols and objects that
+    were already written are replaced by links to their first occurrence.
+    """
 
-class Marshal(object):
-    moduledef = ModuleDef("Marshal")
+    BUFFER_SIZE = 64 * 1024
 
-    MAJOR_VERSION = 4
-    MINOR_VERSION = 8
+    def __init__(self, space, w_io):
+        self.space = space
+        self.w_io = w_io
+        self.builder = StringBuilder()
+        self.symbols = {}
+        self.objects = {}
+        self.num_objects = 0
+        self.w_struct = space.find_const(space.w_object, "Struct")
 
-    NIL = 0x30
-    TRUE = 0x54
-    FALSE = 0x46
-    FIXNUM = 0x69
-    ARRAY = 0x5b
-    SYMBOL = 0x3a
-    IVAR = 0x49
-    STRING = 0x22
-    HASH = 0x7b
-    FLOAT = 0x66
+    def write_byte(self, byte):
+        self.builder.append(chr(byte))
 
-    @moduledef.setup_module
-    def setup_module(space, w_mod):
-        space.set_const(w_mod, "MAJOR_VERSION", space.newint(Marshal.MAJOR_VERSION))
-        space.set_const(w_mod, "MINOR_VERSION", space.newint(Marshal.MINOR_VERSION))
+    def write_chars(self, data):
+        self.builder.append(data)
+
+    def write_int(self, value):
+        if value == 0:
+            self.write_byte(0)
+        elif 0 < value < 123:
+            self.write_byte(value + 5)
+        elif -124 < value < 0:
+            self.write_byte((value - 5) & 0xff)
+        else:
+            chars = []
+            for i in xrange(1, 5):
+                chars.append(chr(value & 0xff))
+                value >>= 8
+                if value == 0:
+                    self.write_byte(i)
+                    break
+                if value == -1:
+                    self.write_byte(256 - i)
+                    break
+            self.builder.append("".join(chars))
+
+    def write_string(self, data):
+        self.write_int(len(data))
+        self.write_chars(data)
 
-    @staticmethod
-    def dump(space, w_obj):
-        bytes = []
+    def write_symbol(self, name):
+        try:
+            idx = self.symbols[name]
+        except KeyError:
+            self.symbols[name] = len(self.symbols)
+            self.write_byte(Marshal.SYMBOL)
+            self.write_string(name)
+        else:
+            self.write_byte(Marshal.SYMLINK)
+            self.write_int(idx)
+
+    def write_bignum(self, bigint):
+        if bigint.sign < 0:
+            self.write_byte(ord("-"))
+        else:
+            self.write_byte(ord("+"))
+        bigint = bigint.abs()
+        # The digits are written as 16-bit little-endian shorts.
+        nshorts = (bigint.bit_length() + 15) // 16
+        self.write_int(nshorts)
+        self.write_chars(bigint.tobytes(nshorts * 2, "little", False))
+
+    def write_class(self, marker, w_obj):
+        w_cls = self.space.getnonsingletonclass(w_obj)
+        if w_cls.name is None:
+            raise self.space.error(self.space.w_TypeError,
+                "can't dump anonymous class %s" % self.space.obj_to_s(w_cls)
+            )
+        self.write_byte(marker)
+        self.write_symbol(w_cls.name)
+
+    def register(self, w_obj):
+        self.objects[w_obj] = self.num_objects
+        self.num_objects += 1
+
+    def write_float(self, value):
+        if isnan(value):
+            string = "nan"
+        elif isinf(value):
+            string = "inf" if value > 0 else "-inf"
+        elif value == math.floor(value) and abs(value) < 1e16:
+            if value == 0.0 and math.copysign(1.0, value) < 0:
+                string = "-0"
+            else:
+                string = str(int(value))
+        else:
+            string = str(value)
+        self.write_string(string)
+
+    def dump(self, w_obj):
+        space = self.space
+        if self.w_io is not None and self.builder.getlength() >= self.BUFFER_SIZE:
+            self.flush()
         if isinstance(w_obj, W_NilObject):
-            bytes.append(Marshal.NIL)
+            self.write_byte(Marshal.NIL)
         elif isinstance(w_obj, W_TrueObject):
-            bytes.append(Marshal.TRUE)
+            self.write_byte(Marshal.TRUE)
         elif isinstance(w_obj, W_FalseObject):
-            bytes.append(Marshal.FALSE)
+            self.write_byte(Marshal.FALSE)
         elif isinstance(w_obj, W_FixnumObject):
-            bytes.append(Marshal.FIXNUM)
-            bytes += Marshal.integer2bytes(space.int_w(w_obj))
-        elif isinstance(w_obj, W_FloatObject):
-            bytes.append(Marshal.FLOAT)
-            raw_value = space.float_w(w_obj)
-            int_value = int(raw_value)
-            float_value = raw_value
-            string = ""  # None
-
-            if raw_value == int_value:
-                float_value = int_value
-                # repr would be more accurate here, but it weirdly does not translate
-                if str(raw_value) == "-0.0":  # slowing things down
-                    string = "-0"
-                else:
-                    string = str(float_value)
-            else:  # encode float
-                string = str(float_value)
-
-            length = len(string)
-            bytes += Marshal.integer2bytes(length)
-            for c in string:
-                bytes.append(ord(c))
-        elif isinstance(w_obj, W_ArrayObject):
-            array = space.listview(w_obj)
-            bytes.append(Marshal.ARRAY)
-            bytes += Marshal.integer2bytes(len(array))
-            for item in array:
-                bytes += Marshal.dump(space, item)
+            value = space.int_w(w_obj)
+            if -2 ** 30 <= value < 2 ** 30:
+                self.write_byte(Marshal.FIXNUM)
+                self.write_int(value)
+            else:
+                # Fixnums that don't fit in 31 bits are written as a new
+                # Bignum each time, like MRI does.
+                self.num_objects += 1
+                self.write_byte(Marshal.BIGNUM)
+                self.write_bignum(rbigint.fromint(value))
         elif isinstance(w_obj, W_SymbolObject):
-            bytes.append(Marshal.SYMBOL)
-            symbol = space.symbol_w(w_obj)
-            bytes += Marshal.integer2bytes(len(symbol))
-            for char in symbol:
-                bytes.append(ord(char))
+            self.write_symbol(space.symbol_w(w_obj))
+        else:
+            try:
+                idx = self.objects[w_obj]
+            except KeyError:
+                self.register(w_obj)
+                self.dump_object(w_obj)
+            else:
+                self.write_byte(Marshal.LINK)
+                self.write_int(idx)
+
+    def dump_object(self, w_obj):
+        space = self.space
+        if isinstance(w_obj, W_FloatObject):
+            self.write_byte(Marshal.FLOAT)
+            self.write_float(space.float_w(w_obj))
+        elif isinstance(w_obj, W_ArrayObject):
+            items_w = space.listview(w_obj)
+            self.write_byte(Marshal.ARRAY)
+            self.write_int(len(items_w))
+            for w_item in items_w:
+                self.dump(w_item)
         elif isinstance(w_obj, W_StringObject):
-            string = space.str_w(w_obj)
-            bytes.append(Marshal.IVAR)
-            bytes.append(Marshal.STRING)
-            bytes += Marshal.integer2bytes(len(string))
-            for char in string:
-                bytes.append(ord(char))
-            bytes.append(0x06)
+            self.write_byte(Marshal.IVAR)
+            self.write_byte(Marshal.STRING)
+            self.write_string(space.str_w(w_obj))
+            self.write_int(1)
             # TODO: respect encoding
-            bytes += Marshal.dump(space, space.newsymbol("E"))
-            bytes += Marshal.dump(space, space.w_true)
+            self.write_symbol("E")
+            self.write_byte(Marshal.TRUE)
         elif isinstance(w_obj, W_HashObject):
-            bytes.append(Marshal.HASH)
-            hash_len = w_obj.strategy.len(w_obj.dict_storage)
-            hash_keys_w = w_obj.strategy.keys(w_obj.dict_storage)
-            bytes += Marshal.integer2bytes(hash_len)
-            for w_key in hash_keys_w:
-                bytes += Marshal.dump(space, w_key)
-                w_value = w_obj.strategy.getitem(w_obj.dict_storage, w_key)
-                bytes += Marshal.dump(space, w_value)
+            keys_w = w_obj.strategy.keys(w_obj.dict_storage)
+            values_w = w_obj.strategy.values(w_obj.dict_storage)
+            self.write_byte(Marshal.HASH)
+            self.write_int(len(keys_w))
+            for i in xrange(len(keys_w)):
+                self.dump(keys_w[i])
+                self.dump(values_w[i])
+        elif isinstance(w_obj, W_BignumObject):
+            self.write_byte(Marshal.BIGNUM)
+            self.write_bignum(space.bigint_w(w_obj))
+        elif space.respond_to(w_obj, "marshal_dump"):
+            w_data = space.send(w_obj, "marshal_dump")
+            self.write_class(Marshal.USRMARSHAL, w_obj)
+            self.dump(w_data)
+        elif space.respond_to(w_obj, "_dump"):
+            w_data = space.send(w_obj, "_dump", [space.newint(-1)])
+            if not isinstance(w_data, W_StringObject):
+                raise space.error(space.w_TypeError, "_dump() must return string")
+            self.write_class(Marshal.USERDEF, w_obj)
+            self.write_string(space.str_w(w_data))
+        elif space.is_kind_of(w_obj, self.w_struct):
+            w_cls = space.getnonsingletonclass(w_obj)
+            members_w = space.listview(space.find_const(w_cls, "STRUCT_ATTRS"))
+            self.write_class(Marshal.STRUCT, w_obj)
+            self.write_int(len(members_w))
+            for w_member in members_w:
+                name = space.symbol_w(w_member)
+                self.write_symbol(name)
+                self.dump(space.find_instance_var(w_obj, "@" + name))
+        elif type(w_obj) is W_Object:
+            assert isinstance(w_obj, W_Object)
+            names = w_obj.instance_var_names()
+            self.write_class(Marshal.OBJECT, w_obj)
+            self.write_int(len(names))
+            for name in names:
+                self.write_symbol(name)
+                self.dump(w_obj.find_instance_var(space, name))
+        else:
+            raise space.error(space.w_TypeError,
+                "no _dump_data is defined for class %s" % space.getclass(w_obj).name
+            )
+
+    def flush(self):
+        data = self.builder.build()
+        self.builder = StringBuilder()
+        if not data:
+            return
+        space = self.space
+        if isinstance(self.w_io, W_IOObject):
+            try:
+                self.w_io.write(space, data)
+            except OSError as e:
+                raise error_for_oserror(space, e)
+        else:
+            space.send(self.w_io, "write", [space.newstr_fromstr(data)])
+
+
+class MarshalReader(object):
+    """
+    Reads the Marshal format from a String, or from an IO a byte at a time
+    through its read buffer, so the IO is left right after the object.
+    """
+
+    def __init__(self, space, w_io, data):
+        self.space = space
+        self.w_io = w_io
+        self.data = data
+        self.pos = 0
+        self.symbols_w = []
+        self.objects_w = []
+
+    def too_short(self):
+        return self.space.error(self.space.w_ArgumentError, "marshal data too short")
+
+    def read_chars(self, length):
+        space = self.space
+        if self.w_io is None:
+            start = self.pos
+            end = start + length
+            if end > len(self.data):
+                raise self.too_short()
+            assert start >= 0
+            self.pos = end
+            return self.data[start:end]
+        elif isinstance(self.w_io, W_IOObject):
+            try:
+                data = self.w_io.read(space, length)
+            except OSError as e:
+                raise error_for_oserror(space, e)
+        else:
+            w_data = space.send(self.w_io, "read", [space.newint(length)])
+            data = "" if w_data is space.w_nil else space.str_w(w_data)
+        if len(data) < length:
+            raise space.error(space.w_EOFError, "end of file reached")
+        return data
+
+    def read_byte(self):
+        if self.w_io is None:
+            if self.pos >= len(self.data):
+                raise self.too_short()
+            byte = ord(self.data[self.pos])
+            self.pos += 1
+            return byte
+        elif isinstance(self.w_io, W_IOObject):
+            try:
+                c = self.w_io.getc(self.space)
+            except OSError as e:
+                raise error_for_oserror(self.space, e)
+            if not c:
+                raise self.space.error(self.space.w_EOFError, "end of file reached")
+            return ord(c[0])
+        return ord(self.read_chars(1)[0])
+
+    def read_int(self):
+        c = self.read_byte()
+        if c > 127:
+            c -= 256
+        if c == 0:
+            return 0
+        elif c > 0:
+            if c > 4:
+                return c - 5
+            value = 0
+            for i in xrange(c):
+                value |= self.read_byte() << (8 * i)
+            return value
         else:
-            raise NotImplementedError(type(w_obj))
+            if c < -4:
+                return c + 5
+            value = -1
+            for i in xrange(-c):
+                value &= ~(0xff << (8 * i))
+                value |= self.read_byte() << (8 * i)
+            return value
+
+    def read_string(self):
+        length = self.read_int()
+        if length < 0:
+            raise self.space.error(self.space.w_ArgumentError, "negative string size (or size too big)")
+        return self.read_chars(length)
+
+    def read_float(self):
+        string = self.read_string()
+        if string == "nan":
+            return NAN
+        elif string == "inf":
+            return INFINITY
+        elif string == "-inf":
+            return -INFINITY
+        return float(string)
+
+    def register(self, w_obj):
+        self.objects_w.append(w_obj)
+        return w_obj
+
+    def read_bignum(self):
+        sign = self.read_byte()
+        data = self.read_chars(self.read_int() * 2)
+        bigint = rbigint.frombytes(data, "little", False)
+        if sign == ord("-"):
+            bigint = bigint.neg()
+        try:
+            return self.space.newint(bigint.toint())
+        except OverflowError:
+            return self.space.newbigint_fromrbigint(bigint)
+
+    def load_class(self):
+        space = self.space
+        path = self.load_symbol_name()
+        w_mod = space.w_object
+        for name in path.split("::"):
+            w_res = None
+            if isinstance(w_mod, W_ModuleObject):
+                if w_mod is space.w_object:
+                    w_res = w_mod.find_const(space, name)
+                else:
+                    w_res = w_mod.find_local_const(space, name)
+            if w_res is None:
+                raise space.error(space.w_ArgumentError, "undefined class/module %s" % path)
+            w_mod = w_res
+        if not isinstance(w_mod, W_ClassObject):
+            raise space.error(space.w_ArgumentError, "%s does not refer to class" % path)
+        return w_mod
+
+    def load_symbol_name(self):
+        byte = self.read_byte()
+        if byte == Marshal.SYMBOL:
+            return self.space.symbol_w(self.load_symbol())
+        elif byte == Marshal.SYMLINK:
+            return self.space.symbol_w(self.load_symlink())
+        raise self.space.error(self.space.w_ArgumentError,
+            "dump format error for symbol(0x%x)" % byte
+        )
 
-        return bytes
+    def load_symbol(self):
+        w_symbol = self.space.newsymbol(self.read_string())
+        self.symbols_w.append(w_symbol)
+        return w_symbol
 
-    @staticmethod
-    def load(space, bytes, offset=0):
-        byte = bytes[offset]
+    def load_symlink(self):
+        idx = self.read_int()
+        if not 0 <= idx < len(self.symbols_w):
+            raise self.space.error(self.space.w_ArgumentError, "bad symbol")
+        return self.symbols_w[idx]
+
+    def load(self):
+        space = self.space
+        byte = self.read_byte()
         if byte == Marshal.NIL:
-            return space.w_nil, 1
+            return space.w_nil
         elif byte == Marshal.TRUE:
-            return space.w_true, 1
+            return space.w_true
         elif byte == Marshal.FALSE:
-            return space.w_false, 1
+            return space.w_false
         elif byte == Marshal.FIXNUM:
-            value, length = Marshal.bytes2integer(bytes, offset + 1)
-            return space.newint(value), length
+            return space.newint(self.read_int())
+        elif byte == Marshal.SYMBOL:
+            return self.load_symbol()
+        elif byte == Marshal.SYMLINK:
+            return self.load_symlink()
+        elif byte == Marshal.LINK:
+            idx = self.read_int()
+            if not 0 <= idx < len(self.objects_w):
+                raise space.error(space.w_ArgumentError, "dump format error (unlinked)")
+            return self.objects_w[idx]
         elif byte == Marshal.FLOAT:
-            count, length = Marshal.bytes2integer(bytes, offset + 1)
-
-            chars = []
-            for i in range(length, length + count):
-                chars.append(chr(bytes[offset + i]))
-
-            return space.newfloat(float("".join(chars))), length
+            return self.register(space.newfloat(self.read_float()))
+        elif byte == Marshal.STRING:
+            return self.register(space.newstr_fromstr(self.read_string()))
         elif byte == Marshal.ARRAY:
-            count, skip = Marshal.bytes2integer(bytes, offset + 1)
+            count = self.read_int()
+            w_array = space.newarray([])
+            self.register(w_array)
+            for i in xrange(count):
+                w_array.append(space, self.load())
+            return w_array
+        elif byte == Marshal.HASH:
+            count = self.read_int()
+            w_hash = space.newhash()
+            self.register(w_hash)
+            for i in xrange(count):
+                w_key = self.load()
+                w_value = self.load()
+                w_hash.method_subscript_assign(space, w_key, w_value)
+            return w_hash
+        elif byte == Marshal.BIGNUM:
+            return self.register(self.read_bignum())
+        elif byte == Marshal.OBJECT:
+            w_obj = self.register(space.send(self.load_class(), "allocate"))
+            count = self.read_int()
+            for i in xrange(count):
+                name = self.load_symbol_name()
+                space.set_instance_var(w_obj, name, self.load())
+            return w_obj
+        elif byte == Marshal.STRUCT:
+            w_obj = self.register(space.send(self.load_class(), "allocate"))
+            count = self.read_int()
+            for i in xrange(count):
+                name = self.load_symbol_name()
+                space.set_instance_var(w_obj, "@" + name, self.load())
+            return w_obj
+        elif byte == Marshal.USERDEF:
+            w_cls = self.load_class()
+            w_data = space.newstr_fromstr(self.read_string())
+            return self.register(space.send(w_cls, "_load", [w_data]))
+        elif byte == Marshal.USRMARSHAL:
+            w_obj = self.register(space.send(self.load_class(), "allocate"))
+            space.send(w_obj, "marshal_load", [self.load()])
+            return w_obj
+        elif byte == Marshal.IVAR:
+            w_obj = self.load()
+            count = self.read_int()
+            for i in xrange(count):
+                name = self.load_symbol_name()
+                w_value = self.load()
+                # TODO: take encoding into consideration
+                if name != "E" and name != "encoding":
+                    space.set_instance_var(w_obj, name, w_value)
+            return w_obj
+        raise space.error(space.w_ArgumentError, "dump format error(0x%x)" % byte)
 
-            array = []
-            for i in range(0, count):
-                assert skip > 0
-                element, l = Marshal.load(space, bytes, offset + skip)
-                skip += l
-                array.append(element)
 
-            return space.newarray(array), skip
-        elif byte == Marshal.SYMBOL:
-            count, length = Marshal.bytes2integer(bytes, offset + 1)
+class Marshal(object):
+    moduledef = ModuleDef("Marshal")
 
-            chars = []
-            for i in range(length, length + count):
-                chars.append(chr(bytes[offset + i]))
+    MAJOR_VERSION = 4
+    MINOR_VERSION = 8
 
-            return space.newsymbol("".join(chars)), length + count
-        elif byte == Marshal.IVAR:
-            # TODO: fully interpret IVARS
-            if bytes[offset + 1] == Marshal.STRING:
-                count, length = Marshal.bytes2integer(bytes, offset + 2)
-                encoding = 6
-                chars = []
-                # TODO: take encoding into consideration
-                for i in range(length + 1, length + count + 1):
-                    chars.append(chr(bytes[offset + i]))
-                return space.newstr_fromstr("".join(chars)), count + length + encoding
-            else:
-                raise NotImplementedError(bytes[offset + 1])
-        elif byte == Marshal.HASH:
-            count, skip = Marshal.bytes2integer(bytes, offset + 1)
-            w_hash = space.newhash()
-            for i in range(0, count):
-                assert skip > 0
-                k, s = Marshal.load(space, bytes, offset + skip)
-                skip += s
-                assert skip > 0
-                v, s = Marshal.load(space, bytes, offset + skip)
-                skip += s
-                w_hash.method_subscript_assign(space, k, v)
-            return w_hash, skip
-        else:
-            raise NotImplementedError(byte)
+    NIL = 0x30
+    TRUE = 0x54
+    FALSE = 0x46
+    FIXNUM = 0x69
+    ARRAY = 0x5b
+    SYMBOL = 0x3a
+    SYMLINK = 0x3b
+    LINK = 0x40
+    OBJECT = 0x6f
+    STRUCT = 0x53
+    BIGNUM = 0x6c
+    USERDEF = 0x75
+    USRMARSHAL = 0x55
+    IVAR = 0x49
+    STRING = 0x22
+    HASH = 0x7b
+    FLOAT = 0x66
+
+    @moduledef.setup_module
+    def setup_module(space, w_mod):
+        space.set_const(w_mod, "MAJOR_VERSION", space.newint(Marshal.MAJOR_VERSION))
+        space.set_const(w_mod, "MINOR_VERSION", space.newint(Marshal.MINOR_VERSION))
 
     @moduledef.function("dump")
     def method_dump(self, space, w_obj, w_io=None):
-        bytes = [4, 8]
-        bytes += Marshal.dump(space, w_obj)
-        string = "".join([chr(byte) for byte in bytes])
-
         if w_io is not None:
-            assert isinstance(w_io, W_IOObject)
-            w_io.ensure_not_closed(space)
-            os.write(w_io.fd, string)
-            return w_io
-        else:
-            return space.newstr_fromstr(string)
+            if isinstance(w_io, W_IOObject):
+                w_io.ensure_not_closed(space)
+            elif not space.respond_to(w_io, "write"):
+                raise space.error(space.w_TypeError, "instance of IO needed")
+        writer = MarshalWriter(space, w_io)
+        writer.write_byte(Marshal.MAJOR_VERSION)
+        writer.write_byte(Marshal.MINOR_VERSION)
+        writer.dump(w_obj)
+        if w_io is None:
+            return space.newstr_fromstr(writer.builder.build())
+        writer.flush()
+        if isinstance(w_io, W_IOObject):
+            try:
+                w_io.flush(space)
+            except OSError as e:
+                raise error_for_oserror(space, e)
+        return w_io
 
     @moduledef.function("load")
     @moduledef.function("restore")
     def method_load(self, space, w_obj):
-        string = ""
-
-        if isinstance(w_obj, W_IOObject):
+        if isinstance(w_obj, W_StringObject):
+            reader = MarshalReader(space, None, space.str_w(w_obj))
+        elif isinstance(w_obj, W_IOObject):
             w_obj.ensure_not_closed(space)
-            string = os.read(w_obj.fd, int(os.fstat(w_obj.fd).st_size))
-        elif isinstance(w_obj, W_StringObject):
-            string = space.str_w(w_obj)
+            reader = MarshalReader(space, w_obj, "")
+        elif space.respond_to(w_obj, "read"):
+            reader = MarshalReader(space, w_obj, "")
         else:
             raise space.error(space.w_TypeError, "instance of IO needed")
 
-        if len(string) < 2:
-            raise space.error(space.w_ArgumentError, "marshal data too short")
-
-        bytes = [ord(string[i]) for i in range(0, len(string))]
-        if int(bytes[0]) != Marshal.MAJOR_VERSION or int(bytes[1]) != Marshal.MINOR_VERSION:
+        if reader.w_io is None and len(reader.data) < 2:
+            raise reader.too_short()
+        major = reader.read_byte()
+        minor = reader.read_byte()
+        if major != Marshal.MAJOR_VERSION or minor != Marshal.MINOR_VERSION:
             raise space.error(
                 space.w_TypeError,
                 "incompatible marshal file format (can't be read)\n"
-                "format version %s.%s required; %s.%s given"
-                % (Marshal.MAJOR_VERSION, Marshal.MINOR_VERSION, bytes[0], bytes[1])
+                "format version %d.%d required; %d.%d given"
+                % (Marshal.MAJOR_VERSION, Marshal.MINOR_VERSION, major, minor)
             )
-
-        return Marshal.load(space, bytes, 2)[0]
-
-    # extract integer from marshalled byte array
-    # least significant byte first
-    @staticmethod
-    def bytes2integer(bytes, offset):
-        if bytes[offset] >= 252:
-            value = 256 - bytes[offset + 1]
-            for i in range(2, 256 - bytes[offset] + 1):
-                value += (255 - bytes[offset + i]) * int(math.pow(256, i - 1))
-            return -value, 256 - bytes[offset] + 2
-        elif bytes[offset] > 0 and bytes[offset] < 6:
-            value = bytes[offset + 1]
-            for i in range(2, bytes[offset] + 1):
-                value += bytes[offset + i] * int(math.pow(256, i - 1))
-            return value, bytes[offset] + 2
-        else:
-            value = bytes[offset]
-            if value == 0:
-                return 0, 2
-            elif value > 127:
-                return value - 251, 2
-            else:
-                return value - 5, 2
-
-    # least significant byte first
-    @staticmethod
-    def integer2bytes(value):
-        bytes = []
-
-        if value > 2 ** 30 - 1:
-            raise NotImplementedError("Bignum")
-
-        if value > 2 ** 24 - 1:
-            bytes.append(4)
-            bytes.append(value % 256)
-            bytes.append((value >> 8) % 256)
-            bytes.append((value >> 16) % 256)
-            bytes.append((value >> 24) % 256)
-        elif value > 2 ** 16 - 1:
-            bytes.append(3)
-            bytes.append(value % 256)
-            bytes.append((value >> 8) % 256)
-            bytes.append((value >> 16) % 256)
-        elif value > 255:
-            bytes.append(2)
-            bytes.append(value % 256)
-            bytes.append((value >> 8) % 256)
-        elif value > 122:
-            bytes.append(1)
-            bytes.append(value)
-        elif value > 0:
-            bytes.append(value + 5)
-        elif value == 0:
-            bytes.append(0)
-        elif value > -124:
-            bytes.append(251 + value)
-        elif value > -257:
-            bytes.append(0xff)
-            bytes.append(256 + value)
-        elif value > -(2 ** 16 + 1):
-            bytes.append(0xfe)
-            bytes.append(value % 256)
-            bytes.append((value >> 8) % 256)
-        elif value > -(2 ** 24 + 1):
-            bytes.append(0xfd)
-            bytes.append(value % 256)
-            bytes.append((value >> 8) % 256)
-            bytes.append((value >> 16) % 256)
-        elif value > -(2 ** 30 + 1):
-            bytes.append(0xfc)
-            bytes.append(value % 256)
-            bytes.append((value >> 8) % 256)
-            bytes.append((value >> 16) % 256)
-            bytes.append((value >> 24) % 256)
-        else:
-            raise NotImplementedError("number too small")
-        return bytes
+        return reader.load()
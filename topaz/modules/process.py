@@ -10,6 +10,7 @@ from rpython.rtyper.lltypesystem import rffi, lltype
 from topaz.gateway import Coerce
 from topaz.module import ModuleDef
 from topaz.modules.signal import SIGNALS
+from topaz.objects.ioobject import PendingWrites
 from topaz.system import IS_WINDOWS
 from topaz.error import error_for_oserror
 
@@ -90,6 +91,8 @@ class Process(object):
 
     @moduledef.function("fork")
     def method_fork(self, space, block):
+        # Otherwise both processes would write out the same buffered output.
+        space.fromcache(PendingWrites).flush_all(space)
         pid = fork()
         if pid == 0:
             if block is not None:
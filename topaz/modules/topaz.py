@@ -4,9 +4,15 @@ import sys
 from rpython.rlib.rarithmetic import intmask
 from rpython.rlib.rtermios import tcsetattr, tcgetattr, all_constants
 
+from topaz.celldict import VersionStats
 from topaz.error import error_for_oserror
+from topaz.inlinecache import (
+    ConstantCacheStats, InlineCacheStats, InstanceVarCacheStats, MethodCache
+)
 from topaz.module import ModuleDef
 from topaz.objects.classobject import W_ClassObject
+from topaz.objects.fiberobject import FiberPool
+from topaz.objects.regexpobject import RegexpCache
 
 
 class Topaz(object):
@@ -53,6 +59,90 @@ class Topaz(object):
             w_dest, w_src, taint=taint, untrust=untrust, freeze=freeze)
         return self
 
+    @moduledef.function("inline_cache_stats")
+    def method_inline_cache_stats(self, space):
+        stats = space.fromcache(InlineCacheStats)
+        w_res = space.newhash()
+        for name, value in [
+            ("hits", stats.hits),
+            ("misses", stats.misses),
+            ("megamorphic", stats.megamorphic),
+        ]:
+            space.send(w_res, "[]=", [space.newsymbol(name), space.newint(value)])
+        return w_res
+
+    @moduledef.function("method_cache_stats")
+    def method_method_cache_stats(self, space):
+        cache = space.fromcache(MethodCache)
+        w_res = space.newhash()
+        for name, value in [("hits", cache.hits), ("misses", cache.misses)]:
+            space.send(w_res, "[]=", [space.newsymbol(name), space.newint(value)])
+        return w_res
+
+    @moduledef.function("constant_cache_stats")
+    def method_constant_cache_stats(self, space):
+        stats = space.fromcache(ConstantCacheStats)
+        w_res = space.newhash()
+        for name, value in [("hits", stats.hits), ("misses", stats.misses)]:
+            space.send(w_res, "[]=", [space.newsymbol(name), space.newint(value)])
+        return w_res
+
+    @moduledef.function("instance_var_cache_stats")
+    def method_instance_var_cache_stats(self, space):
+        stats = space.fromcache(InstanceVarCacheStats)
+        w_res = space.newhash()
+        for name, value in [("hits", stats.hits), ("misses", stats.misses)]:
+            space.send(w_res, "[]=", [space.newsymbol(name), space.newint(value)])
+        return w_res
+
+    @moduledef.function("version_stats")
+    def method_version_stats(self, space):
+        stats = space.fromcache(VersionStats)
+        w_res = space.newhash()
+        for name, value in [
+            ("methods", stats.methods),
+            ("constants", stats.constants),
+            ("class_variables", stats.class_variables),
+        ]:
+            space.send(w_res, "[]=", [space.newsymbol(name), space.newint(value)])
+        return w_res
+
+    @moduledef.function("regexp_cache_stats")
+    def method_regexp_cache_stats(self, space):
+        cache = space.fromcache(RegexpCache)
+        w_res = space.newhash()
+        for name, value in [
+            ("hits", cache.hits),
+            ("misses", cache.misses),
+            ("evictions", cache.evictions),
+            ("size", cache.size()),
+        ]:
+            space.send(w_res, "[]=", [space.newsymbol(name), space.newint(value)])
+        return w_res
+
+    @moduledef.function("fiber_stats")
+    def method_fiber_stats(self, space):
+        pool = space.fromcache(FiberPool)
+        sthread = space.getexecutioncontext().fiber_thread
+        w_res = space.newhash()
+        for name, value in [
+            ("created", pool.created),
+            ("reused", pool.reused),
+            ("trimmed", pool.trimmed),
+            ("pooled", len(sthread.idle_handles) if sthread else 0),
+            ("limit", pool.limit),
+        ]:
+            space.send(w_res, "[]=", [space.newsymbol(name), space.newint(value)])
+        return w_res
+
+    @moduledef.function("fiber_pool_limit=", limit="int")
+    def method_set_fiber_pool_limit(self, space, limit):
+        if limit < 0:
+            raise space.error(space.w_ArgumentError, "negative fiber pool limit")
+        sthread = space.getexecutioncontext().fiber_thread
+        space.fromcache(FiberPool).set_limit(space, sthread, limit)
+        return space.newint(limit)
+
     @moduledef.function("tcsetattr", fd="int", when="int", mode_w="array")
     def method_tcsetattr(self, space, fd, when, mode_w):
         cc = [space.str_w(w_char) for w_char in space.listview(mode_w[6])]
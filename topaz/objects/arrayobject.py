@@ -2,11 +2,14 @@ import copy
 
 from rpython.rlib import jit
 from rpython.rlib.listsort import make_timsort_class
+from rpython.rlib.rarithmetic import intmask
 from rpython.rlib.rbigint import rbigint
+from rpython.rlib.rerased import new_static_erasing_pair
 
 from topaz.coerce import Coerce
-from topaz.module import ClassDef, check_frozen
+from topaz.module import ClassDef, check_frozen, make_block_driver
 from topaz.modules.enumerable import Enumerable
+from topaz.objects.floatobject import W_FloatObject
 from topaz.objects.objectobject import W_Object
 from topaz.objects.intobject import W_FixnumObject
 from topaz.utils.packing.pack import RPacker
@@ -44,24 +47,326 @@ class RubySortBy(BaseRubySortBy):
         return self.space.int_w(w_cmp_res) < 0
 
 
+each_driver = make_block_driver("Array#each")
+each_index_driver = make_block_driver("Array#each_index")
+each_with_index_driver = make_block_driver("Array#each_with_index")
+reverse_each_driver = make_block_driver("Array#reverse_each")
+map_driver = make_block_driver("Array#map")
+map_i_driver = make_block_driver("Array#map!")
+select_driver = make_block_driver("Array#select")
+select_in_place_driver = make_block_driver("Array#select!")
+inject_driver = make_block_driver("Array#inject")
+
+
+class ArrayStrategy(object):
+    def __init__(self, space):
+        pass
+
+    def __deepcopy__(self, memo):
+        memo[id(self)] = result = object.__new__(self.__class__)
+        return result
+
+
+class EmptyArrayStrategy(ArrayStrategy):
+    erase, unerase = new_static_erasing_pair("EmptyArrayStrategy")
+
+    def storage_from_list(self, space, items_w):
+        return self.erase(None)
+
+    def deepcopy_storage(self, storage, memo):
+        return storage
+
+    def length(self, storage):
+        return 0
+
+    def getitem(self, space, storage, idx):
+        raise IndexError
+
+    def getslice(self, storage, start, end):
+        return storage
+
+    def listview(self, space, storage):
+        return []
+
+    def copy(self, storage):
+        return storage
+
+    def mul(self, storage, times):
+        return storage
+
+    def setitem(self, space, w_ary, idx, w_value):
+        raise IndexError
+
+    def append(self, space, w_ary, w_value):
+        w_ary.set_items(space, [w_value])
+
+    def extend(self, space, w_ary, items_w):
+        w_ary.set_items(space, items_w[:])
+
+    def extend_storage(self, storage, other_storage):
+        pass
+
+    def insert(self, space, w_ary, idx, w_value):
+        w_ary.set_items(space, [w_value])
+
+    def pop(self, space, storage, idx):
+        raise IndexError
+
+    def delslice(self, storage, start, end):
+        pass
+
+    def reverse(self, storage):
+        pass
+
+
+class TypedArrayStrategyMixin(object):
+    _mixin_ = True
+
+    def storage_from_list(self, space, items_w):
+        return self.erase([self.unwrap(space, w_item) for w_item in items_w])
+
+    def deepcopy_storage(self, storage, memo):
+        return self.erase(self.unerase(storage)[:])
+
+    def length(self, storage):
+        return len(self.unerase(storage))
+
+    def getitem(self, space, storage, idx):
+        return self.wrap(space, self.unerase(storage)[idx])
+
+    def getslice(self, storage, start, end):
+        return self.erase(self.unerase(storage)[start:end])
+
+    def listview(self, space, storage):
+        return [self.wrap(space, item) for item in self.unerase(storage)]
+
+    def copy(self, storage):
+        return self.erase(self.unerase(storage)[:])
+
+    def mul(self, storage, times):
+        return self.erase(self.unerase(storage) * times)
+
+    def setitem(self, space, w_ary, idx, w_value):
+        if self.is_correct_type(w_value):
+            self.unerase(w_ary.array_storage)[idx] = self.unwrap(space, w_value)
+        else:
+            w_ary.switch_to_object_strategy(space)
+            w_ary.strategy.setitem(space, w_ary, idx, w_value)
+
+    def append(self, space, w_ary, w_value):
+        if self.is_correct_type(w_value):
+            self.unerase(w_ary.array_storage).append(self.unwrap(space, w_value))
+        else:
+            w_ary.switch_to_object_strategy(space)
+            w_ary.strategy.append(space, w_ary, w_value)
+
+    def extend(self, space, w_ary, items_w):
+        for w_item in items_w:
+            if not self.is_correct_type(w_item):
+                w_ary.switch_to_object_strategy(space)
+                w_ary.strategy.extend(space, w_ary, items_w)
+                return
+        storage = self.unerase(w_ary.array_storage)
+        for w_item in items_w:
+            storage.append(self.unwrap(space, w_item))
+
+    def extend_storage(self, storage, other_storage):
+        self.unerase(storage).extend(self.unerase(other_storage))
+
+    def insert(self, space, w_ary, idx, w_value):
+        if self.is_correct_type(w_value):
+            self.unerase(w_ary.array_storage).insert(idx, self.unwrap(space, w_value))
+        else:
+            w_ary.switch_to_object_strategy(space)
+            w_ary.strategy.insert(space, w_ary, idx, w_value)
+
+    def pop(self, space, storage, idx):
+        return self.wrap(space, self.unerase(storage).pop(idx))
+
+    def delslice(self, storage, start, end):
+        del self.unerase(storage)[start:end]
+
+    def reverse(self, storage):
+        self.unerase(storage).reverse()
+
+
+class ObjectArrayStrategy(ArrayStrategy, TypedArrayStrategyMixin):
+    erase, unerase = new_static_erasing_pair("ObjectArrayStrategy")
+
+    def storage_from_list(self, space, items_w):
+        return self.erase(items_w)
+
+    def deepcopy_storage(self, storage, memo):
+        return self.erase(copy.deepcopy(self.unerase(storage), memo))
+
+    def listview(self, space, storage):
+        return self.unerase(storage)
+
+    def is_correct_type(self, w_obj):
+        return True
+
+    def wrap(self, space, w_obj):
+        return w_obj
+
+    def unwrap(self, space, w_obj):
+        return w_obj
+
+
+class WatchedArrayStrategy(ObjectArrayStrategy):
+    """
+    An object strategy that counts the mutations made through it, for arrays
+    the interpreter keeps an index of (such as $LOADED_FEATURES). Every
+    instance watches a single array: operations that replace all the items
+    pick a fresh strategy, which watchers notice by identity.
+    """
+
+    def __init__(self, space):
+        ObjectArrayStrategy.__init__(self, space)
+        self.version = 0
+
+    def __deepcopy__(self, memo):
+        obj = ObjectArrayStrategy.__deepcopy__(self, memo)
+        obj.version = self.version
+        return obj
+
+    def setitem(self, space, w_ary, idx, w_value):
+        self.version += 1
+        ObjectArrayStrategy.setitem(self, space, w_ary, idx, w_value)
+
+    def append(self, space, w_ary, w_value):
+        self.version += 1
+        ObjectArrayStrategy.append(self, space, w_ary, w_value)
+
+    def extend(self, space, w_ary, items_w):
+        self.version += 1
+        ObjectArrayStrategy.extend(self, space, w_ary, items_w)
+
+    def extend_storage(self, storage, other_storage):
+        self.version += 1
+        ObjectArrayStrategy.extend_storage(self, storage, other_storage)
+
+    def insert(self, space, w_ary, idx, w_value):
+        self.version += 1
+        ObjectArrayStrategy.insert(self, space, w_ary, idx, w_value)
+
+    def pop(self, space, storage, idx):
+        self.version += 1
+        return ObjectArrayStrategy.pop(self, space, storage, idx)
+
+    def delslice(self, storage, start, end):
+        self.version += 1
+        ObjectArrayStrategy.delslice(self, storage, start, end)
+
+    def reverse(self, storage):
+        self.version += 1
+        ObjectArrayStrategy.reverse(self, storage)
+
+
+class IntArrayStrategy(ArrayStrategy, TypedArrayStrategyMixin):
+    erase, unerase = new_static_erasing_pair("IntArrayStrategy")
+
+    def is_correct_type(self, w_obj):
+        return isinstance(w_obj, W_FixnumObject)
+
+    def wrap(self, space, intvalue):
+        return space.newint(intvalue)
+
+    def unwrap(self, space, w_obj):
+        return space.int_w(w_obj)
+
+
+class FloatArrayStrategy(ArrayStrategy, TypedArrayStrategyMixin):
+    erase, unerase = new_static_erasing_pair("FloatArrayStrategy")
+
+    def is_correct_type(self, w_obj):
+        return isinstance(w_obj, W_FloatObject)
+
+    def wrap(self, space, floatvalue):
+        return space.newfloat(floatvalue)
+
+    def unwrap(self, space, w_obj):
+        return space.float_w(w_obj)
+
+
+def strategy_for_list(space, items_w):
+    if not items_w:
+        return space.fromcache(EmptyArrayStrategy)
+    w_first = items_w[0]
+    if isinstance(w_first, W_FixnumObject):
+        strategy = space.fromcache(IntArrayStrategy)
+    elif isinstance(w_first, W_FloatObject):
+        strategy = space.fromcache(FloatArrayStrategy)
+    else:
+        return space.fromcache(ObjectArrayStrategy)
+    for w_item in items_w:
+        if not strategy.is_correct_type(w_item):
+            return space.fromcache(ObjectArrayStrategy)
+    return strategy
+
+
 class W_ArrayObject(W_Object):
     classdef = ClassDef("Array", W_Object.classdef)
     classdef.include_module(Enumerable)
 
     def __init__(self, space, items_w, klass=None):
         W_Object.__init__(self, space, klass)
-        self.items_w = items_w
+        self.strategy = strategy_for_list(space, items_w)
+        self.array_storage = self.strategy.storage_from_list(space, items_w)
 
     def __deepcopy__(self, memo):
         obj = super(W_ArrayObject, self).__deepcopy__(memo)
-        obj.items_w = copy.deepcopy(self.items_w, memo)
+        obj.strategy = copy.deepcopy(self.strategy, memo)
+        obj.array_storage = self.strategy.deepcopy_storage(self.array_storage, memo)
         return obj
 
+    @staticmethod
+    def newarray_fromstorage(space, strategy, storage, klass=None):
+        w_array = W_ArrayObject(space, [], klass)
+        if isinstance(strategy, WatchedArrayStrategy):
+            # Copies and slices of a watched array aren't watched themselves.
+            strategy = space.fromcache(ObjectArrayStrategy)
+        w_array.strategy = strategy
+        w_array.array_storage = storage
+        return w_array
+
     def listview(self, space):
-        return self.items_w
+        return self.strategy.listview(space, self.array_storage)
 
     def length(self):
-        return len(self.items_w)
+        return self.strategy.length(self.array_storage)
+
+    def getitem(self, space, idx):
+        return self.strategy.getitem(space, self.array_storage, idx)
+
+    def set_items(self, space, items_w):
+        self.strategy = strategy_for_list(space, items_w)
+        self.array_storage = self.strategy.storage_from_list(space, items_w)
+
+    def watch(self, space, strategy):
+        assert isinstance(strategy, WatchedArrayStrategy)
+        items_w = self.listview(space)
+        self.strategy = strategy
+        self.array_storage = strategy.storage_from_list(space, items_w)
+
+    def switch_to_object_strategy(self, space):
+        items_w = self.listview(space)
+        self.strategy = space.fromcache(ObjectArrayStrategy)
+        self.array_storage = self.strategy.storage_from_list(space, items_w)
+
+    def append(self, space, w_obj):
+        self.strategy.append(space, self, w_obj)
+
+    def extend(self, space, items_w):
+        self.strategy.extend(space, self, items_w)
+
+    def extend_from_array(self, space, w_other):
+        if w_other.strategy is self.strategy:
+            self.strategy.extend_storage(self.array_storage, w_other.array_storage)
+        elif w_other.length() > 0:
+            items_w = w_other.listview(space)
+            if w_other is self:
+                items_w = items_w[:]
+            self.extend(space, items_w)
 
     @classdef.singleton_method("allocate")
     def singleton_method_allocate(self, space):
@@ -71,8 +376,7 @@ class W_ArrayObject(W_Object):
     @classdef.method("replace", other_w="array")
     @check_frozen()
     def method_replace(self, space, other_w):
-        del self.items_w[:]
-        self.items_w.extend(other_w)
+        self.set_items(space, other_w[:])
         return self
 
     @classdef.method("[]")
@@ -84,9 +388,13 @@ class W_ArrayObject(W_Object):
         elif as_range:
             assert start >= 0
             assert end >= 0
-            return W_ArrayObject(space, self.items_w[start:end], space.getnonsingletonclass(self))
+            return W_ArrayObject.newarray_fromstorage(
+                space, self.strategy,
+                self.strategy.getslice(self.array_storage, start, end),
+                space.getnonsingletonclass(self)
+            )
         else:
-            return self.items_w[start]
+            return self.getitem(space, start)
 
     @classdef.method("[]=")
     @check_frozen()
@@ -116,28 +424,30 @@ class W_ArrayObject(W_Object):
             if w_converted is space.w_nil:
                 rep_w = [w_obj]
             else:
-                rep_w = space.listview(w_converted)
+                rep_w = space.listview(w_converted)[:]
             self._subscript_assign_range(space, start, end, rep_w)
         elif start >= self.length():
-            self.items_w += [space.w_nil] * (start - self.length() + 1)
-            self.items_w[start] = w_obj
+            self._append_nils(space, start - self.length())
+            self.append(space, w_obj)
         else:
-            self.items_w[start] = w_obj
+            self.strategy.setitem(space, self, start, w_obj)
         return w_obj
 
     def _subscript_assign_range(self, space, start, end, rep_w):
         assert end >= 0
+        items_w = self.listview(space)[:]
         delta = (end - start) - len(rep_w)
         if delta < 0:
-            self.items_w += [None] * -delta
+            items_w += [None] * -delta
             lim = start + len(rep_w)
-            i = self.length() - 1
+            i = len(items_w) - 1
             while i >= lim:
-                self.items_w[i] = self.items_w[i + delta]
+                items_w[i] = items_w[i + delta]
                 i -= 1
         elif delta > 0:
-            del self.items_w[start:start + delta]
-        self.items_w[start:start + len(rep_w)] = rep_w
+            del items_w[start:start + delta]
+        items_w[start:start + len(rep_w)] = rep_w
+        self.set_items(space, items_w)
 
     @classdef.method("slice!")
     @check_frozen()
@@ -151,13 +461,11 @@ class W_ArrayObject(W_Object):
             end = min(max(end, 0), self.length())
             delta = (end - start)
             assert delta >= 0
-            w_items = self.items_w[start:start + delta]
-            del self.items_w[start:start + delta]
-            return space.newarray(w_items)
+            storage = self.strategy.getslice(self.array_storage, start, start + delta)
+            self.strategy.delslice(self.array_storage, start, start + delta)
+            return W_ArrayObject.newarray_fromstorage(space, self.strategy, storage)
         else:
-            w_item = self.items_w[start]
-            del self.items_w[start]
-            return w_item
+            return self.strategy.pop(space, self.array_storage, start)
 
     @classdef.method("size")
     @classdef.method("length")
@@ -168,20 +476,27 @@ class W_ArrayObject(W_Object):
     def method_emptyp(self, space):
         return space.newbool(self.length() == 0)
 
-    @classdef.method("+", other="array")
-    def method_add(self, space, other):
-        return space.newarray(self.items_w + other)
+    @classdef.method("+")
+    def method_add(self, space, w_other):
+        w_other = space.convert_type(w_other, space.w_array, "to_ary")
+        assert isinstance(w_other, W_ArrayObject)
+        w_res = W_ArrayObject.newarray_fromstorage(
+            space, self.strategy, self.strategy.copy(self.array_storage))
+        w_res.extend_from_array(space, w_other)
+        return w_res
 
     @classdef.method("<<")
     @check_frozen()
     def method_lshift(self, space, w_obj):
-        self.items_w.append(w_obj)
+        self.append(space, w_obj)
         return self
 
-    @classdef.method("concat", other="array")
+    @classdef.method("concat")
     @check_frozen()
-    def method_concat(self, space, other):
-        self.items_w += other
+    def method_concat(self, space, w_other):
+        w_other = space.convert_type(w_other, space.w_array, "to_ary")
+        assert isinstance(w_other, W_ArrayObject)
+        self.extend_from_array(space, w_other)
         return self
 
     @classdef.method("*")
@@ -191,83 +506,45 @@ class W_ArrayObject(W_Object):
         n = space.int_w(space.convert_type(w_other, space.w_fixnum, "to_int"))
         if n < 0:
             raise space.error(space.w_ArgumentError, "Count cannot be negative")
-        w_res = W_ArrayObject(space, self.items_w * n, space.getnonsingletonclass(self))
+        w_res = W_ArrayObject.newarray_fromstorage(
+            space, self.strategy, self.strategy.mul(self.array_storage, n),
+            space.getnonsingletonclass(self)
+        )
         space.infect(w_res, self, freeze=False)
         return w_res
 
-    @classdef.method("insert", w_idx="int")
-    @check_frozen()
-    def method_insert(self, space, w_idx, args_w):
-        if len(args_w) == 0:
-            return self
-
-        if isinstance(w_idx, W_FixnumObject):
-            idx = space.int_w(w_idx)
-        else:
-            idx = space.int_w(space.convert_type(w_idx, space.w_fixnum, "to_int"))
-
-        length = len(self.items_w)
-
-        if idx < -length - 1:
-            raise space.error(
-                space.w_IndexError,
-                "index %d too small for array; minimum: %d" % (
-                    idx + 1,
-                    -length
-                )
-            )
-        elif idx > length:
-            before = self.items_w
-            for i in range(idx - length):
-                before.append(space.w_nil)
-            after = []
-        elif idx == 0:
-            before = []
-            after = self.items_w
-        elif idx < 0:
-            split_idx = length + idx + 1
-            assert split_idx >= 0
-            before = self.items_w[:split_idx]
-            after = self.items_w[split_idx:]
-        else:
-            assert idx > 0
-            before = self.items_w[:idx]
-            after = self.items_w[idx:]
-
-        self.items_w = before + args_w + after
-        return self
-
     @classdef.method("push")
     @check_frozen()
     def method_push(self, space, args_w):
-        self.items_w.extend(args_w)
+        self.extend(space, args_w)
         return self
 
     @classdef.method("shift")
     @check_frozen()
     def method_shift(self, space, w_n=None):
         if w_n is None:
-            if self.items_w:
-                return self.items_w.pop(0)
+            if self.length() > 0:
+                return self.strategy.pop(space, self.array_storage, 0)
             else:
                 return space.w_nil
         n = space.int_w(space.convert_type(w_n, space.w_fixnum, "to_int"))
         if n < 0:
             raise space.error(space.w_ArgumentError, "negative array size")
-        items_w = self.items_w[:n]
-        del self.items_w[:n]
-        return space.newarray(items_w)
+        n = min(n, self.length())
+        storage = self.strategy.getslice(self.array_storage, 0, n)
+        self.strategy.delslice(self.array_storage, 0, n)
+        return W_ArrayObject.newarray_fromstorage(space, self.strategy, storage)
 
     @classdef.method("unshift")
     @check_frozen()
     def method_unshift(self, space, args_w):
         for w_obj in reversed(args_w):
-            self.items_w.insert(0, w_obj)
+            self.strategy.insert(space, self, 0, w_obj)
         return self
 
     @classdef.method("join")
     def method_join(self, space, w_sep=None):
-        if not self.items_w:
+        if self.length() == 0:
             return space.newstr_fromstr("")
         if w_sep is None:
             separator = ""
@@ -280,15 +557,15 @@ class W_ArrayObject(W_Object):
             )
         return space.newstr_fromstr(separator.join([
             space.str_w(space.send(w_o, "to_s"))
-            for w_o in self.items_w
+            for w_o in self.listview(space)
         ]))
 
     @classdef.method("pop")
     @check_frozen()
     def method_pop(self, space, w_num=None):
         if w_num is None:
-            if self.items_w:
-                return self.items_w.pop()
+            if self.length() > 0:
+                return self.strategy.pop(space, self.array_storage, self.length() - 1)
             else:
                 return space.w_nil
         else:
@@ -298,10 +575,11 @@ class W_ArrayObject(W_Object):
             if num < 0:
                 raise space.error(space.w_ArgumentError, "negative array size")
             else:
-                pop_size = max(0, self.length() - num)
-                res_w = self.items_w[pop_size:]
-                del self.items_w[pop_size:]
-                return space.newarray(res_w)
+                length = self.length()
+                pop_size = max(0, length - num)
+                storage = self.strategy.getslice(self.array_storage, pop_size, length)
+                self.strategy.delslice(self.array_storage, pop_size, length)
+                return W_ArrayObject.newarray_fromstorage(space, self.strategy, storage)
 
     @classdef.method("delete_at", idx="int")
     @check_frozen()
@@ -311,7 +589,7 @@ class W_ArrayObject(W_Object):
         if idx < 0 or idx >= self.length():
             return space.w_nil
         else:
-            return self.items_w.pop(idx)
+            return self.strategy.pop(space, self.array_storage, idx)
 
     @classdef.method("last")
     def method_last(self, space, w_count=None):
@@ -322,12 +600,15 @@ class W_ArrayObject(W_Object):
             start = self.length() - count
             if start < 0:
                 start = 0
-            return space.newarray(self.items_w[start:])
+            return W_ArrayObject.newarray_fromstorage(
+                space, self.strategy,
+                self.strategy.getslice(self.array_storage, start, self.length())
+            )
 
         if self.length() == 0:
             return space.w_nil
         else:
-            return self.items_w[self.length() - 1]
+            return self.getitem(space, self.length() - 1)
 
     @classdef.method("pack")
     def method_pack(self, space, w_template):
@@ -344,13 +625,15 @@ class W_ArrayObject(W_Object):
     @classdef.method("clear")
     @check_frozen()
     def method_clear(self, space):
-        del self.items_w[:]
+        self.set_items(space, [])
         return self
 
     @classdef.method("sort!")
     @check_frozen()
     def method_sort_i(self, space, block):
-        RubySorter(space, self.items_w, sortblock=block).sort()
+        items_w = self.listview(space)
+        RubySorter(space, items_w, sortblock=block).sort()
+        self.set_items(space, items_w)
         return self
 
     @classdef.method("sort_by!")
@@ -358,13 +641,15 @@ class W_ArrayObject(W_Object):
     def method_sort_by_i(self, space, block):
         if block is None:
             return space.send(self, "enum_for", [space.newsymbol("sort_by!")])
-        RubySortBy(space, self.items_w, sortblock=block).sort()
+        items_w = self.listview(space)
+        RubySortBy(space, items_w, sortblock=block).sort()
+        self.set_items(space, items_w)
         return self
 
     @classdef.method("reverse!")
     @check_frozen()
     def method_reverse_i(self, space):
-        self.items_w.reverse()
+        self.strategy.reverse(self.array_storage)
         return self
 
     @classdef.method("rotate!", n="int")
@@ -380,8 +665,9 @@ class W_ArrayObject(W_Object):
         if n == 0:
             return self
         assert n >= 0
-        self.items_w.extend(self.items_w[:n])
-        del self.items_w[:n]
+        head = self.strategy.getslice(self.array_storage, 0, n)
+        self.strategy.delslice(self.array_storage, 0, n)
+        self.strategy.extend_storage(self.array_storage, head)
         return self
 
     @classdef.method("insert", i="int")
@@ -393,7 +679,7 @@ class W_ArrayObject(W_Object):
         length = self.length()
         if i > length:
             self._append_nils(space, i - length)
-            self.items_w.extend(args_w)
+            self.extend(space, args_w)
             return self
         if i < 0:
             if i < -length - 1:
@@ -403,10 +689,471 @@ class W_ArrayObject(W_Object):
             i += length + 1
         assert i >= 0
         for w_e in args_w:
-            self.items_w.insert(i, w_e)
+            self.strategy.insert(space, self, i, w_e)
             i += 1
         return self
 
     def _append_nils(self, space, num):
-        for _ in xrange(num):
-            self.items_w.append(space.w_nil)
+        if num > 0:
+            self.extend(space, [space.w_nil] * num)
+
+    # Native versions of the iteration methods, which used to be written in
+    # Ruby in terms of #each. Like MRI's they iterate over the array itself,
+    # so they keep working if the array is modified by the block.
+
+    @classdef.method("each")
+    def method_each(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("each")])
+        i = 0
+        while i < self.length():
+            each_driver.jit_merge_point(bytecode=block.bytecode)
+            space.invoke_block(block, [self.getitem(space, i)])
+            i += 1
+        return self
+
+    @classdef.method("each_index")
+    def method_each_index(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("each_index")])
+        i = 0
+        while i < self.length():
+            each_index_driver.jit_merge_point(bytecode=block.bytecode)
+            space.invoke_block(block, [space.newint(i)])
+            i += 1
+        return self
+
+    @classdef.method("each_with_index")
+    def method_each_with_index(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("each_with_index")])
+        i = 0
+        while i < self.length():
+            each_with_index_driver.jit_merge_point(bytecode=block.bytecode)
+            space.invoke_block(block, [self.getitem(space, i), space.newint(i)])
+            i += 1
+        return self
+
+    @classdef.method("reverse_each")
+    def method_reverse_each(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("reverse_each")])
+        i = self.length() - 1
+        while i >= 0:
+            reverse_each_driver.jit_merge_point(bytecode=block.bytecode)
+            space.invoke_block(block, [self.getitem(space, i)])
+            i = min(i, self.length()) - 1
+        return self
+
+    @classdef.method("map")
+    @classdef.method("collect")
+    def method_map(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("map")])
+        result_w = []
+        i = 0
+        while i < self.length():
+            map_driver.jit_merge_point(bytecode=block.bytecode)
+            result_w.append(space.invoke_block(block, [self.getitem(space, i)]))
+            i += 1
+        return space.newarray(result_w)
+
+    @classdef.method("map!")
+    @classdef.method("collect!")
+    @check_frozen()
+    def method_map_i(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("map!")])
+        i = 0
+        while i < self.length():
+            map_i_driver.jit_merge_point(bytecode=block.bytecode)
+            w_res = space.invoke_block(block, [self.getitem(space, i)])
+            if i < self.length():
+                self.strategy.setitem(space, self, i, w_res)
+            i += 1
+        return self
+
+    def _select(self, space, block, keep):
+        result_w = []
+        i = 0
+        while i < self.length():
+            select_driver.jit_merge_point(bytecode=block.bytecode)
+            w_item = self.getitem(space, i)
+            if space.is_true(space.invoke_block(block, [w_item])) == keep:
+                result_w.append(w_item)
+            i += 1
+        return space.newarray(result_w)
+
+    @classdef.method("select")
+    @classdef.method("find_all")
+    def method_select(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("select")])
+        return self._select(space, block, True)
+
+    @classdef.method("reject")
+    def method_reject(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("reject")])
+        return self._select(space, block, False)
+
+    def _select_in_place(self, space, block, keep):
+        """
+        Removes the items for which the block's truthiness isn't keep, and
+        returns how many were removed.
+        """
+        i = 0
+        removed = 0
+        while i + removed < self.length():
+            select_in_place_driver.jit_merge_point(bytecode=block.bytecode)
+            w_item = self.getitem(space, i + removed)
+            if space.is_true(space.invoke_block(block, [w_item])) == keep:
+                if removed:
+                    self.strategy.setitem(space, self, i, w_item)
+                i += 1
+            else:
+                removed += 1
+        if removed:
+            end = self.length()
+            start = end - removed
+            assert start >= 0
+            self.strategy.delslice(self.array_storage, start, end)
+        return removed
+
+    @classdef.method("select!")
+    @check_frozen()
+    def method_select_i(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("select!")])
+        if self._select_in_place(space, block, True):
+            return self
+        return space.w_nil
+
+    @classdef.method("keep_if")
+    @check_frozen()
+    def method_keep_if(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("keep_if")])
+        self._select_in_place(space, block, True)
+        return self
+
+    @classdef.method("reject!")
+    @check_frozen()
+    def method_reject_i(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("reject!")])
+        if self._select_in_place(space, block, False):
+            return self
+        return space.w_nil
+
+    @classdef.method("delete_if")
+    @check_frozen()
+    def method_delete_if(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("delete_if")])
+        self._select_in_place(space, block, False)
+        return self
+
+    @classdef.method("delete")
+    @check_frozen()
+    def method_delete(self, space, w_obj, block):
+        w_found = None
+        i = 0
+        removed = 0
+        while i + removed < self.length():
+            w_item = self.getitem(space, i + removed)
+            if w_item is w_obj or space.is_true(space.send(w_item, "==", [w_obj])):
+                w_found = w_item
+                removed += 1
+            else:
+                if removed:
+                    self.strategy.setitem(space, self, i, w_item)
+                i += 1
+        if w_found is None:
+            if block is not None:
+                return space.invoke_block(block, [w_obj])
+            return space.w_nil
+        end = self.length()
+        start = end - removed
+        assert start >= 0
+        self.strategy.delslice(self.array_storage, start, end)
+        return w_found
+
+    @classdef.method("inject")
+    @classdef.method("reduce")
+    def method_inject(self, space, args_w, block):
+        w_memo = None
+        op = None
+        if len(args_w) == 1:
+            if space.is_kind_of(args_w[0], space.w_symbol):
+                op = space.symbol_w(args_w[0])
+            else:
+                w_memo = args_w[0]
+        elif len(args_w) == 2:
+            w_memo = args_w[0]
+            op = space.symbol_w(args_w[1])
+        elif len(args_w) > 2:
+            raise space.error(space.w_ArgumentError,
+                "wrong number of arguments (%d for 0..2)" % len(args_w)
+            )
+        if op is None and block is None:
+            raise space.error(space.w_LocalJumpError, "no block given (yield)")
+
+        i = 0
+        if w_memo is None:
+            if self.length() == 0:
+                return space.w_nil
+            w_memo = self.getitem(space, 0)
+            i = 1
+        if op is not None:
+            while i < self.length():
+                w_memo = space.send(w_memo, op, [self.getitem(space, i)])
+                i += 1
+        else:
+            while i < self.length():
+                inject_driver.jit_merge_point(bytecode=block.bytecode)
+                w_memo = space.invoke_block(block, [w_memo, self.getitem(space, i)])
+                i += 1
+        return w_memo
+
+    @classdef.method("include?")
+    @classdef.method("member?")
+    def method_includep(self, space, w_obj):
+        i = 0
+        while i < self.length():
+            w_item = self.getitem(space, i)
+            if w_item is w_obj or space.is_true(space.send(w_item, "==", [w_obj])):
+                return space.w_true
+            i += 1
+        return space.w_false
+
+    def _matches(self, space, w_item, w_obj, block):
+        if w_obj is not None:
+            return w_item is w_obj or space.is_true(space.send(w_item, "==", [w_obj]))
+        return space.is_true(space.invoke_block(block, [w_item]))
+
+    @classdef.method("index")
+    @classdef.method("find_index")
+    def method_index(self, space, w_obj=None, block=None):
+        if w_obj is None and block is None:
+            return space.send(self, "enum_for", [space.newsymbol("index")])
+        i = 0
+        while i < self.length():
+            if self._matches(space, self.getitem(space, i), w_obj, block):
+                return space.newint(i)
+            i += 1
+        return space.w_nil
+
+    @classdef.method("rindex")
+    def method_rindex(self, space, w_obj=None, block=None):
+        if w_obj is None and block is None:
+            return space.send(self, "enum_for", [space.newsymbol("rindex")])
+        i = self.length() - 1
+        while i >= 0:
+            if self._matches(space, self.getitem(space, i), w_obj, block):
+                return space.newint(i)
+            i = min(i, self.length()) - 1
+        return space.w_nil
+
+    @classdef.method("count")
+    def method_count(self, space, w_obj=None, block=None):
+        if w_obj is None and block is None:
+            return space.newint(self.length())
+        count = 0
+        i = 0
+        while i < self.length():
+            if self._matches(space, self.getitem(space, i), w_obj, block):
+                count += 1
+            i += 1
+        return space.newint(count)
+
+    @classdef.method("any?")
+    def method_anyp(self, space, block):
+        i = 0
+        while i < self.length():
+            w_item = self.getitem(space, i)
+            if block is not None:
+                w_item = space.invoke_block(block, [w_item])
+            if space.is_true(w_item):
+                return space.w_true
+            i += 1
+        return space.w_false
+
+    @classdef.method("all?")
+    def method_allp(self, space, block):
+        i = 0
+        while i < self.length():
+            w_item = self.getitem(space, i)
+            if block is not None:
+                w_item = space.invoke_block(block, [w_item])
+            if not space.is_true(w_item):
+                return space.w_false
+            i += 1
+        return space.w_true
+
+    @classdef.method("first")
+    def method_first(self, space, w_n=None):
+        if w_n is None:
+            if self.length() == 0:
+                return space.w_nil
+            return self.getitem(space, 0)
+        n = space.int_w(space.convert_type(w_n, space.w_fixnum, "to_int"))
+        if n < 0:
+            raise space.error(space.w_ArgumentError, "attempt to take negative size")
+        n = min(n, self.length())
+        return W_ArrayObject.newarray_fromstorage(
+            space, self.strategy, self.strategy.getslice(self.array_storage, 0, n)
+        )
+
+    @classdef.method("at")
+    def method_at(self, space, w_idx):
+        return self.method_subscript(space, w_idx)
+
+    @classdef.method("compact")
+    def method_compact(self, space):
+        return space.newarray([
+            w_item for w_item in self.listview(space) if w_item is not space.w_nil
+        ])
+
+    @classdef.method("compact!")
+    @check_frozen()
+    def method_compact_i(self, space):
+        items_w = [
+            w_item for w_item in self.listview(space) if w_item is not space.w_nil
+        ]
+        if len(items_w) == self.length():
+            return space.w_nil
+        self.set_items(space, items_w)
+        return self
+
+    @classdef.method("==")
+    def method_eq(self, space, w_other):
+        if self is w_other:
+            return space.w_true
+        if not isinstance(w_other, W_ArrayObject):
+            if space.respond_to(w_other, "to_ary"):
+                return space.newbool(space.is_true(space.send(w_other, "==", [self])))
+            return space.w_false
+        if self.length() != w_other.length():
+            return space.w_false
+        with space.getexecutioncontext().recursion_guard("array_equals", self) as in_recursion:
+            if not in_recursion:
+                i = 0
+                while i < self.length() and i < w_other.length():
+                    w_item = self.getitem(space, i)
+                    w_other_item = w_other.getitem(space, i)
+                    if not (w_item is w_other_item or
+                            space.is_true(space.send(w_item, "==", [w_other_item]))):
+                        return space.w_false
+                    i += 1
+        return space.w_true
+
+    @classdef.method("eql?")
+    def method_eqlp(self, space, w_other):
+        if self is w_other:
+            return space.w_true
+        if not isinstance(w_other, W_ArrayObject):
+            return space.w_false
+        if self.length() != w_other.length():
+            return space.w_false
+        with space.getexecutioncontext().recursion_guard("array_eqlp", self) as in_recursion:
+            if not in_recursion:
+                i = 0
+                while i < self.length() and i < w_other.length():
+                    w_item = self.getitem(space, i)
+                    w_other_item = w_other.getitem(space, i)
+                    if not space.is_true(space.send(w_item, "eql?", [w_other_item])):
+                        return space.w_false
+                    i += 1
+        return space.w_true
+
+    @classdef.method("hash")
+    def method_hash(self, space):
+        res = 0x345678
+        with space.getexecutioncontext().recursion_guard("array_hash", self) as in_recursion:
+            if not in_recursion:
+                i = 0
+                while i < self.length():
+                    w_hash = space.send(self.getitem(space, i), "hash")
+                    if isinstance(w_hash, W_FixnumObject):
+                        h = space.int_w(w_hash)
+                    else:
+                        h = intmask(space.bigint_w(w_hash).uintmask())
+                    # Stay within the fixnum range, like Topaz.intmask.
+                    res = intmask((1000003 * res) ^ h)
+                    i += 1
+        return space.newint(res)
+
+    @classdef.method("to_a")
+    def method_to_a(self, space):
+        if space.getclass(self) is space.w_array:
+            return self
+        return space.newarray(self.listview(space)[:])
+
+    def _key_set(self, space, items_w):
+        # A Hash picks a typed strategy for Fixnum, Symbol and String keys,
+        # and only falls back to calling eql? and hash for anything else.
+        w_set = space.newhash()
+        for w_item in items_w:
+            w_set.setitem(space, w_item, space.w_true)
+        return w_set
+
+    def _uniq(self, space, block):
+        """Removes duplicates in place, returns whether anything changed."""
+        w_seen = space.newhash()
+        items_w = self.listview(space)[:]
+        res_w = []
+        for w_item in items_w:
+            w_key = w_item
+            if block is not None:
+                w_key = space.invoke_block(block, [w_item])
+            if not w_seen.contains(space, w_key):
+                w_seen.setitem(space, w_key, space.w_true)
+                res_w.append(w_item)
+        if len(res_w) == len(items_w):
+            return False
+        self.set_items(space, res_w)
+        return True
+
+    @classdef.method("uniq!")
+    @check_frozen()
+    def method_uniq_i(self, space, block):
+        if self._uniq(space, block):
+            return self
+        return space.w_nil
+
+    @classdef.method("uniq")
+    def method_uniq(self, space, block):
+        w_res = space.send(self, "dup")
+        assert isinstance(w_res, W_ArrayObject)
+        w_res._uniq(space, block)
+        return w_res
+
+    @classdef.method("&", other_w="array")
+    def method_and(self, space, other_w):
+        w_other_set = self._key_set(space, other_w)
+        res_w = []
+        for w_item in self.listview(space)[:]:
+            if w_other_set.delete(space, w_item) is not None:
+                res_w.append(w_item)
+        return space.newarray(res_w)
+
+    @classdef.method("|", other_w="array")
+    def method_or(self, space, other_w):
+        w_seen = space.newhash()
+        res_w = []
+        for items_w in [self.listview(space)[:], other_w]:
+            for w_item in items_w:
+                if not w_seen.contains(space, w_item):
+                    w_seen.setitem(space, w_item, space.w_true)
+                    res_w.append(w_item)
+        return space.newarray(res_w)
+
+    @classdef.method("-", other_w="array")
+    def method_sub(self, space, other_w):
+        w_other_set = self._key_set(space, other_w)
+        res_w = []
+        for w_item in self.listview(space)[:]:
+            if not w_other_set.contains(space, w_item):
+                res_w.append(w_item)
+        return space.newarray(res_w)
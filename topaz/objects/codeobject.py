@@ -1,5 +1,6 @@
 import copy
 
+from topaz.inlinecache import ConstantCache, InstanceVarCache, SendCache
 from topaz.module import ClassDef
 from topaz.objects.objectobject import W_BaseObject
 
@@ -31,6 +32,12 @@ class W_CodeObject(W_BaseObject):
         self.cellvars = cellvars
         self.freevars = freevars
         self.lineno_table = lineno_table
+        # {pc: SendCache}, filled lazily as call sites are executed.
+        self.send_caches = {}
+        # {pc: ConstantCache}, likewise for LOAD_LOCAL_CONSTANT sites.
+        self.const_caches = {}
+        # {pc: InstanceVarCache}, for LOAD_INSTANCE_VAR/STORE_INSTANCE_VAR.
+        self.ivar_caches = {}
 
         n_args = len(args)
         arg_pos = [-1] * n_args
@@ -77,8 +84,32 @@ class W_CodeObject(W_BaseObject):
         obj.kw_defaults = self.kw_defaults
         obj.kwrest_pos = self.kwrest_pos
         obj.kwarg_names = self.kwarg_names
+        obj.send_caches = {}
+        obj.const_caches = {}
+        obj.ivar_caches = {}
         return obj
 
+    def get_send_cache(self, pc):
+        try:
+            return self.send_caches[pc]
+        except KeyError:
+            cache = self.send_caches[pc] = SendCache()
+            return cache
+
+    def get_const_cache(self, pc):
+        try:
+            return self.const_caches[pc]
+        except KeyError:
+            cache = self.const_caches[pc] = ConstantCache()
+            return cache
+
+    def get_ivar_cache(self, pc):
+        try:
+            return self.ivar_caches[pc]
+        except KeyError:
+            cache = self.ivar_caches[pc] = InstanceVarCache()
+            return cache
+
     def arity(self, negative_defaults=False):
         args_count = len(self.arg_pos) - len(self.defaults)
         if self.splat_arg_pos != -1 or (negative_defaults and len(self.defaults) > 0):
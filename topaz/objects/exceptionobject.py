@@ -1,4 +1,5 @@
 from topaz.module import ClassDef
+from topaz.objects.functionobject import W_BuiltinFunction
 from topaz.objects.objectobject import W_Object
 
 
@@ -8,15 +9,48 @@ def new_exception_allocate(classdef):
         return classdef.cls(space, self)
 
 
+class ExceptionConstructors(object):
+    """
+    The builtin Class#new and Exception#initialize. When an exception class
+    uses both, space.error can skip dispatching to them and set the message
+    directly.
+    """
+
+    def __init__(self, space):
+        self.w_new = self._builtin(space.w_class.find_method(space, "new"))
+        self.w_initialize = self._builtin(space.getclassfor(
+            W_ExceptionObject).find_method(space, "initialize"))
+
+    def _builtin(self, w_method):
+        # If they were already redefined, never take the fast path.
+        if isinstance(w_method, W_BuiltinFunction):
+            return w_method
+        return None
+
+    def are_default(self, space, w_type):
+        return (self.w_new is not None and self.w_initialize is not None and
+                space.lookup_method(space.getclass(w_type), "new") is self.w_new and
+                space.lookup_method(w_type, "initialize") is self.w_initialize)
+
+
 class W_ExceptionObject(W_Object):
-    _attrs_ = ["msg", "frame", "last_instructions", "w_backtrace"]
+    _attrs_ = [
+        "msg", "backtrace_entries", "callee_back_instr", "rescue_frame",
+        "last_instructions", "w_backtrace",
+    ]
 
     classdef = ClassDef("Exception", W_Object.classdef)
 
     def __init__(self, space, klass=None):
         W_Object.__init__(self, space, klass)
         self.msg = ""
-        self.frame = None
+        # [(code, pc, name)], the frames this was raised through, turned into
+        # strings only when the backtrace is asked for. Builtin frames get the
+        # code of their caller once it is recorded.
+        self.backtrace_entries = None
+        self.callee_back_instr = -1
+        # The frame which rescued us, the rest of the backtrace is its callers.
+        self.rescue_frame = None
         self.w_backtrace = None
 
     def __str__(self):
@@ -28,10 +62,49 @@ class W_ExceptionObject(W_Object):
         """Copies special instance vars after #copy or #dup"""
         assert isinstance(w_other, W_ExceptionObject)
         W_Object.copy_instance_vars(self, space, w_other)
-        self.msg = w_other.msg
-        self.frame = w_other.frame
+        self.msg = w_other.get_message(space)
+        if w_other.backtrace_entries is not None:
+            self.backtrace_entries = w_other.backtrace_entries[:]
+        self.callee_back_instr = w_other.callee_back_instr
+        self.rescue_frame = w_other.rescue_frame
         self.w_backtrace = w_other.w_backtrace
 
+    def get_message(self, space):
+        return self.msg
+
+    def record_unwind(self, frame):
+        """Records a frame this propagated out of."""
+        if self.rescue_frame is None:
+            self._record_frame(frame)
+
+    def record_rescue(self, frame):
+        """
+        Records the frame that rescued us. Its callers are only walked when
+        the backtrace is asked for, so the frame has to stay valid.
+        """
+        if self.rescue_frame is None:
+            self._record_frame(frame)
+            frame.escaped = True
+            self.rescue_frame = frame
+
+    def _record_frame(self, frame):
+        if self.backtrace_entries is None:
+            self.backtrace_entries = []
+        entries = self.backtrace_entries
+        code = frame.get_unwind_code()
+        if code is not None:
+            i = len(entries) - 1
+            while i >= 0 and entries[i][0] is None:
+                _, instr, name = entries[i]
+                entries[i] = (code, instr, name)
+                i -= 1
+        entries.append((
+            code,
+            frame.get_unwind_instr(self.callee_back_instr),
+            frame.get_code_name(),
+        ))
+        self.callee_back_instr = frame.back_last_instr
+
     @classdef.method("initialize")
     def method_initialize(self, space, w_msg=None):
         if w_msg is space.w_nil or w_msg is None:
@@ -42,7 +115,7 @@ class W_ExceptionObject(W_Object):
 
     @classdef.method("to_s")
     def method_to_s(self, space):
-        return space.newstr_fromstr(self.msg)
+        return space.newstr_fromstr(self.get_message(space))
 
     @classdef.singleton_method("exception")
     def singleton_method_exception(self, space, args_w):
@@ -63,17 +136,30 @@ class W_ExceptionObject(W_Object):
     def method_backtrace(self, space):
         if self.w_backtrace is not None:
             return self.w_backtrace
-        frame = self.frame
         results_w = []
-        prev_frame = None
-        while frame is not None and frame.has_contents():
-            results_w.append(space.newstr_fromstr("%s:%d:in `%s'" % (
-                frame.get_filename(),
-                frame.get_lineno(prev_frame),
-                frame.get_code_name(),
-            )))
-            prev_frame = frame
-            frame = frame.backref()
+        if self.backtrace_entries is not None:
+            for code, instr, name in self.backtrace_entries:
+                if code is None:
+                    # A builtin called from outside of Ruby code.
+                    continue
+                try:
+                    lineno = code.lineno_table[instr]
+                except IndexError:
+                    lineno = instr
+                results_w.append(space.newstr_fromstr("%s:%d:in `%s'" % (
+                    code.filepath, lineno, name
+                )))
+        if self.rescue_frame is not None:
+            prev_frame = self.rescue_frame
+            frame = prev_frame.backref()
+            while frame is not None and frame.has_contents():
+                results_w.append(space.newstr_fromstr("%s:%d:in `%s'" % (
+                    frame.get_filename(),
+                    frame.get_lineno(prev_frame),
+                    frame.get_code_name(),
+                )))
+                prev_frame = frame
+                frame = frame.backref()
         return space.newarray(results_w)
 
     @classdef.method("set_backtrace")
@@ -234,9 +320,25 @@ class W_IndexError(W_StandardError):
 
 
 class W_KeyError(W_IndexError):
+    _attrs_ = ["w_key"]
+
     classdef = ClassDef("KeyError", W_IndexError.classdef)
+
+    def __init__(self, space, klass=None):
+        W_IndexError.__init__(self, space, klass)
+        self.w_key = None
+
     method_allocate = new_exception_allocate(classdef)
 
+    def get_message(self, space):
+        if self.w_key is not None:
+            # Set by space.key_error, the key is only inspected once somebody
+            # actually looks at the message.
+            self.msg = "key not found: %s" % space.str_w(
+                space.send(self.w_key, "inspect"))
+            self.w_key = None
+        return self.msg
+
 
 class W_StopIteration(W_IndexError):
     classdef = ClassDef("StopIteration", W_IndexError.classdef)
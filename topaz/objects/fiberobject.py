@@ -16,6 +16,64 @@ class State(object):
         return self.current or space.getexecutioncontext().getmainfiber(space)
 
 
+class FiberPool(object):
+    """
+    Keeps the stacks of finished fibers alive, parked in
+    new_stacklet_callback, so that new fibers can run on them instead of
+    starting a fresh stacklet. Stacks that stay idle for a whole
+    TRIM_INTERVAL of fiber starts are let go.
+    """
+
+    LIMIT = 16
+    TRIM_INTERVAL = 1000
+
+    def __init__(self, space):
+        self.limit = self.LIMIT
+        self.created = 0
+        self.reused = 0
+        self.trimmed = 0
+        self.starts_since_trim = 0
+        # The fewest stacks that were idle at any point since the last trim.
+        self.low_water = 0
+
+    def has_room(self, sthread):
+        return len(sthread.idle_handles) < self.limit
+
+    def park(self, sthread, h):
+        sthread.idle_handles.append(h)
+
+    def start(self, space, sthread):
+        """Returns a handle for a new fiber to switch to, starting it."""
+        self.starts_since_trim += 1
+        if self.starts_since_trim >= self.TRIM_INTERVAL:
+            self.trim(space, sthread, self.low_water)
+        if sthread.idle_handles:
+            self.reused += 1
+            h = sthread.idle_handles.pop()
+            self.low_water = min(self.low_water, len(sthread.idle_handles))
+            return sthread.switch(h)
+        self.created += 1
+        self.low_water = 0
+        return sthread.new(new_stacklet_callback)
+
+    def trim(self, space, sthread, count):
+        """Lets go of up to count idle stacks."""
+        count = min(count, len(sthread.idle_handles))
+        for i in xrange(count):
+            h = sthread.idle_handles.pop()
+            global_state.retire = True
+            global_state.space = space
+            sthread.switch(h)
+            self.trimmed += 1
+        self.starts_since_trim = 0
+        self.low_water = len(sthread.idle_handles)
+
+    def set_limit(self, space, sthread, limit):
+        self.limit = limit
+        if sthread is not None:
+            self.trim(space, sthread, len(sthread.idle_handles) - limit)
+
+
 class W_FiberObject(W_Object):
     """
     Fibers have a number of possible states:
@@ -24,7 +82,7 @@ class W_FiberObject(W_Object):
     * Currently execution: self.sthread is not None and self is State.get_current()
     * Suspended execution: self.sthread is not None and self.parent_fiber is None
     * Suspended execution in the stack of fibers: self.sthread is not None and (self.parent_fiber is None or self is space.w_main_fiber)
-    * Dead: self.sthread is not None and self.sthread.is_empty_handle(self.h)
+    * Dead: self.dead
     """
     classdef = ClassDef("Fiber", W_Object.classdef)
 
@@ -33,12 +91,14 @@ class W_FiberObject(W_Object):
         self.w_block = None
         self.sthread = None
         self.parent_fiber = None
+        self.dead = False
 
     def __deepcopy__(self, memo):
         obj = super(W_FiberObject, self).__deepcopy__(memo)
         obj.w_block = copy.deepcopy(self.w_block, memo)
         obj.sthread = copy.deepcopy(self.sthread, memo)
         obj.parent_fiber = copy.deepcopy(self.parent_fiber, memo)
+        obj.dead = self.dead
         return obj
 
     @staticmethod
@@ -101,7 +161,7 @@ class W_FiberObject(W_Object):
     def method_resume(self, space, args_w):
         if self.parent_fiber is not None:
             raise space.error(space.w_FiberError, "double resume")
-        if self.sthread is not None and self.sthread.is_empty_handle(self.h):
+        if self.dead:
             raise space.error(space.w_FiberError, "dead fiber called")
 
         self.parent_fiber = space.fromcache(State).get_current(space)
@@ -113,13 +173,18 @@ class W_FiberObject(W_Object):
                 self.bottomframe.handle_block_args(space, self.w_block.bytecode, args_w, self.w_block)
                 sthread = self.get_sthread(space, space.getexecutioncontext())
                 self.sthread = sthread
-                self.h = sthread.new(new_stacklet_callback)
+                self.h = space.fromcache(FiberPool).start(space, sthread)
             else:
                 if len(args_w) == 1:
                     global_state.w_result = args_w[0]
                 else:
                     global_state.w_result = space.newarray(args_w)
                 self.h = self.sthread.switch(self.h)
+            if global_state.parked:
+                # We finished, and our stack is waiting for the next fiber.
+                global_state.parked = False
+                space.fromcache(FiberPool).park(self.sthread, self.h)
+                self.h = self.sthread.get_null_handle()
             assert space.fromcache(State).current is self.parent_fiber
             space.getexecutioncontext().topframeref = topframeref
             return get_result()
@@ -132,6 +197,7 @@ class SThread(StackletThread):
         StackletThread.__init__(self, config)
         self.config = config
         self.ec = ec
+        self.idle_handles = []
 
     def __deepcopy__(self, memo):
         return SThread(self.config, copy.deepcopy(self.ec, memo))
@@ -140,6 +206,10 @@ class SThread(StackletThread):
 class GlobalState(object):
     def __init__(self):
         self.clear()
+        # Set by a finished fiber whose stack was kept for reuse.
+        self.parked = False
+        # Set to make a parked stack exit instead of running a fiber.
+        self.retire = False
 
     def clear(self):
         self.w_result = None
@@ -152,7 +222,27 @@ global_state = GlobalState()
 
 
 def new_stacklet_callback(h, arg):
-    space = global_state.space
+    while True:
+        space = global_state.space
+        sthread, origin_h = run_fiber(space, h)
+        global_state.space = space
+        if not space.fromcache(FiberPool).has_room(sthread):
+            return origin_h
+        # Hand our stack to the parent to be parked, and wait until it is
+        # needed for another fiber. Nothing from the finished fiber may stay
+        # alive in this frame while it waits.
+        global_state.parked = True
+        h = sthread.switch(origin_h)
+        if global_state.retire:
+            global_state.retire = False
+            return h
+
+
+def run_fiber(space, h):
+    """
+    Runs the current fiber to completion and returns its stacklet thread and
+    the handle to switch back to its parent with.
+    """
     self = space.fromcache(State).current
     origin = self.parent_fiber
     origin.h = h
@@ -169,9 +259,11 @@ def new_stacklet_callback(h, arg):
         except Exception as e:
             global_state.propagate_exception = e
 
+    self.dead = True
+    self.bottomframe = None
+    self.w_block = None
     space.fromcache(State).current = self.parent_fiber
-    global_state.space = space
-    return origin.h
+    return self.sthread, origin.h
 
 
 def get_result():
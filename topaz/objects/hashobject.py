@@ -4,10 +4,20 @@ from collections import OrderedDict
 from rpython.rlib.objectmodel import r_ordereddict
 from rpython.rlib.rerased import new_static_erasing_pair
 
-from topaz.module import ClassDef, check_frozen
+from topaz.module import ClassDef, check_frozen, make_block_driver
 from topaz.modules.enumerable import Enumerable
+from topaz.objects.bignumobject import W_BignumObject
+from topaz.objects.floatobject import W_FloatObject
+from topaz.objects.functionobject import W_BuiltinFunction
+from topaz.objects.intobject import W_FixnumObject
 from topaz.objects.objectobject import W_Object
 from topaz.objects.procobject import W_ProcObject
+from topaz.objects.stringobject import W_StringObject
+
+
+each_driver = make_block_driver("Hash#each")
+each_key_driver = make_block_driver("Hash#each_key")
+each_value_driver = make_block_driver("Hash#each_value")
 
 
 class BaseDictStrategy(object):
@@ -74,6 +84,9 @@ class ObjectDictStrategy(BaseDictStrategy, TypedDictStrategyMixin):
     def get_empty_storage(self, space):
         return self.erase(r_ordereddict(space.eq_w, space.hash_w))
 
+    def is_correct_type(self, space, w_key):
+        return True
+
     def wrap(self, w_key):
         return w_key
 
@@ -88,6 +101,111 @@ class IdentityDictStrategy(BaseDictStrategy, TypedDictStrategyMixin):
     def get_empty_storage(self, space):
         return self.erase(OrderedDict())
 
+    def is_correct_type(self, space, w_key):
+        return True
+
+    def wrap(self, w_key):
+        return w_key
+
+    def unwrap(self, w_key):
+        return w_key
+
+
+class EmptyDictStrategy(BaseDictStrategy):
+    erase, unerase = new_static_erasing_pair("EmptyDictStrategy")
+    iter_erase, iter_unerase = new_static_erasing_pair("EmptyDictStrategyIterator")
+
+    def get_empty_storage(self, space):
+        return self.erase(None)
+
+    def is_correct_type(self, space, w_key):
+        return False
+
+    def getitem(self, storage, w_key):
+        raise KeyError
+
+    def setitem(self, storage, w_key, w_value):
+        assert False, "W_HashObject switches strategies before storing"
+
+    def contains(self, storage, w_key):
+        return False
+
+    def copy(self, storage):
+        return storage
+
+    def clear(self, storage):
+        pass
+
+    def len(self, storage):
+        return 0
+
+    def bool(self, storage):
+        return False
+
+    def pop(self, storage, w_key, default):
+        return default
+
+    def popitem(self, storage):
+        raise KeyError
+
+    def keys(self, storage):
+        return []
+
+    def values(self, storage):
+        return []
+
+    def iteritems(self, storage):
+        return self.iter_erase(None)
+
+    def iternext(self, storage):
+        raise StopIteration
+
+
+def has_builtin_hash(space, w_cls):
+    return isinstance(space.lookup_method(w_cls, "hash"), W_BuiltinFunction)
+
+
+class SymbolDictStrategy(BaseDictStrategy, TypedDictStrategyMixin):
+    erase, unerase = new_static_erasing_pair("SymbolDictStrategy")
+    iter_erase, iter_unerase = new_static_erasing_pair("SymbolDictStrategyIterator")
+
+    def get_empty_storage(self, space):
+        # Symbols are interned, so identity is equality.
+        return self.erase(OrderedDict())
+
+    def is_correct_type(self, space, w_key):
+        return (space.getclass(w_key) is space.w_symbol and
+                has_builtin_hash(space, space.w_symbol))
+
+    def wrap(self, w_key):
+        return w_key
+
+    def unwrap(self, w_key):
+        return w_key
+
+
+def fixnum_key_eq(w_key1, w_key2):
+    assert isinstance(w_key1, W_FixnumObject)
+    assert isinstance(w_key2, W_FixnumObject)
+    return w_key1.intvalue == w_key2.intvalue
+
+
+def fixnum_key_hash(w_key):
+    assert isinstance(w_key, W_FixnumObject)
+    return w_key.intvalue
+
+
+class FixnumDictStrategy(BaseDictStrategy, TypedDictStrategyMixin):
+    erase, unerase = new_static_erasing_pair("FixnumDictStrategy")
+    iter_erase, iter_unerase = new_static_erasing_pair("FixnumDictStrategyIterator")
+
+    def get_empty_storage(self, space):
+        return self.erase(r_ordereddict(fixnum_key_eq, fixnum_key_hash))
+
+    def is_correct_type(self, space, w_key):
+        return (space.getclass(w_key) is space.w_fixnum and
+                has_builtin_hash(space, space.w_fixnum))
+
     def wrap(self, w_key):
         return w_key
 
@@ -95,16 +213,63 @@ class IdentityDictStrategy(BaseDictStrategy, TypedDictStrategyMixin):
         return w_key
 
 
+def string_key_eq(w_key1, w_key2):
+    assert isinstance(w_key1, W_StringObject)
+    assert isinstance(w_key2, W_StringObject)
+    return w_key1.get_flat() == w_key2.get_flat()
+
+
+def string_key_hash(w_key):
+    assert isinstance(w_key, W_StringObject)
+    return w_key.get_hash()
+
+
+class StringDictStrategy(BaseDictStrategy, TypedDictStrategyMixin):
+    erase, unerase = new_static_erasing_pair("StringDictStrategy")
+    iter_erase, iter_unerase = new_static_erasing_pair("StringDictStrategyIterator")
+
+    def get_empty_storage(self, space):
+        return self.erase(r_ordereddict(string_key_eq, string_key_hash))
+
+    def is_correct_type(self, space, w_key):
+        return (space.getclass(w_key) is space.w_string and
+                has_builtin_hash(space, space.w_string))
+
+    def wrap(self, w_key):
+        return w_key
+
+    def unwrap(self, w_key):
+        return w_key
+
+
+def strategy_for_key(space, w_key):
+    w_cls = space.getclass(w_key)
+    if w_cls is space.w_symbol:
+        strategy = space.fromcache(SymbolDictStrategy)
+    elif w_cls is space.w_fixnum:
+        strategy = space.fromcache(FixnumDictStrategy)
+    elif w_cls is space.w_string:
+        strategy = space.fromcache(StringDictStrategy)
+    else:
+        return space.fromcache(ObjectDictStrategy)
+    if not has_builtin_hash(space, w_cls):
+        return space.fromcache(ObjectDictStrategy)
+    return strategy
+
+
 class W_HashObject(W_Object):
     classdef = ClassDef("Hash", W_Object.classdef)
     classdef.include_module(Enumerable)
 
     def __init__(self, space, klass=None):
         W_Object.__init__(self, space, klass)
-        self.strategy = space.fromcache(ObjectDictStrategy)
+        self.strategy = space.fromcache(EmptyDictStrategy)
         self.dict_storage = self.strategy.get_empty_storage(space)
         self.w_default = space.w_nil
         self.default_proc = None
+        # Bumped whenever the contents change, so iteration can tell whether
+        # its snapshot is still accurate.
+        self.mutations = 0
 
     def __deepcopy__(self, memo):
         obj = super(W_HashObject, self).__deepcopy__(memo)
@@ -112,15 +277,67 @@ class W_HashObject(W_Object):
         obj.dict_storage = self.strategy.copy(self.dict_storage)
         obj.w_default = self.w_default
         obj.default_proc = copy.deepcopy(self.default_proc)
+        obj.mutations = self.mutations
         return obj
 
-    def getitem(self, w_key):
+    def switch_strategy(self, space, strategy):
+        storage = strategy.get_empty_storage(space)
+        iter = self.strategy.iteritems(self.dict_storage)
+        while True:
+            try:
+                w_key, w_value = self.strategy.iternext(iter)
+            except StopIteration:
+                break
+            strategy.setitem(storage, w_key, w_value)
+        self.strategy = strategy
+        self.dict_storage = storage
+
+    def can_contain(self, space, w_key):
+        """
+        Returns whether w_key may be stored in the hash. Keys which can never
+        be eql? to the ones of a typed strategy are answered without
+        touching it, anything else switches to the object strategy, so that
+        the lookup is a hashed one.
+        """
+        if self.strategy.is_correct_type(space, w_key):
+            return True
+        if self.size() == 0:
+            return False
+        # A key that would get a typed strategy of its own can never be eql?
+        # to our keys, and neither can the common builtin values.
+        if strategy_for_key(space, w_key) is not space.fromcache(ObjectDictStrategy):
+            return False
+        if (w_key is space.w_nil or w_key is space.w_true or
+                w_key is space.w_false or isinstance(w_key, W_FloatObject) or
+                isinstance(w_key, W_BignumObject)):
+            return False
+        # Anything else may define hash and eql? to match one of our keys.
+        self.switch_strategy(space, space.fromcache(ObjectDictStrategy))
+        return True
+
+    def getitem(self, space, w_key):
+        if not self.can_contain(space, w_key):
+            raise KeyError
         return self.strategy.getitem(self.dict_storage, w_key)
 
-    def setitem(self, w_key, w_value):
+    def setitem(self, space, w_key, w_value):
+        if not self.strategy.is_correct_type(space, w_key):
+            if self.size() == 0:
+                self.switch_strategy(space, strategy_for_key(space, w_key))
+            else:
+                self.switch_strategy(space, space.fromcache(ObjectDictStrategy))
+        self.mutations += 1
         return self.strategy.setitem(self.dict_storage, w_key, w_value)
 
-    def delete(self, w_key):
+    def contains(self, space, w_key):
+        if not self.can_contain(space, w_key):
+            return False
+        return self.strategy.contains(self.dict_storage, w_key)
+
+    def delete(self, space, w_key):
+        if not self.can_contain(space, w_key):
+            return None
+        self.mutations += 1
         return self.strategy.pop(self.dict_storage, w_key, None)
 
     def size(self):
@@ -186,6 +403,7 @@ class W_HashObject(W_Object):
             strategy.setitem(storage, w_key, w_value)
         self.strategy = strategy
         self.dict_storage = storage
+        self.mutations += 1
         return self
 
     @classdef.method("compare_by_identity?")
@@ -205,26 +423,27 @@ class W_HashObject(W_Object):
                 break
             self.strategy.setitem(storage, w_key, w_value)
         self.dict_storage = storage
+        self.mutations += 1
         return self
 
     @classdef.method("[]")
     def method_subscript(self, space, w_key):
         try:
-            return self.getitem(w_key)
+            return self.getitem(space, w_key)
         except KeyError:
             return space.send(self, "default", [w_key])
 
     @classdef.method("fetch")
     def method_fetch(self, space, w_key, w_value=None, block=None):
         try:
-            return self.getitem(w_key)
+            return self.getitem(space, w_key)
         except KeyError:
             if block is not None:
                 return space.invoke_block(block, [w_key])
             elif w_value is not None:
                 return w_value
             else:
-                raise space.error(space.w_KeyError, "key not found: %s" % space.send(w_key, "inspect"))
+                raise space.key_error(w_key)
 
     @classdef.method("store")
     @classdef.method("[]=")
@@ -235,7 +454,7 @@ class W_HashObject(W_Object):
 
             w_key = space.send(w_key, "dup")
             w_key = space.send(w_key, "freeze")
-        self.setitem(w_key, w_value)
+        self.setitem(space, w_key, w_value)
         return w_value
 
     @classdef.method("length")
@@ -250,7 +469,7 @@ class W_HashObject(W_Object):
     @classdef.method("delete")
     @check_frozen()
     def method_delete(self, space, w_key, block):
-        w_res = self.delete(w_key)
+        w_res = self.delete(space, w_key)
         if w_res is None:
             if block:
                 return space.invoke_block(block, [w_key])
@@ -261,6 +480,7 @@ class W_HashObject(W_Object):
     @check_frozen()
     def method_clear(self, space):
         self.strategy.clear(self.dict_storage)
+        self.mutations += 1
         return self
 
     @classdef.method("shift")
@@ -269,6 +489,7 @@ class W_HashObject(W_Object):
         if not self.strategy.bool(self.dict_storage):
             return space.send(self, "default", [space.w_nil])
         w_key, w_value = self.strategy.popitem(self.dict_storage)
+        self.mutations += 1
         return space.newarray([w_key, w_value])
 
     @classdef.method("initialize_copy")
@@ -281,6 +502,7 @@ class W_HashObject(W_Object):
         self.dict_storage = self.strategy.copy(w_hash.dict_storage)
         self.w_default = w_hash.w_default
         self.default_proc = w_hash.default_proc
+        self.mutations += 1
         return self
 
     @classdef.method("keys")
@@ -295,12 +517,83 @@ class W_HashObject(W_Object):
     def method_to_hash(self, space):
         return self
 
+    # The iteration methods walk a snapshot of the pairs, so the block is
+    # free to modify the hash. Once it has, keys deleted in the meantime are
+    # skipped and values are read from the hash as it is when they're reached.
+    @classdef.method("each")
+    @classdef.method("each_pair")
+    def method_each(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("each")])
+        keys_w = self.strategy.keys(self.dict_storage)
+        values_w = self.strategy.values(self.dict_storage)
+        mutations = self.mutations
+        i = 0
+        while i < len(keys_w):
+            each_driver.jit_merge_point(bytecode=block.bytecode)
+            w_key = keys_w[i]
+            w_value = values_w[i]
+            i += 1
+            if self.mutations != mutations:
+                try:
+                    w_value = self.getitem(space, w_key)
+                except KeyError:
+                    continue
+            space.invoke_block(block, [space.newarray([w_key, w_value])])
+        return self
+
+    @classdef.method("each_key")
+    def method_each_key(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("each_key")])
+        keys_w = self.strategy.keys(self.dict_storage)
+        mutations = self.mutations
+        i = 0
+        while i < len(keys_w):
+            each_key_driver.jit_merge_point(bytecode=block.bytecode)
+            w_key = keys_w[i]
+            i += 1
+            if self.mutations != mutations and not self.contains(space, w_key):
+                continue
+            space.invoke_block(block, [w_key])
+        return self
+
+    @classdef.method("each_value")
+    def method_each_value(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("each_value")])
+        keys_w = self.strategy.keys(self.dict_storage)
+        values_w = self.strategy.values(self.dict_storage)
+        mutations = self.mutations
+        i = 0
+        while i < len(keys_w):
+            each_value_driver.jit_merge_point(bytecode=block.bytecode)
+            w_key = keys_w[i]
+            w_value = values_w[i]
+            i += 1
+            if self.mutations != mutations:
+                try:
+                    w_value = self.getitem(space, w_key)
+                except KeyError:
+                    continue
+            space.invoke_block(block, [w_value])
+        return self
+
+    @classdef.method("to_a")
+    def method_to_a(self, space):
+        keys_w = self.strategy.keys(self.dict_storage)
+        values_w = self.strategy.values(self.dict_storage)
+        return space.newarray([
+            space.newarray([keys_w[i], values_w[i]])
+            for i in xrange(len(keys_w))
+        ])
+
     @classdef.method("key?")
     @classdef.method("has_key?")
     @classdef.method("member?")
     @classdef.method("include?")
     def method_includep(self, space, w_key):
-        return space.newbool(self.strategy.contains(self.dict_storage, w_key))
+        return space.newbool(self.contains(space, w_key))
 
 
 class W_HashIterator(W_Object):
@@ -11,7 +11,7 @@ from rpython.rlib.rfloat import round_away
 from rpython.rtyper.lltypesystem import lltype, rffi
 
 from topaz.coerce import Coerce
-from topaz.module import ClassDef
+from topaz.module import ClassDef, make_block_driver
 from topaz.objects.floatobject import W_FloatObject
 from topaz.objects.integerobject import W_IntegerObject
 from topaz.objects.numericobject import W_NumericObject
@@ -19,6 +19,43 @@ from topaz.objects.objectobject import W_RootObject
 from topaz.system import IS_WINDOWS
 
 
+count_up_driver = make_block_driver("Fixnum count up")
+count_down_driver = make_block_driver("Fixnum count down")
+generic_step_driver = make_block_driver("Fixnum#step")
+generic_count_driver = make_block_driver("Fixnum#upto/downto")
+
+
+def fixnum_count_up(space, block, start, stop, step):
+    """
+    Calls block with start, start + step, ... for as long as the value
+    isn't above stop (which is included), without ever overflowing. step
+    must be positive.
+    """
+    i = start
+    while i <= stop:
+        count_up_driver.jit_merge_point(bytecode=block.bytecode)
+        space.invoke_block(block, [space.newint(i)])
+        try:
+            i = ovfcheck(i + step)
+        except OverflowError:
+            break
+
+
+def fixnum_count_down(space, block, start, stop, step):
+    """
+    Like fixnum_count_up, but for a negative step, stopping once the value
+    is below stop.
+    """
+    i = start
+    while i >= stop:
+        count_down_driver.jit_merge_point(bytecode=block.bytecode)
+        space.invoke_block(block, [space.newint(i)])
+        try:
+            i = ovfcheck(i + step)
+        except OverflowError:
+            break
+
+
 class FixnumStorage(object):
     def __init__(self, space):
         self.storages = {}
@@ -413,6 +450,70 @@ class W_FixnumObject(W_RootObject):
             return space.newint(0)
         return space.newint(int(bool(self.intvalue & (1 << idx))))
 
+    @classdef.method("times")
+    def method_times(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("times")])
+        if self.intvalue > 0:
+            fixnum_count_up(space, block, 0, self.intvalue - 1, 1)
+        return self
+
+    @classdef.method("upto")
+    def method_upto(self, space, w_limit, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("upto"), w_limit])
+        if space.is_kind_of(w_limit, space.w_fixnum):
+            fixnum_count_up(space, block, self.intvalue, space.int_w(w_limit), 1)
+        else:
+            self._count_to(space, w_limit, 1, "<=", block)
+        return self
+
+    @classdef.method("downto")
+    def method_downto(self, space, w_limit, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("downto"), w_limit])
+        if space.is_kind_of(w_limit, space.w_fixnum):
+            fixnum_count_down(space, block, self.intvalue, space.int_w(w_limit), -1)
+        else:
+            self._count_to(space, w_limit, -1, ">=", block)
+        return self
+
+    def _count_to(self, space, w_limit, delta, cmp, block):
+        # Unlike step, the yielded values stay Integers whatever the limit.
+        w_idx = self
+        w_delta = space.newint(delta)
+        while space.is_true(space.send(w_idx, cmp, [w_limit])):
+            generic_count_driver.jit_merge_point(bytecode=block.bytecode)
+            space.invoke_block(block, [w_idx])
+            w_idx = space.send(w_idx, "+", [w_delta])
+
+    @classdef.method("step")
+    def method_step(self, space, w_limit, w_step=None, block=None):
+        if w_step is None:
+            w_step = space.newint(1)
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("step"), w_limit, w_step])
+        if space.is_kind_of(w_limit, space.w_fixnum) and space.is_kind_of(w_step, space.w_fixnum):
+            step = space.int_w(w_step)
+            if step == 0:
+                raise space.error(space.w_ArgumentError, "step can't be 0")
+            if step > 0:
+                fixnum_count_up(space, block, self.intvalue, space.int_w(w_limit), step)
+            else:
+                fixnum_count_down(space, block, self.intvalue, space.int_w(w_limit), step)
+            return self
+        w_idx = self
+        if space.is_kind_of(w_limit, space.w_float) or space.is_kind_of(w_step, space.w_float):
+            w_idx = space.newfloat(float(self.intvalue))
+        cmp = "<="
+        if space.is_true(space.send(w_step, "<", [space.newint(0)])):
+            cmp = ">="
+        while space.is_true(space.send(w_idx, cmp, [w_limit])):
+            generic_step_driver.jit_merge_point(bytecode=block.bytecode)
+            space.invoke_block(block, [w_idx])
+            w_idx = space.send(w_idx, "+", [w_step])
+        return self
+
 
 class W_MutableFixnumObject(W_FixnumObject):
     _immutable_fields_ = []
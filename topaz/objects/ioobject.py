@@ -1,4 +1,5 @@
 import os
+from collections import OrderedDict
 
 from rpython.rlib.rpoll import POLLIN, PollError
 
@@ -19,12 +20,50 @@ else:
     from rpython.rlib.rpoll import poll
 
 
+DEFAULT_BUFFER_SIZE = 8192
+
+
+class PendingWrites(object):
+    """
+    The IO objects that currently have buffered output, so it can be flushed
+    before the process exits or forks. Streams are flushed in the order they
+    started buffering, which keeps output to a shared fd in order.
+    """
+
+    def __init__(self, space):
+        self.ios_w = OrderedDict()
+
+    def add(self, w_io):
+        self.ios_w[w_io] = None
+
+    def remove(self, w_io):
+        try:
+            del self.ios_w[w_io]
+        except KeyError:
+            pass
+
+    def flush_all(self, space):
+        for w_io in self.ios_w.keys():
+            try:
+                w_io.flush(space)
+            except OSError:
+                pass
+        self.ios_w.clear()
+
+
 class W_IOObject(W_Object):
     classdef = ClassDef("IO", W_Object.classdef)
 
     def __init__(self, space):
         W_Object.__init__(self, space)
         self.fd = -1
+        self.sync = False
+        self.tty = False
+        self.buffer_size = DEFAULT_BUFFER_SIZE
+        self.wbuffer = []
+        self.wbuffer_len = 0
+        self.rbuffer = ""
+        self.rbuffer_pos = 0
 
     def __del__(self):
         # Do not close standard file streams
@@ -34,6 +73,13 @@ class W_IOObject(W_Object):
     def __deepcopy__(self, memo):
         obj = super(W_IOObject, self).__deepcopy__(memo)
         obj.fd = self.fd
+        obj.sync = self.sync
+        obj.tty = self.tty
+        obj.buffer_size = self.buffer_size
+        obj.wbuffer = self.wbuffer[:]
+        obj.wbuffer_len = self.wbuffer_len
+        obj.rbuffer = self.rbuffer
+        obj.rbuffer_pos = self.rbuffer_pos
         return obj
 
     def ensure_not_closed(self, space):
@@ -43,6 +89,112 @@ class W_IOObject(W_Object):
     def getfd(self):
         return self.fd
 
+    def set_fd(self, fd):
+        self.fd = fd
+        # As in MRI only STDERR is synchronous; pending writes to other
+        # streams are flushed at exit, fork and exec. Terminals are written
+        # through so prompts show up before the next read.
+        self.sync = fd == 2
+        self.tty = fd >= 0 and os.isatty(fd)
+
+    def _write_all(self, data):
+        while data:
+            written = os.write(self.fd, data)
+            assert written >= 0
+            data = data[written:]
+
+    def flush(self, space):
+        if self.wbuffer_len > 0:
+            data = "".join(self.wbuffer)
+            self.wbuffer = []
+            self.wbuffer_len = 0
+            space.fromcache(PendingWrites).remove(self)
+            self._write_all(data)
+
+    def write(self, space, data):
+        """Writes data through the buffer, unless sync is set or the stream
+        is a terminal."""
+        if self.rbuffer_pos < len(self.rbuffer):
+            self.drop_read_buffer()
+        direct = self.sync or self.tty
+        if direct or self.wbuffer_len + len(data) > self.buffer_size:
+            self.flush(space)
+            if direct or len(data) >= self.buffer_size:
+                self._write_all(data)
+                return
+        if self.wbuffer_len == 0:
+            space.fromcache(PendingWrites).add(self)
+        self.wbuffer.append(data)
+        self.wbuffer_len += len(data)
+
+    def unread_bytes(self):
+        return len(self.rbuffer) - self.rbuffer_pos
+
+    def drop_read_buffer(self):
+        """
+        Discards the read buffer, moving the file position back to where the
+        caller thinks it is. Pipes and terminals are not seekable, their
+        buffered input is simply lost.
+        """
+        unread = self.unread_bytes()
+        self.rbuffer = ""
+        self.rbuffer_pos = 0
+        if unread > 0:
+            try:
+                os.lseek(self.fd, -unread, os.SEEK_CUR)
+            except OSError:
+                pass
+
+    def fill_read_buffer(self):
+        self.rbuffer = os.read(self.fd, self.buffer_size)
+        self.rbuffer_pos = 0
+        return len(self.rbuffer) > 0
+
+    def read(self, space, length):
+        """
+        Reads up to length bytes, or everything up to EOF if length is
+        negative.
+        """
+        self.flush(space)
+        chunks = []
+        read_bytes = 0
+        while length < 0 or read_bytes < length:
+            if self.rbuffer_pos < len(self.rbuffer):
+                start = self.rbuffer_pos
+                if length < 0:
+                    end = len(self.rbuffer)
+                else:
+                    end = min(len(self.rbuffer), start + length - read_bytes)
+                assert start >= 0
+                assert end >= start
+                chunks.append(self.rbuffer[start:end])
+                read_bytes += end - start
+                self.rbuffer_pos = end
+            elif length >= 0 and length - read_bytes >= self.buffer_size:
+                # Large reads bypass the buffer.
+                data = os.read(self.fd, length - read_bytes)
+                if not data:
+                    break
+                chunks.append(data)
+                read_bytes += len(data)
+            elif not self.fill_read_buffer():
+                break
+        return "".join(chunks)
+
+    def getc(self, space):
+        self.flush(space)
+        if self.rbuffer_pos >= len(self.rbuffer) and not self.fill_read_buffer():
+            return ""
+        c = self.rbuffer[self.rbuffer_pos]
+        self.rbuffer_pos += 1
+        return c
+
+    def ungetc(self, space, data):
+        start = self.rbuffer_pos
+        assert start >= 0
+        self.rbuffer = data + self.rbuffer[start:]
+        self.rbuffer_pos = 0
+
     @classdef.setup_class
     def setup_class(cls, space, w_cls):
         w_stdin = space.send(w_cls, "new", [space.newint(0)])
@@ -99,7 +251,7 @@ class W_IOObject(W_Object):
             raise space.error(space.w_NotImplementedError, "options hash for IO.new")
         if mode is None:
             mode = "r"
-        self.fd = fd
+        self.set_fd(fd)
         return self
 
     @classdef.method("read")
@@ -115,25 +267,14 @@ class W_IOObject(W_Object):
                 return space.newstr_fromstr("")
         else:
             length = -1
-        read_bytes = 0
-        read_chunks = []
-        while length < 0 or read_bytes < length:
-            if length > 0:
-                max_read = int(length - read_bytes)
-            else:
-                max_read = 8192
-            try:
-                current_read = os.read(self.fd, max_read)
-            except OSError as e:
-                raise error_for_oserror(space, e)
-            if len(current_read) == 0:
-                break
-            read_bytes += len(current_read)
-            read_chunks += current_read
+        try:
+            data = self.read(space, length)
+        except OSError as e:
+            raise error_for_oserror(space, e)
         # Return nil on EOF if length is given
-        if read_bytes == 0:
+        if not data:
             return space.w_nil
-        w_read_str = space.newstr_fromchars(read_chunks)
+        w_read_str = space.newstr_fromstr(data)
         if w_str is not None:
             w_str.clear(space)
             w_str.extend(space, w_read_str)
@@ -146,35 +287,82 @@ class W_IOObject(W_Object):
         self.ensure_not_closed(space)
         string = space.str_w(space.send(w_str, "to_s"))
         try:
-            bytes_written = os.write(self.fd, string)
+            self.write(space, string)
         except OSError as e:
             raise error_for_oserror(space, e)
-        return space.newint(bytes_written)
+        return space.newint(len(string))
 
     @classdef.method("flush")
     def method_flush(self, space):
-        # We have no internal buffers to flush!
         self.ensure_not_closed(space)
+        try:
+            self.flush(space)
+        except OSError as e:
+            raise error_for_oserror(space, e)
         return self
 
+    @classdef.method("sync")
+    def method_sync(self, space):
+        self.ensure_not_closed(space)
+        return space.newbool(self.sync)
+
+    @classdef.method("sync=")
+    def method_set_sync(self, space, w_sync):
+        self.ensure_not_closed(space)
+        self.sync = space.is_true(w_sync)
+        if self.sync:
+            try:
+                self.flush(space)
+            except OSError as e:
+                raise error_for_oserror(space, e)
+        return w_sync
+
+    @classdef.method("buffer_size")
+    def method_buffer_size(self, space):
+        return space.newint(self.buffer_size)
+
+    @classdef.method("buffer_size=", size="int")
+    def method_set_buffer_size(self, space, size):
+        self.ensure_not_closed(space)
+        if size <= 0:
+            raise space.error(space.w_ArgumentError, "buffer size must be positive")
+        try:
+            self.flush(space)
+        except OSError as e:
+            raise error_for_oserror(space, e)
+        self.buffer_size = size
+        return space.newint(size)
+
     @classdef.method("seek", amount="int", whence="int")
     def method_seek(self, space, amount, whence=os.SEEK_SET):
         self.ensure_not_closed(space)
-        os.lseek(self.fd, amount, whence)
+        try:
+            self.flush(space)
+            self.drop_read_buffer()
+            os.lseek(self.fd, amount, whence)
+        except OSError as e:
+            raise error_for_oserror(space, e)
         return space.newint(0)
 
     @classdef.method("pos")
     @classdef.method("tell")
     def method_pos(self, space):
         self.ensure_not_closed(space)
+        pos = os.lseek(self.fd, 0, os.SEEK_CUR)
+        pos += self.wbuffer_len - self.unread_bytes()
         # TODO: this currently truncates large values, switch this to use a
         # Bignum in those cases
-        return space.newint(int(os.lseek(self.fd, 0, os.SEEK_CUR)))
+        return space.newint(int(pos))
 
     @classdef.method("rewind")
     def method_rewind(self, space):
         self.ensure_not_closed(space)
-        os.lseek(self.fd, 0, os.SEEK_SET)
+        try:
+            self.flush(space)
+            self.drop_read_buffer()
+            os.lseek(self.fd, 0, os.SEEK_SET)
+        except OSError as e:
+            raise error_for_oserror(space, e)
         return space.newint(0)
 
     @classdef.method("print")
@@ -195,21 +383,35 @@ class W_IOObject(W_Object):
         else:
             end = ""
         strings = [space.str_w(space.send(w_arg, "to_s")) for w_arg in args_w]
-        os.write(self.fd, sep.join(strings))
-        os.write(self.fd, end)
+        try:
+            self.write(space, sep.join(strings) + end)
+        except OSError as e:
+            raise error_for_oserror(space, e)
         return space.w_nil
 
     @classdef.method("getc")
     def method_getc(self, space):
         self.ensure_not_closed(space)
         try:
-            c = os.read(self.fd, 1)
+            c = self.getc(space)
         except OSError as e:
             raise error_for_oserror(space, e)
         if not c:
             return space.w_nil
         return space.newstr_fromstr(c)
 
+    @classdef.method("ungetc")
+    def method_ungetc(self, space, w_chr):
+        self.ensure_not_closed(space)
+        if w_chr is space.w_nil:
+            return space.w_nil
+        if space.is_kind_of(w_chr, space.w_integer):
+            data = chr(Coerce.int(space, w_chr) & 0xff)
+        else:
+            data = Coerce.str(space, w_chr)
+        self.ungetc(space, data)
+        return space.w_nil
+
     @classdef.singleton_method("pipe")
     def method_pipe(self, space, block=None):
         r, w = os.pipe()
@@ -237,6 +439,9 @@ class W_IOObject(W_Object):
             w_io = space.send(space.getclassfor(W_FileObject), "new", args)
         assert isinstance(w_io, W_IOObject)
         w_io.ensure_not_closed(space)
+        self.flush(space)
+        self.drop_read_buffer()
+        w_io.flush(space)
         os.close(self.fd)
         os.dup2(w_io.getfd(), self.fd)
         return self
@@ -254,8 +459,15 @@ class W_IOObject(W_Object):
     @classdef.method("close")
     def method_close(self, space):
         self.ensure_not_closed(space)
-        os.close(self.fd)
-        self.fd = -1
+        try:
+            self.flush(space)
+        except OSError as e:
+            raise error_for_oserror(space, e)
+        finally:
+            os.close(self.fd)
+            self.fd = -1
+            self.rbuffer = ""
+            self.rbuffer_pos = 0
         return self
 
     @classdef.method("closed?")
@@ -286,6 +498,8 @@ class W_IOObject(W_Object):
 
     @classdef.method("ready?")
     def method_ready(self, space):
+        if self.unread_bytes() > 0:
+            return space.w_true
         retval = None
         try:
             retval = poll({self.fd: POLLIN}, 0)
@@ -3,8 +3,9 @@ import copy
 from rpython.rlib import jit
 from rpython.rlib.objectmodel import specialize
 
-from topaz.celldict import CellDict, VersionTag
+from topaz.celldict import CellDict, VersionStats, VersionTag
 from topaz.coerce import Coerce
+from topaz.inlinecache import ConstantSerial, MethodSerials
 from topaz.module import ClassDef, check_frozen
 from topaz.objects.functionobject import W_FunctionObject
 from topaz.objects.objectobject import W_RootObject
@@ -109,14 +110,21 @@ class W_Autoload(W_RootObject):
 
 
 class W_ModuleObject(W_RootObject):
-    _immutable_fields_ = ["version?", "included_modules?[*]", "klass?", "name?"]
+    _immutable_fields_ = [
+        "version?", "const_version?", "included_modules?[*]", "klass?",
+        "name?",
+    ]
 
     classdef = ClassDef("Module", W_RootObject.classdef)
 
     def __init__(self, space, name, klass=None):
         self.name = name
         self.klass = klass
+        # Guards method lookups, constants and class variables have their own
+        # versions so redefining one doesn't invalidate code relying on the
+        # others.
         self.version = VersionTag()
+        self.const_version = VersionTag()
         self.methods_w = {}
         self.constants_w = {}
         self.class_variables = CellDict()
@@ -130,6 +138,7 @@ class W_ModuleObject(W_RootObject):
         obj.name = self.name
         obj.klass = copy.deepcopy(self.klass, memo)
         obj.version = copy.deepcopy(self.version, memo)
+        obj.const_version = copy.deepcopy(self.const_version, memo)
         obj.methods_w = copy.deepcopy(self.methods_w, memo)
         obj.constants_w = copy.deepcopy(self.constants_w, memo)
         obj.class_variables = copy.deepcopy(self.class_variables, memo)
@@ -151,14 +160,31 @@ class W_ModuleObject(W_RootObject):
             )
         return self.klass
 
-    def mutated(self):
+    def mutated(self, space):
         self.version = VersionTag()
+        space.fromcache(VersionStats).methods += 1
+
+    def methods_mutated(self, space):
+        # Anything inheriting from or including us can now find different
+        # methods, invalidate the cached lookups for all of their names.
+        serials = space.fromcache(MethodSerials)
+        for w_mod in self.ancestors():
+            for name in w_mod.methods_w:
+                serials.bump(name)
+
+    def const_mutated(self, space):
+        # Constant lookups walk the ancestors themselves, so like mutated()
+        # this doesn't need to propagate to descendants.
+        self.const_version = VersionTag()
+        space.fromcache(VersionStats).constants += 1
+        space.fromcache(ConstantSerial).bump()
 
     def define_method(self, space, name, method):
         if (name == "initialize" or name == "initialize_copy" or
             method.visibility == W_FunctionObject.MODULE_FUNCTION):
             method.update_visibility(W_FunctionObject.PRIVATE)
-        self.mutated()
+        self.mutated(space)
+        space.fromcache(MethodSerials).bump(name)
         self.methods_w[name] = method
         if not space.bootstrap:
             if isinstance(method, UndefMethod):
@@ -205,7 +231,7 @@ class W_ModuleObject(W_RootObject):
         return methods.keys()
 
     def set_const(self, space, name, w_obj):
-        self.mutated()
+        self.const_mutated(space)
         self.constants_w[name] = w_obj
         if isinstance(w_obj, W_ModuleObject) and w_obj.name is None and self.name is not None:
             w_obj.set_name_in_scope(space, name, self)
@@ -256,8 +282,9 @@ class W_ModuleObject(W_RootObject):
         return self.local_constants(space)
 
     def find_local_const(self, space, name, autoload=True):
-        w_res = self._find_const_pure(name, self.version)
+        w_res = self._find_const_pure(name, self.const_version)
         if autoload and isinstance(w_res, W_Autoload):
+            self.const_mutated(space)
             self.constants_w[name] = None
             try:
                 w_res.load()
@@ -266,6 +293,7 @@ class W_ModuleObject(W_RootObject):
                 if not w_res:
                     self.constants_w[name] = w_res
                 w_res = w_new_res
+                self.const_mutated(space)
             return w_res
         else:
             return w_res
@@ -280,7 +308,7 @@ class W_ModuleObject(W_RootObject):
             assert isinstance(module, W_ModuleObject)
             w_res = module.class_variables.get(space, name)
             if w_res is not None or module is self:
-                module.class_variables.set(space, name, w_obj)
+                module._set_class_var_cell(space, name, w_obj)
                 if module is self:
                     for descendant in self.descendants:
                         descendant.remove_class_var(space, name)
@@ -298,9 +326,21 @@ class W_ModuleObject(W_RootObject):
                     break
         return w_res
 
+    def _set_class_var_cell(self, space, name, w_obj):
+        version = self.class_variables.version
+        self.class_variables.set(space, name, w_obj)
+        if self.class_variables.version is not version:
+            space.fromcache(VersionStats).class_variables += 1
+
+    def _delete_class_var_cell(self, space, name):
+        version = self.class_variables.version
+        self.class_variables.delete(name)
+        if self.class_variables.version is not version:
+            space.fromcache(VersionStats).class_variables += 1
+
     @jit.unroll_safe
     def remove_class_var(self, space, name):
-        self.class_variables.delete(name)
+        self._delete_class_var_cell(space, name)
         for descendant in self.descendants:
             descendant.remove_class_var(space, name)
 
@@ -346,6 +386,9 @@ class W_ModuleObject(W_RootObject):
         assert isinstance(w_mod, W_ModuleObject)
         if w_mod not in self.ancestors():
             self.included_modules = [w_mod] + self.included_modules
+            self.mutated(space)
+            w_mod.methods_mutated(space)
+            space.fromcache(ConstantSerial).bump()
             w_mod.included(space, self)
 
     def included(self, space, w_mod):
@@ -357,6 +400,9 @@ class W_ModuleObject(W_RootObject):
         if self not in w_mod.ancestors():
             self.descendants.append(w_mod)
             w_mod.included_modules = [self] + w_mod.included_modules
+            w_mod.mutated(space)
+            self.methods_mutated(space)
+            space.fromcache(ConstantSerial).bump()
 
     def set_visibility(self, space, names_w, visibility):
         names = [space.symbol_w(w_name) for w_name in names_w]
@@ -671,7 +717,7 @@ class W_ModuleObject(W_RootObject):
                 "uninitialized constant %s::%s" % (self_name, name)
             )
         del self.constants_w[name]
-        self.mutated()
+        self.const_mutated(space)
         return w_res
 
     @classdef.method("class_variable_defined?", name="symbol")
@@ -692,7 +738,7 @@ class W_ModuleObject(W_RootObject):
     def method_remove_class_variable(self, space, name):
         w_value = self.class_variables.get(space, name)
         if w_value is not None:
-            self.class_variables.delete(name)
+            self._delete_class_var_cell(space, name)
             return w_value
         if self.find_class_var(space, name) is not None:
             raise space.error(space.w_NameError,
@@ -812,7 +858,8 @@ class W_ModuleObject(W_RootObject):
                 "method `%s' not defined in %s" % (name, cls_name)
             )
         del self.methods_w[name]
-        self.mutated()
+        self.mutated(space)
+        space.fromcache(MethodSerials).bump(name)
         self.method_removed(space, space.newsymbol(name))
         return self
 
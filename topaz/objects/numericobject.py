@@ -21,7 +21,6 @@ class W_NumericObject(W_Object):
         except RubyError as e:
             if not space.is_kind_of(e.w_value, space.w_StandardError):
                 raise
-            space.mark_topframe_not_escaped()
             if raise_error:
                 raise space.error(space.w_ArgumentError,
                     "comparison of %s with %s failed" % (
@@ -149,9 +149,11 @@ class W_Object(W_RootObject):
     def __init__(self, space, klass=None):
         if klass is None:
             klass = space.getclassfor(self.__class__)
-        self.map = space.fromcache(mapdict.MapTransitionCache).get_class_node(klass)
+        class_node = space.fromcache(mapdict.MapTransitionCache).get_class_node(klass)
+        self.map = class_node
         self.object_storage = None
         self.unboxed_storage = None
+        class_node.allocate_storage(self)
 
     def __deepcopy__(self, memo):
         obj = super(W_Object, self).__deepcopy__(memo)
@@ -161,10 +163,10 @@ class W_Object(W_RootObject):
         return obj
 
     def getclass(self, space):
-        return jit.promote(self.map).find(mapdict.ClassNode).getclass()
+        return jit.promote(self.map).getclass()
 
     def getsingletonclass(self, space):
-        w_cls = jit.promote(self.map).find(mapdict.ClassNode).getclass()
+        w_cls = jit.promote(self.map).getclass()
         if w_cls.is_singleton:
             return w_cls
         w_cls = space.newclass(w_cls.name, w_cls, is_singleton=True, attached=self)
@@ -172,13 +174,14 @@ class W_Object(W_RootObject):
         return w_cls
 
     def copy_singletonclass(self, space, w_other):
-        w_cls = jit.promote(self.map).find(mapdict.ClassNode).getclass()
+        w_cls = jit.promote(self.map).getclass()
         assert not w_cls.is_singleton
         w_copy = space.newclass(w_cls.name, w_cls, is_singleton=True, attached=self)
         w_copy.methods_w.update(w_other.methods_w)
         w_copy.constants_w.update(w_other.constants_w)
         w_copy.included_modules = w_copy.included_modules + w_other.included_modules
-        w_copy.mutated()
+        w_copy.mutated(space)
+        w_copy.const_mutated(space)
 
         self.map = self.map.change_class(space, w_copy)
         return w_cls
@@ -199,6 +202,9 @@ class W_Object(W_RootObject):
         assert isinstance(w_other, W_Object)
         w_other.map.copy_attrs(space, w_other, self)
 
+    def instance_var_names(self):
+        return self.map.attribute_names()
+
     def get_flag(self, space, name):
         node = jit.promote(self.map).find(mapdict.FlagNode, name)
         return space.w_false if node is None else node.read(space, self)
@@ -1,8 +1,16 @@
-from topaz.module import ClassDef
+from rpython.rlib.rarithmetic import ovfcheck
+from rpython.rlib.rbigint import rbigint
+
+from topaz.module import ClassDef, make_block_driver
 from topaz.modules.enumerable import Enumerable
+from topaz.objects.arrayobject import W_ArrayObject, IntArrayStrategy
+from topaz.objects.intobject import W_FixnumObject, fixnum_count_up
 from topaz.objects.objectobject import W_Object
 
 
+each_driver = make_block_driver("Range#each")
+
+
 class W_RangeObject(W_Object):
     classdef = ClassDef("Range", W_Object.classdef)
     classdef.include_module(Enumerable)
@@ -40,3 +48,98 @@ class W_RangeObject(W_Object):
     @classdef.method("exclude_end?")
     def method_exclude_end(self, space):
         return space.newbool(self.exclusive)
+
+    def fixnum_bounds(self):
+        """
+        Returns the first and last element of a Range of Fixnums, last is
+        less than first if the Range is empty.
+        """
+        assert isinstance(self.w_start, W_FixnumObject)
+        assert isinstance(self.w_end, W_FixnumObject)
+        start = self.w_start.intvalue
+        stop = self.w_end.intvalue
+        if self.exclusive:
+            if stop <= start:
+                return start, start - 1
+            stop -= 1
+        return start, stop
+
+    def has_fixnum_bounds(self):
+        return (isinstance(self.w_start, W_FixnumObject) and
+                isinstance(self.w_end, W_FixnumObject))
+
+    @classdef.method("each")
+    def method_each(self, space, block):
+        if block is None:
+            return space.send(self, "enum_for", [space.newsymbol("each")])
+        if self.has_fixnum_bounds():
+            start, stop = self.fixnum_bounds()
+            fixnum_count_up(space, block, start, stop, 1)
+            return self
+        if not space.respond_to(self.w_start, "succ"):
+            raise space.error(space.w_TypeError,
+                "can't iterate from %s" % space.obj_to_s(space.getclass(self.w_start))
+            )
+        w_excl = space.newbool(self.exclusive)
+        if space.is_kind_of(self.w_start, space.w_string):
+            space.send(self.w_start, "upto", [self.w_end, w_excl], block)
+        elif space.is_kind_of(self.w_start, space.w_symbol):
+            w_strs = space.send(space.send(self.w_start, "to_s"), "upto",
+                [space.send(self.w_end, "to_s"), w_excl]
+            )
+            for w_str in space.listview(space.send(w_strs, "to_a")):
+                space.invoke_block(block, [space.send(w_str, "to_sym")])
+        else:
+            cmp = "<="
+            if self.exclusive:
+                cmp = "<"
+            w_zero = space.newint(0)
+            w_i = self.w_start
+            while space.is_true(space.send(space.send(w_i, "<=>", [self.w_end]), cmp, [w_zero])):
+                each_driver.jit_merge_point(bytecode=block.bytecode)
+                space.invoke_block(block, [w_i])
+                w_i = space.send(w_i, "succ")
+        return self
+
+    @classdef.method("to_a")
+    def method_to_a(self, space):
+        if not self.has_fixnum_bounds():
+            w_enum = space.send(self, "enum_for", [space.newsymbol("each")])
+            return space.send(w_enum, "to_a")
+        start, stop = self.fixnum_bounds()
+        if stop < start:
+            return space.newarray([])
+        try:
+            length = ovfcheck(stop - start + 1)
+        except OverflowError:
+            raise space.error(space.w_RangeError, "range too big for an Array")
+        items = [0] * length
+        for i in xrange(length):
+            items[i] = start + i
+        strategy = space.fromcache(IntArrayStrategy)
+        return W_ArrayObject.newarray_fromstorage(space, strategy, strategy.erase(items))
+
+    @classdef.method("size")
+    def method_size(self, space):
+        if self.has_fixnum_bounds():
+            start, stop = self.fixnum_bounds()
+            if stop < start:
+                return space.newint(0)
+            try:
+                return space.newint(ovfcheck(stop - start + 1))
+            except OverflowError:
+                return space.newbigint_fromrbigint(
+                    rbigint.fromint(stop).sub(rbigint.fromint(start)).add(rbigint.fromint(1))
+                )
+        if not space.is_kind_of(self.w_start, space.w_numeric):
+            return space.w_nil
+        w_one = space.newint(1)
+        w_diff = space.send(self.w_end, "-", [self.w_start])
+        w_size = space.send(space.send(w_diff, "floor"), "+", [w_one])
+        if space.is_true(space.send(w_size, "<", [space.newint(0)])):
+            return space.newint(0)
+        if self.exclusive:
+            w_last = space.send(self.w_start, "+", [space.send(w_size, "-", [w_one])])
+            if space.is_true(space.send(w_last, "==", [self.w_end])):
+                w_size = space.send(w_size, "-", [w_one])
+        return w_size
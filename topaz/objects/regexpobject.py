@@ -1,3 +1,6 @@
+from collections import OrderedDict
+
+from rpython.rlib import jit
 from rpython.rlib.rsre import rsre_core
 
 from topaz.coerce import Coerce
@@ -32,18 +35,58 @@ RE_ESCAPE_TABLE[ord("}")] = "\\}"
 
 
 class RegexpCache(object):
-    # TODO: this should use an LRU cache, and be elidable for the JIT.
-    def __init__(self, space):
-        self._contents = {}
+    """
+    A bounded LRU cache of compiled regexps, keyed on (pattern, flags), so
+    that patterns built at runtime (Regexp.new(input)) can't grow it without
+    limit.
+    """
 
-    def contains(self, pattern, flags):
-        return (pattern, flags) in self._contents
+    SIZE = 512
 
-    def get(self, pattern, flags):
-        return self._contents[pattern, flags]
+    def __init__(self, space):
+        self._contents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def compile(self, pattern, flags):
+        if not jit.we_are_jitted():
+            self._touch(pattern, flags)
+        return self._lookup(pattern, flags)
+
+    def _touch(self, pattern, flags):
+        # Keeps the stats and the LRU order, and makes sure the pattern is
+        # compiled, outside of traces where _lookup may be folded away.
+        key = (pattern, flags)
+        try:
+            compiled = self._contents[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            # Move the entry to the most recently used end.
+            del self._contents[key]
+            self._contents[key] = compiled
+            return
+        self.misses += 1
+        compiled = regexp.compile_no_cache(pattern, flags)
+        while len(self._contents) >= self.SIZE:
+            for oldest in self._contents:
+                del self._contents[oldest]
+                break
+            self.evictions += 1
+        self._contents[key] = compiled
+
+    @jit.elidable
+    def _lookup(self, pattern, flags):
+        try:
+            return self._contents[(pattern, flags)]
+        except KeyError:
+            # Only in a trace, after the entry was evicted.
+            return regexp.compile_no_cache(pattern, flags)
 
-    def set(self, pattern, flags, compiled_regexp):
-        self._contents[pattern, flags] = compiled_regexp
+    def size(self):
+        return len(self._contents)
 
 
 class W_RegexpObject(W_Object):
@@ -138,19 +181,28 @@ class W_RegexpObject(W_Object):
         if source is not None:
             cache = space.fromcache(RegexpCache)
             self.source = source
-            code, flags, groupcount, groupindex, indexgroup, group_offsets = regexp.compile(cache, source, flags)
+            (code, flags, groupcount, groupindex, indexgroup, group_offsets,
+             required) = regexp.compile(cache, source, flags)
             self.code = code
             self.flags = flags
             self.groupcount = groupcount
             self.groupindex = groupindex
             self.indexgroup = indexgroup
             self.group_offsets = group_offsets
+            self.required = required
 
     def make_ctx(self, s, offset=0):
         assert offset >= 0
         endpos = len(s)
         return rsre_core.StrMatchContext(self.code, s, offset, endpos, self.flags)
 
+    def search_context(self, ctx):
+        # Every match contains the required literal, so if it doesn't occur
+        # in the rest of the string there's no need to try any offset.
+        if self.required is not None and ctx._string.find(self.required, ctx.match_start) < 0:
+            return False
+        return rsre_core.search_context(ctx)
+
     def get_match_result(self, space, ctx, target, found):
         if found:
             w_match = W_MatchDataObject(space, self, ctx, target)
@@ -211,7 +263,7 @@ class W_RegexpObject(W_Object):
             return space.w_nil
         s = Coerce.str(space, w_s)
         ctx = self.make_ctx(s)
-        matched = rsre_core.search_context(ctx)
+        matched = self.search_context(ctx)
         self.get_match_result(space, ctx, s, matched)
         if matched:
             return space.newint(ctx.match_start)
@@ -229,13 +281,13 @@ class W_RegexpObject(W_Object):
         else:
             offset = 0
         ctx = self.make_ctx(s, offset)
-        matched = rsre_core.search_context(ctx)
+        matched = self.search_context(ctx)
         return self.get_match_result(space, ctx, s, matched)
 
     @classdef.method("===", s="str")
     def method_eqeqeq(self, space, s):
         ctx = self.make_ctx(s)
-        matched = rsre_core.search_context(ctx)
+        matched = self.search_context(ctx)
         self.get_match_result(space, ctx, s, matched)
         return space.newbool(matched)
 
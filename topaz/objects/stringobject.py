@@ -8,7 +8,7 @@ from rpython.rlib.rarithmetic import intmask, ovfcheck
 from rpython.rlib.rbigint import rbigint
 from rpython.rlib.rerased import new_static_erasing_pair
 from rpython.rlib.rsre import rsre_core
-from rpython.rlib.rstring import split
+from rpython.rlib.rstring import StringBuilder, split
 
 from topaz.coerce import Coerce
 from topaz.module import ClassDef, check_frozen
@@ -69,6 +69,63 @@ def expand_trans_str(source, res_len, inv=False):
     return expanded_source
 
 
+class Rope(object):
+    """
+    An immutable string built by concatenation. Concatenating ropes only
+    links them together, the characters are copied once, the first time the
+    flat value is needed.
+    """
+
+    # Concatenations shorter than this are flattened straight away, so small
+    # strings don't pay for the extra nodes.
+    SHORT_LENGTH = 256
+
+    def __init__(self, length, flat=None, left=None, right=None):
+        self.length = length
+        self.flat = flat
+        self.left = left
+        self.right = right
+
+    @staticmethod
+    def fromstr(s):
+        return Rope(len(s), flat=s)
+
+    @staticmethod
+    def concat(left, right):
+        length = left.length + right.length
+        if length <= Rope.SHORT_LENGTH:
+            return Rope.fromstr(left.flatten() + right.flatten())
+        # Appending a short piece to a rope that ends in a short leaf merges
+        # the two leaves, which keeps strings built a few characters at a
+        # time from turning into one node per piece.
+        if (right.flat is not None and left.right is not None and
+                left.right.flat is not None and
+                left.right.length + right.length <= Rope.SHORT_LENGTH):
+            assert left.left is not None
+            tail = Rope.fromstr(left.right.flat + right.flat)
+            return Rope(length, left=left.left, right=tail)
+        return Rope(length, left=left, right=right)
+
+    def flatten(self):
+        if self.flat is None:
+            builder = StringBuilder(self.length)
+            # Ropes built by repeated += are deep, so this walks them with an
+            # explicit stack rather than recursing.
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if node.flat is not None:
+                    builder.append(node.flat)
+                else:
+                    assert node.left is not None and node.right is not None
+                    stack.append(node.right)
+                    stack.append(node.left)
+            self.flat = builder.build()
+            self.left = None
+            self.right = None
+        return self.flat
+
+
 class StringStrategy(object):
     def __init__(self, space):
         pass
@@ -77,6 +134,9 @@ class StringStrategy(object):
         memo[id(self)] = result = object.__new__(self.__class__)
         return result
 
+    def to_rope(self, space, s):
+        return Rope.fromstr(s.str_w(space))
+
 
 class ConstantStringStrategy(StringStrategy):
     erase, unerase = new_static_erasing_pair("constant")
@@ -106,6 +166,7 @@ class ConstantStringStrategy(StringStrategy):
     def to_mutable(self, space, s):
         s.strategy = strategy = space.fromcache(MutableStringStrategy)
         s.str_storage = strategy.erase(self.liststr_w(s.str_storage))
+        s.clear_caches()
 
     def extend_into(self, src_storage, dst_storage):
         dst_storage += self.unerase(src_storage)
@@ -114,6 +175,45 @@ class ConstantStringStrategy(StringStrategy):
         return space.newstr_fromstr(self.unerase(storage) * times)
 
 
+class RopeStringStrategy(StringStrategy):
+    erase, unerase = new_static_erasing_pair("rope")
+
+    def str_w(self, storage):
+        return self.unerase(storage).flatten()
+
+    def liststr_w(self, storage):
+        return [c for c in self.str_w(storage)]
+
+    def length(self, storage):
+        return self.unerase(storage).length
+
+    def getitem(self, storage, idx):
+        return self.str_w(storage)[idx]
+
+    def getslice(self, space, storage, start, end):
+        return space.newstr_fromstr(self.str_w(storage)[start:end])
+
+    def hash(self, storage):
+        return compute_hash(self.str_w(storage))
+
+    def copy(self, storage):
+        return storage
+
+    def to_rope(self, space, s):
+        return self.unerase(s.str_storage)
+
+    def to_mutable(self, space, s):
+        s.strategy = strategy = space.fromcache(MutableStringStrategy)
+        s.str_storage = strategy.erase(self.liststr_w(s.str_storage))
+        s.clear_caches()
+
+    def extend_into(self, src_storage, dst_storage):
+        dst_storage += self.str_w(src_storage)
+
+    def mul(self, space, storage, times):
+        return space.newstr_fromstr(self.str_w(storage) * times)
+
+
 class MutableStringStrategy(StringStrategy):
     erase, unerase = new_static_erasing_pair("mutable")
 
@@ -152,7 +252,9 @@ class MutableStringStrategy(StringStrategy):
         return self.erase(self.unerase(storage)[:])
 
     def to_mutable(self, space, s):
-        pass
+        # Every mutation goes through to_mutable() first, so this is where
+        # the cached flat value and hash go stale.
+        s.clear_caches()
 
     def extend_into(self, src_storage, dst_storage):
         dst_storage += self.unerase(src_storage)
@@ -366,11 +468,20 @@ class W_StringObject(W_Object):
         W_Object.__init__(self, space, klass)
         self.str_storage = storage
         self.strategy = strategy
+        # The contents as a flat string and their hash, so that reading or
+        # hashing a mutable string repeatedly doesn't walk its characters
+        # every time.
+        self.str_cache = None
+        self.hash_cache = 0
+        self.hash_cached = False
 
     def __deepcopy__(self, memo):
         obj = super(W_StringObject, self).__deepcopy__(memo)
         obj.str_storage = copy.deepcopy(self.str_storage, memo)
         obj.strategy = copy.deepcopy(self.strategy, memo)
+        obj.str_cache = self.str_cache
+        obj.hash_cache = self.hash_cache
+        obj.hash_cached = self.hash_cached
         return obj
 
     @staticmethod
@@ -387,12 +498,28 @@ class W_StringObject(W_Object):
             assert isinstance(w_item, W_StringObject)
             total_length += w_item.length()
 
+        if total_length > Rope.SHORT_LENGTH:
+            rope = None
+            for w_item in strs_w:
+                assert isinstance(w_item, W_StringObject)
+                if rope is None:
+                    rope = w_item.strategy.to_rope(space, w_item)
+                else:
+                    rope = Rope.concat(rope, w_item.strategy.to_rope(space, w_item))
+            assert rope is not None
+            return W_StringObject.newstr_fromrope(space, rope)
+
         storage = newlist_hint(total_length)
         for w_item in strs_w:
             assert isinstance(w_item, W_StringObject)
             w_item.strategy.extend_into(w_item.str_storage, storage)
         return space.newstr_fromchars(storage)
 
+    @staticmethod
+    def newstr_fromrope(space, rope):
+        strategy = space.fromcache(RopeStringStrategy)
+        return W_StringObject(space, strategy.erase(rope), strategy)
+
     @staticmethod
     def newstr_fromchars(space, chars):
         strategy = space.fromcache(MutableStringStrategy)
@@ -400,7 +527,22 @@ class W_StringObject(W_Object):
         return W_StringObject(space, storage, strategy)
 
     def str_w(self, space):
-        return self.strategy.str_w(self.str_storage)
+        return self.get_flat()
+
+    def get_flat(self):
+        if self.str_cache is None:
+            self.str_cache = self.strategy.str_w(self.str_storage)
+        return self.str_cache
+
+    def get_hash(self):
+        if not self.hash_cached:
+            self.hash_cache = self.strategy.hash(self.str_storage)
+            self.hash_cached = True
+        return self.hash_cache
+
+    def clear_caches(self):
+        self.str_cache = None
+        self.hash_cached = False
 
     def symbol_w(self, space):
         return self.str_w(space)
@@ -418,6 +560,7 @@ class W_StringObject(W_Object):
         strategy = space.fromcache(MutableStringStrategy)
         self.str_storage = strategy.erase(chars)
         self.strategy = strategy
+        self.clear_caches()
 
     def extend(self, space, w_other):
         self.strategy.to_mutable(space, self)
@@ -474,6 +617,9 @@ class W_StringObject(W_Object):
             assert isinstance(w_s, W_StringObject)
             self.strategy = w_s.strategy
             self.str_storage = w_s.strategy.copy(w_s.str_storage)
+            self.str_cache = w_s.str_cache
+            self.hash_cache = w_s.hash_cache
+            self.hash_cached = w_s.hash_cached
         return self
 
     @classdef.method("initialize_copy")
@@ -481,6 +627,9 @@ class W_StringObject(W_Object):
         assert isinstance(w_other, W_StringObject)
         self.strategy = w_other.strategy
         self.str_storage = w_other.strategy.copy(w_other.str_storage)
+        self.str_cache = w_other.str_cache
+        self.hash_cache = w_other.hash_cache
+        self.hash_cached = w_other.hash_cached
         return self
 
     @classdef.method("to_str")
@@ -505,9 +654,15 @@ class W_StringObject(W_Object):
         w_other = space.convert_type(w_obj, space.w_string, "to_str")
         assert isinstance(w_other, W_StringObject)
         total_size = self.length() + w_other.length()
-        s = space.newstr_fromchars(newlist_hint(total_size))
-        s.extend(space, self)
-        s.extend(space, w_other)
+        if total_size > Rope.SHORT_LENGTH:
+            s = W_StringObject.newstr_fromrope(space, Rope.concat(
+                self.strategy.to_rope(space, self),
+                w_other.strategy.to_rope(space, w_other),
+            ))
+        else:
+            s = space.newstr_fromchars(newlist_hint(total_size))
+            s.extend(space, self)
+            s.extend(space, w_other)
         space.infect(s, self)
         space.infect(s, w_other)
         return s
@@ -541,7 +696,7 @@ class W_StringObject(W_Object):
 
     @classdef.method("hash")
     def method_hash(self, space):
-        return space.newint(self.strategy.hash(self.str_storage))
+        return space.newint(self.get_hash())
 
     @classdef.method("[]")
     @classdef.method("slice")
@@ -587,7 +742,7 @@ class W_StringObject(W_Object):
             end_idx = start_idx + len(other_str)
         elif space.is_kind_of(w_idx, space.w_regexp):
             ctx = w_idx.make_ctx(space.str_w(self))
-            if self.search_context(space, ctx):
+            if self.search_context(space, w_idx, ctx):
                 if w_count is None:
                     start_idx = ctx.match_start
                     end_idx = ctx.match_end
@@ -696,9 +851,9 @@ class W_StringObject(W_Object):
             chars += space.str_w(self)
             return space.newstr_fromchars(chars)
 
-    def search_context(self, space, ctx):
+    def search_context(self, space, w_regexp, ctx):
         try:
-            return rsre_core.search_context(ctx)
+            return w_regexp.search_context(ctx)
         except rsre_core.Error, e:
             raise space.error(space.w_RuntimeError, e.msg)
 
@@ -711,7 +866,7 @@ class W_StringObject(W_Object):
             return space.newint(space.str_w(self).find(space.str_w(w_sub), offset))
         elif space.is_kind_of(w_sub, space.w_regexp):
             ctx = w_sub.make_ctx(space.str_w(self), offset=offset)
-            if self.search_context(space, ctx):
+            if self.search_context(space, w_sub, ctx):
                 return space.newint(ctx.match_start)
             else:
                 return space.newint(-1)
@@ -736,7 +891,7 @@ class W_StringObject(W_Object):
         elif space.is_kind_of(w_sub, space.w_regexp):
             ctx = w_sub.make_ctx(space.str_w(self))
             idx = -1
-            while self.search_context(space, ctx):
+            while self.search_context(space, w_sub, ctx):
                 if ctx.match_start > end:
                     break
                 else:
@@ -798,7 +953,7 @@ class W_StringObject(W_Object):
             w_match = w_sep.get_match_result(space, ctx, string, found=True)
 
             while limit <= 0 or n + 1 < limit:
-                if not self.search_context(space, ctx):
+                if not self.search_context(space, w_sep, ctx):
                     break
                 elif ctx.match_start == ctx.match_end:
                     if ctx.match_start == ctx.end:
@@ -1080,7 +1235,7 @@ class W_StringObject(W_Object):
         string = space.str_w(self)
         ctx = w_pattern.make_ctx(string)
 
-        while last < len(string) and self.search_context(space, ctx):
+        while last < len(string) and self.search_context(space, w_pattern, ctx):
             w_matchdata = w_pattern.get_match_result(space, ctx, string, found=True)
             if w_matchdata.size() > 1:
                 matches_w = []
@@ -1185,7 +1340,7 @@ class W_StringObject(W_Object):
         if replacement is not None and "\\" in replacement:
             replacement_parts = [s for s in replacement.split("\\") if s]
 
-        while pos < len(string) and self.search_context(space, ctx):
+        while pos < len(string) and self.search_context(space, w_pattern, ctx):
             result += string[pos:ctx.match_start]
             if replacement_parts is not None:
                 result += self.gsub_regexp_subst_string(
@@ -17,11 +17,13 @@ from rply.errors import ParsingError
 
 from topaz import system
 from topaz.astcompiler import CompilerContext, SymbolTable, CompilerError
+from topaz.codecache import CodeCache
 from topaz.celldict import GlobalsDict
 from topaz.closure import ClosureCell
 from topaz.error import RubyError, print_traceback
 from topaz.executioncontext import ExecutionContext, ExecutionContextHolder
 from topaz.frame import Frame
+from topaz.inlinecache import MethodCache
 from topaz.interpreter import Interpreter
 from topaz.lexer import LexerError, Lexer
 from topaz.module import ClassCache, ModuleCache
@@ -46,7 +48,7 @@ from topaz.objects.dirobject import W_DirObject
 from topaz.objects.encodingobject import W_EncodingObject
 from topaz.objects.envobject import W_EnvObject
 from topaz.objects.exceptionobject import (
-    W_ExceptionObject, W_NoMethodError,
+    ExceptionConstructors, W_ExceptionObject, W_NoMethodError,
     W_ZeroDivisionError, W_SyntaxError, W_LoadError, W_TypeError,
     W_ArgumentError, W_RuntimeError, W_StandardError, W_SystemExit,
     W_SystemCallError, W_NameError, W_IndexError, W_KeyError, W_StopIteration,
@@ -96,6 +98,7 @@ class ObjectSpace(object):
         self._executioncontexts = ExecutionContextHolder()
         self.globals = GlobalsDict()
         self.bootstrap = True
+        self.kernel_loaded = False
         self.exit_handlers_w = []
 
         self.w_true = W_TrueObject(self)
@@ -111,6 +114,7 @@ class ObjectSpace(object):
         self.w_class = self.getclassfor(W_ClassObject)
         # We replace the one reference to our FakeClass with the real class.
         self.w_basicobject.klass.superclass = self.w_class
+        self.w_basicobject.klass.mutated(self)
 
         gc.collect()
         assert cls_reference() is None
@@ -282,7 +286,8 @@ class ObjectSpace(object):
                 kernel_path = os.path.join(path, "lib-topaz")
                 break
         self.send(self.w_load_path, "unshift", [self.newstr_fromstr(lib_path)])
-        self.load_kernel(kernel_path)
+        if not self.kernel_loaded:
+            self.load_kernel(kernel_path)
 
         self.set_const(
             self.w_object,
@@ -309,6 +314,23 @@ class ObjectSpace(object):
             "load",
             [self.newstr_fromstr(os.path.join(kernel_path, "bootstrap.rb"))]
         )
+        self.kernel_loaded = True
+
+    def load_kernel_snapshot(self):
+        """
+        Loads the Ruby kernel from the source tree at translation time, so
+        the translated binary starts with it already in place.
+        """
+        kernel_path = os.path.join(
+            os.path.join(self.base_lib_path, os.path.pardir), "lib-topaz")
+        code_cache = self.fromcache(CodeCache)
+        # Neither read nor write the translating user's code cache, and make
+        # sure the binary looks up its own cache directory at runtime.
+        code_cache.disable()
+        try:
+            self.load_kernel(os.path.abspath(kernel_path))
+        finally:
+            code_cache.reset()
 
     @specialize.memo()
     def fromcache(self, key):
@@ -348,9 +370,15 @@ class ObjectSpace(object):
                 raise self.error(self.w_SyntaxError, "%s" % e.msg)
         return ctx.create_bytecode(initial_lineno, [], [], None, None)
 
+    def compile_file(self, path, source=None):
+        return self.fromcache(CodeCache).compile_file(self, path, source)
+
     def execute(self, source, w_self=None, lexical_scope=None, filepath="-e",
                 initial_lineno=1):
         bc = self.compile(source, filepath, initial_lineno=initial_lineno)
+        return self.execute_bytecode(bc, w_self=w_self, lexical_scope=lexical_scope)
+
+    def execute_bytecode(self, bc, w_self=None, lexical_scope=None):
         frame = self.create_frame(
             bc, w_self=w_self, lexical_scope=lexical_scope)
         with self.getexecutioncontext().visit_frame(frame):
@@ -638,13 +666,16 @@ class ObjectSpace(object):
     def find_lexical_const(self, lexical_scope, name):
         w_res = self._find_lexical_const(lexical_scope, name)
         if w_res is None:
-            if lexical_scope is not None:
-                w_mod = lexical_scope.w_mod
-            else:
-                w_mod = self.w_object
-            w_res = self.send(w_mod, "const_missing", [self.newsymbol(name)])
+            w_res = self.lexical_const_missing(lexical_scope, name)
         return w_res
 
+    def lexical_const_missing(self, lexical_scope, name):
+        if lexical_scope is not None:
+            w_mod = lexical_scope.w_mod
+        else:
+            w_mod = self.w_object
+        return self.send(w_mod, "const_missing", [self.newsymbol(name)])
+
     def find_instance_var(self, w_obj, name):
         w_res = w_obj.find_instance_var(self, name)
         return w_res if w_res is not None else self.w_nil
@@ -669,7 +700,7 @@ class ObjectSpace(object):
             args_w = []
 
         w_cls = self.getclass(w_receiver)
-        raw_method = w_cls.find_method(self, name)
+        raw_method = self.lookup_method(w_cls, name)
         return self._send_raw(
             name, raw_method, w_receiver, w_cls, args_w, block)
 
@@ -680,7 +711,7 @@ class ObjectSpace(object):
 
     def _send_raw(self, name, raw_method, w_receiver, w_cls, args_w, block):
         if raw_method is None:
-            method_missing = w_cls.find_method(self, "method_missing")
+            method_missing = self.lookup_method(w_cls, "method_missing")
             if method_missing is None:
                 class_name = self.str_w(self.send(w_cls, "to_s"))
                 raise self.error(
@@ -693,9 +724,15 @@ class ObjectSpace(object):
 
     def respond_to(self, w_receiver, name):
         w_cls = self.getclass(w_receiver)
-        raw_method = w_cls.find_method(self, name)
+        raw_method = self.lookup_method(w_cls, name)
         return raw_method is not None
 
+    def lookup_method(self, w_cls, name):
+        # Traces promote the class and constant-fold find_method already.
+        if jit.we_are_jitted():
+            return w_cls.find_method(self, name)
+        return self.fromcache(MethodCache).lookup(self, w_cls, name)
+
     def is_kind_of(self, w_obj, w_cls):
         return w_obj.is_kind_of(self, w_cls)
 
@@ -728,12 +765,34 @@ class ObjectSpace(object):
 
     def error(self, w_type, msg="", optargs=None):
         if not optargs:
+            w_exc = self._new_exception(w_type)
+            if w_exc is not None:
+                w_exc.msg = msg
+                return RubyError(w_exc)
             optargs = []
         args_w = [self.newstr_fromstr(msg)] + optargs
         w_exc = self.send(w_type, "new", args_w)
         assert isinstance(w_exc, W_ExceptionObject)
         return RubyError(w_exc)
 
+    def key_error(self, w_key):
+        w_exc = self._new_exception(self.w_KeyError)
+        if w_exc is not None:
+            assert isinstance(w_exc, W_KeyError)
+            w_exc.w_key = w_key
+            return RubyError(w_exc)
+        return self.error(self.w_KeyError, "key not found: %s" % self.str_w(
+            self.send(w_key, "inspect")))
+
+    def _new_exception(self, w_type):
+        # Internal errors are often rescued right away, so when new and
+        # initialize aren't overridden skip them and the message String.
+        if not self.fromcache(ExceptionConstructors).are_default(self, w_type):
+            return None
+        w_exc = self.send(w_type, "allocate")
+        assert isinstance(w_exc, W_ExceptionObject)
+        return w_exc
+
     def hash_w(self, w_obj):
         return self.int_w(self.send(w_obj, "hash"))
 
@@ -813,7 +872,6 @@ class ObjectSpace(object):
         except RubyError as e:
             if reraise_error:
                 raise e
-            self.mark_topframe_not_escaped()
             if not raise_error:
                 return self.w_nil
             src_cls_name = self.obj_to_s(self.getclass(w_obj))
@@ -835,9 +893,6 @@ class ObjectSpace(object):
         else:
             return w_res
 
-    def mark_topframe_not_escaped(self):
-        self.getexecutioncontext().gettopframe().escaped = False
-
     def infect(self, w_dest, w_src, taint=True, untrust=True, freeze=False):
         """
         By default copies tainted and untrusted state from src to dest.
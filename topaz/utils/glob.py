@@ -13,7 +13,7 @@ from topaz.utils.ll_file import isdir
 def regexp_match(cache, re, string):
     pos = 0
     endpos = len(string)
-    code, flags, _, _, _, _ = regexp.compile(cache, re)
+    code, flags, _, _, _, _, _ = regexp.compile(cache, re)
     return rsre_core.StrMatchContext(code, string, pos, endpos, flags)
 
 
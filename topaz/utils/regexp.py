@@ -8,13 +8,13 @@ from rpython.rlib.rsre.rsre_core import (
     OPCODE_MARK, OPCODE_REPEAT, OPCODE_ANY, OPCODE_ANY_ALL, OPCODE_MAX_UNTIL,
     OPCODE_MIN_UNTIL, OPCODE_GROUPREF, OPCODE_AT, OPCODE_BRANCH, OPCODE_RANGE,
     OPCODE_JUMP, OPCODE_ASSERT_NOT, OPCODE_CATEGORY, OPCODE_FAILURE, OPCODE_IN,
-    OPCODE_NEGATE, OPCODE_GROUPREF_EXISTS
+    OPCODE_NEGATE, OPCODE_GROUPREF_EXISTS, OPCODE_INFO
 )
 from rpython.rlib.rsre.rsre_core import (
     AT_BEGINNING, AT_BEGINNING_LINE, AT_BEGINNING_STRING, AT_BOUNDARY,
     AT_NON_BOUNDARY, AT_END_LINE, AT_END_STRING,
 )
-from rpython.rlib.rsre.rsre_char import MAXREPEAT as MAX_REPEAT
+from rpython.rlib.rsre.rsre_char import MAXREPEAT as MAX_REPEAT, SRE_INFO_PREFIX
 
 
 IGNORE_CASE = 1 << 0
@@ -1375,7 +1375,88 @@ def _posix_class_as_set(name, negate, info):
     return item
 
 
-def _compile_no_cache(pattern, flags):
+def _is_literal(item):
+    return (isinstance(item, Character) and item.positive and
+            not item.case_insensitive and not item.zerowidth)
+
+
+def _top_level_items(parsed):
+    if isinstance(parsed, Sequence):
+        return parsed.items
+    return [parsed]
+
+
+def _literal_prefix(parsed):
+    """
+    Returns the characters every match starts with, and how many of them are
+    matched by leading LITERAL opcodes (which the matcher can skip once the
+    prefix has been found).
+    """
+    prefix = []
+    for item in _top_level_items(parsed):
+        if _is_literal(item):
+            assert isinstance(item, Character)
+            prefix.append(item.value)
+        else:
+            prefix_skip = len(prefix)
+            if isinstance(item, Group):
+                group_prefix, _ = _literal_prefix(item.subpattern)
+                prefix.extend(group_prefix)
+            return prefix, prefix_skip
+    return prefix, len(prefix)
+
+
+def _required_literal(parsed):
+    """
+    Returns the longest run of literal characters that every match must
+    contain, or None.
+    """
+    best = []
+    run = []
+    for item in _top_level_items(parsed):
+        if _is_literal(item):
+            assert isinstance(item, Character)
+            run.append(chr(item.value))
+            if len(run) > len(best):
+                best = run
+        else:
+            run = []
+    if not best:
+        return None
+    return "".join(best)
+
+
+def _overlap_table(prefix):
+    table = [0] * len(prefix)
+    for i in xrange(1, len(prefix)):
+        idx = table[i - 1]
+        while idx > 0 and prefix[i] != prefix[idx]:
+            idx = table[idx - 1]
+        if prefix[i] == prefix[idx]:
+            table[i] = idx + 1
+    return table
+
+
+def _compile_info(ctx, prefix, prefix_skip):
+    # Lays out an INFO block the same way CPython's sre_compile does, which
+    # lets rsre search for the prefix with a KMP scan instead of attempting a
+    # match at every offset.
+    ctx.emit(OPCODE_INFO)
+    skip = ctx.tell()
+    ctx.emit(0)
+    ctx.emit(SRE_INFO_PREFIX)
+    ctx.emit(len(prefix))
+    ctx.emit(MAX_REPEAT)
+    ctx.emit(len(prefix))
+    ctx.emit(prefix_skip)
+    for c in prefix:
+        ctx.emit(c)
+    for i in _overlap_table(prefix):
+        ctx.emit(i)
+    ctx.patch(skip, ctx.tell() - skip)
+
+
+def compile_no_cache(pattern, flags):
     source = Source(pattern)
     if flags & EXTENDED:
         source.ignore_space = True
@@ -1389,6 +1470,9 @@ def _compile_no_cache(pattern, flags):
     parsed = parsed.optimize(info)
 
     ctx = CompilerContext()
+    prefix, prefix_skip = _literal_prefix(parsed)
+    if len(prefix) > 1:
+        _compile_info(ctx, prefix, prefix_skip)
     parsed.compile(ctx)
     ctx.emit(OPCODE_SUCCESS)
     code = ctx.build()
@@ -1396,10 +1480,9 @@ def _compile_no_cache(pattern, flags):
     index_group = {}
     for n, v in info.group_index.iteritems():
         index_group[v] = n
-    return code, info.flags, info.group_count, info.group_index, index_group, info.group_offsets
+    return (code, info.flags, info.group_count, info.group_index, index_group,
+            info.group_offsets, _required_literal(parsed))
 
 
 def compile(cache, pattern, flags=0):
-    if not cache.contains(pattern, flags):
-        cache.set(pattern, flags, _compile_no_cache(pattern, flags))
-    return cache.get(pattern, flags)
+    return cache.compile(pattern, flags)